@@ -0,0 +1,48 @@
+# ruff: noqa: INP001
+"""
+Search indexes.
+
+Revision ID: 3f585508923b
+Revises: 81bb304d61c8
+Create Date: 2026-10-19 17:44:05.918342
+
+"""
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3f585508923b"
+down_revision: str | Sequence[str] | None = "81bb304d61c8"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# Each table and the text column searched by similarity on Postgres.
+TRIGRAM_COLUMNS = {
+    "todo": "description",
+    "project": "description",
+    "tag": "name",
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_tag_name", "tag", ["name"])
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table, column in TRIGRAM_COLUMNS.items():
+        op.create_index(
+            f"ix_{table}_{column}_trgm",
+            table,
+            [column],
+            postgresql_using="gin",
+            postgresql_ops={column: "gin_trgm_ops"},
+        )
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        for table, column in TRIGRAM_COLUMNS.items():
+            op.drop_index(f"ix_{table}_{column}_trgm", table_name=table)
+    op.drop_index("ix_tag_name", table_name="tag")
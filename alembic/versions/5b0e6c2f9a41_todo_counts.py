@@ -0,0 +1,78 @@
+# ruff: noqa: INP001
+"""
+Denormalized todo counts.
+
+Revision ID: 5b0e6c2f9a41
+Revises: ed834725badc
+Create Date: 2026-10-19 21:14:36.802215
+
+"""
+from collections.abc import Sequence
+from datetime import datetime
+
+import sqlalchemy as sa
+
+from alembic import op
+from pydiditbackend.models import triggers
+
+# revision identifiers, used by Alembic.
+revision: str = "5b0e6c2f9a41"
+down_revision: str | Sequence[str] | None = "ed834725badc"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# Archived todos keep their columns, see unarchive().
+OVERDUE_TABLES = ("todo", "todo_archive")
+COUNT_COLUMNS = ("todo_count", "active_todo_count", "overdue_todo_count")
+# Archived projects keep their, zero, counts.
+COUNTING_TABLES = ("project", "tag", "project_archive")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in OVERDUE_TABLES:
+        op.add_column(
+            table,
+            sa.Column("overdue", sa.Boolean(), nullable=False, server_default=sa.false()),
+        )
+        todos = sa.table(table, sa.column("overdue"), sa.column("due", sa.DateTime()))
+        # Due dates are local time, as compared by mark_overdue().
+        op.execute(todos.update().where(todos.c.due < datetime.now()).values(overdue=True))
+    op.create_index("ix_todo_overdue", "todo", ["overdue"])
+    for table in COUNTING_TABLES:
+        for column in COUNT_COLUMNS:
+            op.add_column(
+                table,
+                sa.Column(column, sa.Integer(), nullable=False, server_default="0"),
+            )
+
+    for table, (link_table, column) in triggers.COUNTED_TABLES.items():
+        # Count what is there before the triggers take over.
+        counted = f"""
+            SELECT count(*) FROM {link_table} JOIN todo ON todo.id = {link_table}.todo_id
+            WHERE {link_table}.{column} = {table}.id
+        """
+        op.execute(f"""
+            UPDATE {table} SET
+                todo_count = (
+                    SELECT count(*) FROM {link_table}
+                    WHERE {link_table}.{column} = {table}.id
+                ),
+                active_todo_count = ({counted} AND todo.state = 'active'),
+                overdue_todo_count = ({counted} AND todo.state = 'active' AND todo.overdue)
+        """)
+    for statement in triggers.count_triggers(op.get_bind().dialect.name):
+        op.execute(statement)
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for statement in triggers.drop_count_triggers(op.get_bind().dialect.name):
+        op.execute(statement)
+    for table in COUNTING_TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            for column in COUNT_COLUMNS:
+                batch_op.drop_column(column)
+    op.drop_index("ix_todo_overdue", table_name="todo")
+    for table in OVERDUE_TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("overdue")
@@ -0,0 +1,38 @@
+# ruff: noqa: INP001
+"""
+Version columns.
+
+Revision ID: 67672dc38406
+Revises: 3f585508923b
+Create Date: 2026-10-19 18:32:47.105263
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "67672dc38406"
+down_revision: str | Sequence[str] | None = "3f585508923b"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# Archived instances keep their version, see unarchive().
+VERSIONED_TABLES = ("todo", "project", "note", "tag", "todo_archive", "project_archive")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in VERSIONED_TABLES:
+        op.add_column(
+            table,
+            sa.Column("version", sa.Integer(), nullable=False, server_default=sa.text("1")),
+        )
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in VERSIONED_TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("version")
@@ -0,0 +1,58 @@
+# ruff: noqa: INP001
+"""
+Project todo positions.
+
+Revision ID: 7229b4474789
+Revises: be38c9375422
+Create Date: 2026-10-19 15:02:47.118204
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7229b4474789"
+down_revision: str | Sequence[str] | None = "be38c9375422"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "project_contain_todo",
+        sa.Column("display_position", sa.Integer(), nullable=True),
+    )
+    # The global positions are unique, so they are unique within every
+    # project too, and keep each project's current order.
+    todo = sa.table("todo", sa.column("id"), sa.column("display_position"))
+    project_contain_todo = sa.table(
+        "project_contain_todo",
+        sa.column("todo_id"),
+        sa.column("display_position"),
+    )
+    op.execute(
+        project_contain_todo.update().values(
+            display_position=sa.select(todo.c.display_position)
+            .where(todo.c.id == project_contain_todo.c.todo_id)
+            .scalar_subquery(),
+        ),
+    )
+    with op.batch_alter_table("project_contain_todo") as batch_op:
+        batch_op.alter_column("display_position", nullable=False)
+        batch_op.create_unique_constraint(
+            "uq_project_contain_todo_display_position",
+            ["project_id", "display_position"],
+        )
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("project_contain_todo") as batch_op:
+        batch_op.drop_constraint(
+            "uq_project_contain_todo_display_position",
+            type_="unique",
+        )
+        batch_op.drop_column("display_position")
@@ -0,0 +1,77 @@
+# ruff: noqa: INP001
+"""
+Archive.
+
+Revision ID: 81bb304d61c8
+Revises: 7229b4474789
+Create Date: 2026-10-19 16:20:31.642791
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+from pydiditbackend.models.enums import State
+
+# revision identifiers, used by Alembic.
+revision: str = "81bb304d61c8"
+down_revision: str | Sequence[str] | None = "7229b4474789"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+ARCHIVED_TABLES = ("todo", "project")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in ARCHIVED_TABLES:
+        op.create_table(
+            f"{table}_archive",
+            sa.Column("id", sa.Integer(), nullable=False, primary_key=True, autoincrement=False),
+            sa.Column("description", sa.Unicode(length=255), nullable=False),
+            sa.Column(
+                "state",
+                # The type itself already exists on Postgres.
+                sa.Enum(State, name="stateenum").with_variant(
+                    postgresql.ENUM(State, name="stateenum", create_type=False),
+                    "postgresql",
+                ),
+                nullable=False,
+            ),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("modified_at", sa.DateTime(), nullable=False),
+            sa.Column("show_from", sa.DateTime(), nullable=True),
+            sa.Column("due", sa.DateTime(), nullable=True),
+            sa.Column("visible", sa.Boolean(), nullable=False),
+            sa.Column("display_position", sa.Integer(), nullable=False),
+            sa.Column("archived_at", sa.DateTime(), nullable=False),
+        )
+        # SQLite reuses the highest rowid unless the table is AUTOINCREMENT,
+        # and an archived id must never be handed out again.
+        if op.get_bind().dialect.name == "sqlite":
+            with op.batch_alter_table(
+                table,
+                recreate="always",
+                table_kwargs={"sqlite_autoincrement": True},
+            ):
+                pass
+
+    op.create_table(
+        "archived_link",
+        sa.Column("id", sa.Integer(), nullable=False, primary_key=True),
+        sa.Column("table_name", sa.Unicode(length=255), nullable=False),
+        sa.Column("left_id", sa.Integer(), nullable=False),
+        sa.Column("right_id", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_archived_link_left_id", "archived_link", ["left_id"])
+    op.create_index("ix_archived_link_right_id", "archived_link", ["right_id"])
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_archived_link_right_id", table_name="archived_link")
+    op.drop_index("ix_archived_link_left_id", table_name="archived_link")
+    op.drop_table("archived_link")
+    for table in ARCHIVED_TABLES:
+        op.drop_table(f"{table}_archive")
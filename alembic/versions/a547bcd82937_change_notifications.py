@@ -0,0 +1,82 @@
+# ruff: noqa: INP001
+"""
+Change notifications.
+
+Revision ID: a547bcd82937
+Revises: fd6249b0b314
+Create Date: 2026-10-19 10:03:17.204518
+
+"""
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a547bcd82937"
+down_revision: str | Sequence[str] | None = "fd6249b0b314"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+CHANNEL = "pydidit_changes"
+
+# Each table and the columns that identify a changed row in the payload.
+NOTIFYING_TABLES = {
+    "todo": ("id",),
+    "project": ("id",),
+    "note": ("id",),
+    "tag": ("id",),
+    "todo_note": ("todo_id", "note_id"),
+    "todo_tag": ("todo_id", "tag_id"),
+    "project_note": ("project_id", "note_id"),
+    "project_tag": ("project_id", "tag_id"),
+    "todo_prereq_todo": ("todo_id", "prereq_id"),
+    "todo_prereq_project": ("todo_id", "project_id"),
+    "project_prereq_project": ("project_id", "prereq_id"),
+    "project_prereq_todo": ("project_id", "todo_id"),
+    "project_contain_project": ("parent_id", "child_id"),
+    "project_contain_todo": ("project_id", "todo_id"),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Only Postgres can notify; other databases are polled instead.
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    op.execute(f"""
+        CREATE FUNCTION pydidit_notify_change() RETURNS trigger AS $$
+        DECLARE
+            changed jsonb;
+            payload jsonb;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                changed := to_jsonb(OLD);
+            ELSE
+                changed := to_jsonb(NEW);
+            END IF;
+            payload := jsonb_build_object('table', TG_TABLE_NAME, 'operation', TG_OP);
+            FOR i IN 0 .. TG_NARGS - 1 LOOP
+                payload := payload || jsonb_build_object(TG_ARGV[i], changed -> TG_ARGV[i]);
+            END LOOP;
+            PERFORM pg_notify('{CHANNEL}', payload::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table, key_columns in NOTIFYING_TABLES.items():
+        arguments = ", ".join(f"'{column}'" for column in key_columns)
+        op.execute(f"""
+            CREATE TRIGGER {table}_notify_change
+            AFTER INSERT OR UPDATE OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION pydidit_notify_change({arguments})
+        """)
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    for table in NOTIFYING_TABLES:
+        op.execute(f"DROP TRIGGER {table}_notify_change ON {table}")
+    op.execute("DROP FUNCTION pydidit_notify_change()")
@@ -0,0 +1,56 @@
+# ruff: noqa: INP001
+"""
+Materialized visibility.
+
+Revision ID: be38c9375422
+Revises: d780c8661539
+Create Date: 2026-10-19 12:41:09.385027
+
+"""
+from collections.abc import Sequence
+from datetime import datetime
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "be38c9375422"
+down_revision: str | Sequence[str] | None = "d780c8661539"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+SCHEDULED_TABLES = ("todo", "project")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in SCHEDULED_TABLES:
+        op.add_column(
+            table,
+            sa.Column(
+                "visible",
+                sa.Boolean(),
+                nullable=False,
+                server_default=sa.true(),
+            ),
+        )
+        scheduled = sa.table(
+            table,
+            sa.column("visible"),
+            sa.column("show_from", sa.DateTime()),
+        )
+        # Show dates are local time, as compared by activate_shown().
+        op.execute(
+            scheduled.update()
+            .where(scheduled.c.show_from > datetime.now())
+            .values(visible=False),
+        )
+        op.create_index(f"ix_{table}_visible", table, ["visible"])
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in SCHEDULED_TABLES:
+        op.drop_index(f"ix_{table}_visible", table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("visible")
@@ -0,0 +1,34 @@
+# ruff: noqa: INP001
+"""
+Agenda indexes.
+
+Revision ID: d780c8661539
+Revises: a547bcd82937
+Create Date: 2026-10-19 11:26:52.118634
+
+"""
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d780c8661539"
+down_revision: str | Sequence[str] | None = "a547bcd82937"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+SCHEDULED_TABLES = ("todo", "project")
+SCHEDULE_COLUMNS = ("due", "show_from")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in SCHEDULED_TABLES:
+        for column in SCHEDULE_COLUMNS:
+            op.create_index(f"ix_{table}_{column}", table, [column])
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in SCHEDULED_TABLES:
+        for column in SCHEDULE_COLUMNS:
+            op.drop_index(f"ix_{table}_{column}", table_name=table)
@@ -0,0 +1,39 @@
+# ruff: noqa: INP001
+"""
+Recurring todos.
+
+Revision ID: ed834725badc
+Revises: 67672dc38406
+Create Date: 2026-10-19 19:58:12.470318
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "ed834725badc"
+down_revision: str | Sequence[str] | None = "67672dc38406"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# Archived todos keep their columns, see unarchive().
+RECURRING_TABLES = ("todo", "todo_archive")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in RECURRING_TABLES:
+        op.add_column(table, sa.Column("recurrence", sa.Unicode(length=255), nullable=True))
+        op.add_column(table, sa.Column("recurs_at", sa.DateTime(), nullable=True))
+    op.create_index("ix_todo_recurs_at", "todo", ["recurs_at"])
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_todo_recurs_at", table_name="todo")
+    for table in RECURRING_TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("recurs_at")
+            batch_op.drop_column("recurrence")
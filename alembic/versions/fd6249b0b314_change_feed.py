@@ -0,0 +1,44 @@
+# ruff: noqa: INP001
+"""
+Change feed.
+
+Revision ID: fd6249b0b314
+Revises: 3c2c44a6ac9b
+Create Date: 2026-10-19 09:12:41.530912
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "fd6249b0b314"
+down_revision: str | Sequence[str] | None = "3c2c44a6ac9b"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+SYNCED_TABLES = ("todo", "project", "note", "tag")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in SYNCED_TABLES:
+        op.create_index(f"ix_{table}_modified_at", table, ["modified_at"])
+
+    op.create_table(
+        "tombstone",
+        sa.Column("id", sa.Integer(), nullable=False, primary_key=True),
+        sa.Column("model", sa.Unicode(length=255), nullable=False),
+        sa.Column("instance_id", sa.Integer(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_tombstone_deleted_at", "tombstone", ["deleted_at"])
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_tombstone_deleted_at", table_name="tombstone")
+    op.drop_table("tombstone")
+    for table in SYNCED_TABLES:
+        op.drop_index(f"ix_{table}_modified_at", table_name=table)
@@ -0,0 +1,5 @@
+"""
+Benchmarks for the pydiditbackend API.
+
+Run with ``python -m benchmarks.run --help``.
+"""
@@ -0,0 +1,140 @@
+"""Reproducible dataset generation for the benchmarks."""
+
+import random
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from pydiditbackend import models
+from pydiditbackend.models.enums import State
+
+CHUNK_SIZE = 5000
+TAG_COUNT = 50
+TODOS_PER_PROJECT = 20
+
+NOW = datetime(2025, 1, 1, 12)
+
+
+def _chunked(rows: list[dict], size: int = CHUNK_SIZE) -> Iterable[list[dict]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _insert(session, table_name: str, rows: list[dict]) -> None:  # noqa: ANN001
+    table = models.Base.metadata.tables[table_name]
+    for chunk in _chunked(rows):
+        session.execute(insert(table), chunk)
+
+
+def _dates(rng: random.Random) -> dict:
+    roll = rng.random()
+    if roll < 0.05:  # noqa: PLR2004
+        show_from = NOW + timedelta(days=rng.randint(1, 60))
+        return {"show_from": show_from, "due": show_from + timedelta(days=7)}
+    if roll < 0.20:  # noqa: PLR2004
+        return {"show_from": None, "due": NOW + timedelta(days=rng.randint(-30, 30))}
+    return {"show_from": None, "due": None}
+
+
+def _state(rng: random.Random) -> State:
+    if rng.random() < 0.2:  # noqa: PLR2004
+        return State.completed
+    return State.active
+
+
+def populate(session, todo_count: int, *, seed: int = 0) -> None:  # noqa: ANN001, PLR0914
+    """
+    Insert a realistic dataset with todo_count todos.
+
+    Projects nest into a forest, most todos live in a project, and tags,
+    notes and prereqs are spread across both.  Rows are written with Core
+    inserts and explicit display positions, so generating the dataset does
+    not go through the code paths being measured.
+    """
+    rng = random.Random(seed)  # noqa: S311
+    project_count = max(1, todo_count // TODOS_PER_PROJECT)
+    note_count = max(1, todo_count // 5)
+
+    _insert(session, "todo", [
+        {
+            "id": i,
+            "description": f"todo {i} {rng.choice(('call', 'email', 'write', 'buy', 'fix'))}",
+            "state": _state(rng),
+            "display_position": i,
+            **_dates(rng),
+        }
+        for i in range(1, todo_count + 1)
+    ])
+    _insert(session, "project", [
+        {
+            "id": i,
+            "description": f"project {i}",
+            "state": _state(rng),
+            "display_position": i,
+            **_dates(rng),
+        }
+        for i in range(1, project_count + 1)
+    ])
+    _insert(session, "tag", [
+        {"id": i, "name": f"tag {i}"}
+        for i in range(1, TAG_COUNT + 1)
+    ])
+    _insert(session, "note", [
+        {"id": i, "text": f"note {i} " + "lorem ipsum " * rng.randint(1, 20)}
+        for i in range(1, note_count + 1)
+    ])
+
+    todo_ids = range(1, todo_count + 1)
+    project_ids = range(1, project_count + 1)
+
+    _insert(session, "project_contain_project", [
+        {"parent_id": rng.randint(1, child_id - 1), "child_id": child_id}
+        for child_id in project_ids
+        if child_id > project_count // 10 + 1
+    ])
+    _insert(session, "project_contain_todo", [
+        {"project_id": rng.choice(project_ids), "todo_id": todo_id}
+        for todo_id in todo_ids
+        if rng.random() < 0.7  # noqa: PLR2004
+    ])
+    _insert(session, "todo_tag", [
+        {"todo_id": todo_id, "tag_id": tag_id}
+        for todo_id in todo_ids
+        for tag_id in rng.sample(range(1, TAG_COUNT + 1), rng.randint(0, 3))
+    ])
+    _insert(session, "project_tag", [
+        {"project_id": project_id, "tag_id": tag_id}
+        for project_id in project_ids
+        for tag_id in rng.sample(range(1, TAG_COUNT + 1), rng.randint(0, 2))
+    ])
+    _insert(session, "todo_note", [
+        {"todo_id": rng.choice(todo_ids), "note_id": note_id}
+        for note_id in range(1, note_count + 1)
+        if note_id % 4
+    ])
+    _insert(session, "project_note", [
+        {"project_id": rng.choice(project_ids), "note_id": note_id}
+        for note_id in range(1, note_count + 1)
+        if not note_id % 4
+    ])
+    _insert(session, "todo_prereq_todo", [
+        {"todo_id": todo_id, "prereq_id": rng.randint(1, todo_id - 1)}
+        for todo_id in todo_ids
+        if todo_id > 1 and rng.random() < 0.1  # noqa: PLR2004
+    ])
+    _insert(session, "todo_prereq_project", [
+        {"todo_id": todo_id, "project_id": rng.choice(project_ids)}
+        for todo_id in todo_ids
+        if rng.random() < 0.02  # noqa: PLR2004
+    ])
+    _insert(session, "project_prereq_todo", [
+        {"project_id": project_id, "todo_id": rng.choice(todo_ids)}
+        for project_id in project_ids
+        if rng.random() < 0.1  # noqa: PLR2004
+    ])
+    _insert(session, "project_prereq_project", [
+        {"project_id": project_id, "prereq_id": rng.randint(1, project_id - 1)}
+        for project_id in project_ids
+        if project_id > 1 and rng.random() < 0.1  # noqa: PLR2004
+    ])
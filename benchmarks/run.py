@@ -0,0 +1,474 @@
+# ruff: noqa: T201
+"""
+Run the pydiditbackend benchmarks and write a JSON report.
+
+Each backend gets a freshly generated dataset per size, then every operation
+is timed ``--repeat`` times.  Postgres is only benchmarked when a URL is
+given with ``--postgres-url`` or ``PYDIDIT_BENCH_POSTGRES_URL``.  The
+benchmark drops the pydidit tables there before and after, so it refuses a
+database already holding any unless ``--destroy`` is given.
+
+On the backends shared between threads, a mix of puts and moves then runs
+on one thread and on ``--writers`` threads at once.  Both report operations
+per second, so what the writers lose to serializing the ordering shows.
+
+    python -m benchmarks.run --sizes 1000 10000 --output report.json
+    python -m benchmarks.run --compare old.json new.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager, suppress
+from datetime import UTC, datetime
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+import sqlalchemy
+from sqlalchemy import create_engine, inspect, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import sessionmaker as sqlalchemy_sessionmaker
+
+import pydiditbackend
+from benchmarks.dataset import TAG_COUNT, populate
+from pydiditbackend import models
+from pydiditbackend.models.enums import State
+
+MODELS_VERSION = "5b0e6c2f9a41"
+SIZES = (1000, 10000, 100000)
+BACKENDS = ("sqlite-memory", "sqlite-file", "postgres")
+REPEAT = 5
+DENSE_RANGE = 500
+MIDDLE_RANGE = 10
+BATCH_SIZE = 500
+WRITERS = 8
+WRITES = 25
+
+
+class Context:
+    """State shared by the operations of one backend and size."""
+
+    def __init__(self, size: int, seed: int) -> None:
+        """Set up the id pools operations draw from."""
+        self.size = size
+        self.rng = random.Random(seed)  # noqa: S311
+        with pydiditbackend.sessionmaker() as session:
+            self.active_todo_ids = list(session.scalars(
+                select(models.Todo.id).filter_by(state=State.active),
+            ))
+        self.rng.shuffle(self.active_todo_ids)
+        project_contain_todo = models.Base.metadata.tables["project_contain_todo"]
+        with pydiditbackend.sessionmaker() as session:
+            self.project_todos = session.execute(select(
+                project_contain_todo.c.todo_id,
+                project_contain_todo.c.project_id,
+            )).all()
+
+    def todo_at_rank(self, rank: int) -> tuple[int, int]:
+        """Find the id and display position of the rank-th todo in order."""
+        with pydiditbackend.sessionmaker() as session:
+            return session.execute(
+                select(models.Todo.id, models.Todo.display_position)
+                .order_by(models.Todo.display_position)
+                .offset(rank)
+                .limit(1),
+            ).one()
+
+    def pop_active_todo_id(self) -> int:
+        """Take an active todo that no other operation will touch again."""
+        return self.active_todo_ids.pop()
+
+
+def _move_within(context: Context, distance: int) -> None:
+    """Move a todo toward the start across a dense run of distance todos."""
+    middle = context.size // 2
+    distance = min(distance, middle - 1)
+    source_id, _ = context.todo_at_rank(middle + distance)
+    _, target_display_position = context.todo_at_rank(middle - distance)
+    pydiditbackend.move("Todo", source_id, target_display_position)
+
+
+def _move_within_project(context: Context) -> None:
+    """Move a todo to the start of one of its projects."""
+    todo_id, project_id = context.rng.choice(context.project_todos)
+    pydiditbackend.move("Todo", todo_id, "start", within=project_id)
+
+
+OPERATIONS: dict[str, Callable[[Context], object]] = {
+    "get_todo": lambda _: pydiditbackend.get("Todo"),
+    "get_todo_by_id": lambda context: pydiditbackend.get(
+        "Todo",
+        filter_by={"id": context.rng.randint(1, context.size)},
+        include_completed=True,
+        include_future_show_from=True,
+    ),
+    "get_todo_rows": lambda _: pydiditbackend.get_rows(
+        "Todo",
+        columns=["id", "description", "state", "due", "display_position"],
+    ),
+    "get_rows_by_id": lambda context: pydiditbackend.get_rows(
+        "Todo",
+        columns=["id", "description", "state", "due", "display_position"],
+        filter_by={"id": context.rng.randint(1, context.size)},
+    ),
+    "count_by_id": lambda context: pydiditbackend.count(
+        "Todo",
+        filter_by={"id": context.rng.randint(1, context.size)},
+    ),
+    "count_by_tag": lambda _: pydiditbackend.count_by("Todo", "tag"),
+    "get_project": lambda _: pydiditbackend.get("Project"),
+    "load_workspace": lambda _: pydiditbackend.load_workspace(),
+    "get_tag": lambda _: pydiditbackend.get("Tag"),
+    "search": lambda _: pydiditbackend.search("email"),
+    "put": lambda context: pydiditbackend.put(models.Todo(
+        description=f"benchmark todo {context.rng.random()}",
+    )),
+    "move_start": lambda context: pydiditbackend.move(
+        "Todo",
+        context.rng.randint(1, context.size),
+        "start",
+    ),
+    "move_end": lambda context: pydiditbackend.move(
+        "Todo",
+        context.rng.randint(1, context.size),
+        "end",
+    ),
+    "move_middle": lambda context: _move_within(context, MIDDLE_RANGE),
+    "move_dense": lambda context: _move_within(context, DENSE_RANGE),
+    "move_within_project": lambda context: _move_within_project(context),
+    "tag_many": lambda context: pydiditbackend.tag_many(
+        context.rng.randint(1, TAG_COUNT),
+        context.rng.sample(range(1, context.size + 1), min(BATCH_SIZE, context.size)),
+    ),
+    "mark_completed": lambda context: pydiditbackend.mark_completed(
+        "Todo",
+        context.pop_active_todo_id(),
+    ),
+    "delete": lambda context: pydiditbackend.delete(
+        "Todo",
+        context.pop_active_todo_id(),
+    ),
+}
+
+
+def _write(
+    context: Context,
+    seed: int,
+    timings: list[float],
+    errors: list[Exception],
+) -> None:
+    """Put and move todos as the concurrency tests do, timing each."""
+    rng = random.Random(seed)  # noqa: S311
+    for _ in range(WRITES):
+        started = time.perf_counter()
+        try:
+            _write_one(context, rng)
+        except DBAPIError as error:
+            # Waited out the busy timeout and every retry.
+            errors.append(error)
+        else:
+            timings.append(time.perf_counter() - started)
+
+
+def _write_one(context: Context, rng: random.Random) -> None:
+    roll = rng.random()
+    if roll < 0.3:
+        pydiditbackend.put(models.Todo(description=f"benchmark todo {rng.random()}"))
+    elif roll < 0.5:
+        pydiditbackend.move(
+            "Todo",
+            rng.randint(1, context.size),
+            rng.choice(("start", "end")),
+        )
+    else:
+        pydiditbackend.move(
+            "Todo",
+            rng.randint(1, context.size),
+            rng.randint(0, context.size),
+        )
+
+
+def _write_concurrently(
+    context: Context,
+    writers: int,
+    seed: int,
+) -> tuple[list[float], int, float]:
+    """Run _write on writers threads, returning the timings, errors and wall time."""
+    timings: list[float] = []
+    errors: list[Exception] = []
+    threads = [
+        threading.Thread(target=_write, args=(context, seed + writer, timings, errors))
+        for writer in range(writers)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timings, len(errors), time.perf_counter() - started
+
+
+def _check_scratch(engine: sqlalchemy.Engine, *, destroy: bool) -> None:
+    """Refuse to drop pydidit tables holding who knows what, unless told to."""
+    existing = set(inspect(engine).get_table_names()) & set(models.Base.metadata.tables)
+    if existing and not destroy:
+        raise ValueError(
+            f"{engine.url.render_as_string()} already has pydidit tables "
+            f"({', '.join(sorted(existing))}), which the benchmark would drop. "
+            "Point it at a scratch database, or pass --destroy.",
+        )
+
+
+@contextmanager
+def _engine(
+    backend: str,
+    postgres_url: str | None,
+    *,
+    destroy: bool = False,
+) -> Iterator[sqlalchemy.Engine]:
+    if backend == "sqlite-memory":
+        engine = create_engine("sqlite:///:memory:")
+        yield engine
+        engine.dispose()
+    elif backend == "sqlite-file":
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_engine(f"sqlite:///{Path(directory) / 'bench.db'}")
+            yield engine
+            engine.dispose()
+    else:
+        engine = create_engine(postgres_url)
+        try:
+            _check_scratch(engine, destroy=destroy)
+        except ValueError:
+            engine.dispose()
+            raise
+        models.Base.metadata.drop_all(engine)
+        try:
+            yield engine
+        finally:
+            models.Base.metadata.drop_all(engine)
+            engine.dispose()
+
+
+def _summarize(timings: list[float]) -> dict[str, float]:
+    ordered = sorted(timings)
+    return {
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "mean": statistics.fmean(ordered),
+        "p95": ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))],
+        "max": ordered[-1],
+    }
+
+
+def run_backend(  # noqa: PLR0913
+    backend: str,
+    size: int,
+    *,
+    operations: list[str],
+    repeat: int,
+    seed: int,
+    postgres_url: str | None = None,
+    writers: int = WRITERS,
+    destroy: bool = False,
+) -> list[dict]:
+    """Benchmark every operation against one backend and dataset size."""
+    results = []
+    with _engine(backend, postgres_url, destroy=destroy) as engine:
+        pydiditbackend.prepare(
+            sqlalchemy_sessionmaker(engine),
+            version_override=MODELS_VERSION,
+        )
+        models.Base.metadata.create_all(engine)
+
+        started = time.perf_counter()
+        with pydiditbackend.sessionmaker() as session, session.begin():
+            populate(session, size, seed=seed)
+        load_seconds = time.perf_counter() - started
+
+        context = Context(size, seed)
+        for operation in operations:
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                OPERATIONS[operation](context)
+                timings.append(time.perf_counter() - started)
+            results.append({
+                "backend": backend,
+                "size": size,
+                "operation": operation,
+                "repeat": repeat,
+                "load_seconds": load_seconds,
+                **_summarize(timings),
+            })
+            print(
+                f"{backend:>13} {size:>7} {operation:>16} "
+                f"median {results[-1]['median'] * 1000:10.2f} ms",
+                file=sys.stderr,
+            )
+
+        # Threads get separate in-memory databases.
+        if backend == "sqlite-memory" or writers < 1:
+            return results
+        for threads in sorted({1, writers}):
+            timings, errors, seconds = _write_concurrently(context, threads, seed)
+            results.append({
+                "backend": backend,
+                "size": size,
+                "operation": f"writes_{threads}_threads",
+                "repeat": len(timings),
+                "load_seconds": load_seconds,
+                "ops_per_second": len(timings) / seconds,
+                "errors": errors,
+                **_summarize(timings),
+            })
+            print(
+                f"{backend:>13} {size:>7} {results[-1]['operation']:>16} "
+                f"{results[-1]['ops_per_second']:10.2f} ops/s, {errors} failed",
+                file=sys.stderr,
+            )
+    return results
+
+
+def _metadata() -> dict[str, str | None]:
+    try:
+        package_version = version("pydidit2-backend")
+    except PackageNotFoundError:
+        package_version = None
+    commit = None
+    with suppress(OSError, subprocess.CalledProcessError):
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],  # noqa: S607
+            capture_output=True,
+            check=True,
+            text=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    return {
+        "created_at": datetime.now(UTC).isoformat(),
+        "package_version": package_version,
+        "commit": commit,
+        "models_version": MODELS_VERSION,
+        "python": platform.python_version(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "platform": platform.platform(),
+    }
+
+
+def run(  # noqa: PLR0913
+    *,
+    sizes: list[int],
+    backends: list[str],
+    operations: list[str],
+    repeat: int = REPEAT,
+    seed: int = 0,
+    postgres_url: str | None = None,
+    writers: int = WRITERS,
+    destroy: bool = False,
+) -> dict:
+    """Run the benchmarks and return the report."""
+    results = []
+    for backend in backends:
+        if backend == "postgres" and postgres_url is None:
+            print("skipping postgres, no URL given", file=sys.stderr)
+            continue
+        for size in sizes:
+            results.extend(run_backend(
+                backend,
+                size,
+                operations=operations,
+                repeat=repeat,
+                seed=seed,
+                postgres_url=postgres_url,
+                writers=writers,
+                destroy=destroy,
+            ))
+    return {"metadata": _metadata(), "results": results}
+
+
+def compare(old: dict, new: dict) -> list[dict]:
+    """Pair up results from two reports with the ratio of their medians."""
+    old_results = {
+        (result["backend"], result["size"], result["operation"]): result
+        for result in old["results"]
+    }
+    comparison = []
+    for result in new["results"]:
+        key = (result["backend"], result["size"], result["operation"])
+        if (old_result := old_results.get(key)) is not None:
+            comparison.append({
+                "backend": key[0],
+                "size": key[1],
+                "operation": key[2],
+                "old_median": old_result["median"],
+                "new_median": result["median"],
+                "ratio": result["median"] / old_result["median"],
+            })
+    return comparison
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Parse arguments and run."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(SIZES))
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        choices=BACKENDS,
+        default=list(BACKENDS),
+    )
+    parser.add_argument(
+        "--operations",
+        nargs="+",
+        choices=list(OPERATIONS),
+        default=list(OPERATIONS),
+    )
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--writers", type=int, default=WRITERS)
+    parser.add_argument(
+        "--postgres-url",
+        default=os.environ.get("PYDIDIT_BENCH_POSTGRES_URL"),
+    )
+    parser.add_argument(
+        "--destroy",
+        action="store_true",
+        help="drop the pydidit tables already in the Postgres database",
+    )
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("OLD", "NEW"))
+    args = parser.parse_args(argv)
+
+    if args.compare is not None:
+        old, new = (json.loads(path.read_text()) for path in args.compare)
+        output = compare(old, new)
+    else:
+        output = run(
+            sizes=args.sizes,
+            backends=args.backends,
+            operations=args.operations,
+            repeat=args.repeat,
+            seed=args.seed,
+            postgres_url=args.postgres_url,
+            writers=args.writers,
+            destroy=args.destroy,
+        )
+
+    text = json.dumps(output, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        args.output.write_text(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,250 @@
 # ruff: noqa: FIX002, T201, ERA001, TD002, TD003, TD004, TD006, RUF100
 """The primary API for pydiditbackend."""
 
+import heapq
 import os
-from collections.abc import Callable, Iterable
-from datetime import datetime
+import random
+import time
+import zlib
+from collections.abc import Callable, Hashable, Iterable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
 from functools import wraps
-from typing import ParamSpec, TypeVar, overload
+from operator import attrgetter
+from typing import NamedTuple, ParamSpec, TypeVar, overload
 
-from sqlalchemy import and_, create_engine, desc, or_, select
-from sqlalchemy.exc import NoResultFound
+from sqlalchemy import (
+    Column,
+    Select,
+    and_,
+    bindparam,
+    case,
+    create_engine,
+    desc,
+    func,
+    inspect,
+    literal,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy import delete as sqlalchemy_delete
+from sqlalchemy import insert as sqlalchemy_insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import DBAPIError, NoResultFound
+from sqlalchemy.orm import Session, aliased, attributes
 from sqlalchemy.orm import sessionmaker as sqlalchemy_sessionmaker
-from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.expression import BindParameter, ColumnElement
 
-from pydiditbackend import models
+from pydiditbackend import debug, invalidation, models, profiling, recurrence
+from pydiditbackend.models import UnsupportedDatabaseError  # noqa: F401
+from pydiditbackend.notify import subscribe  # noqa: F401
+from pydiditbackend.transfer import export_stream, import_stream  # noqa: F401
 
 sessionmaker: sqlalchemy_sessionmaker
+materialized_visibility = False
+
+# Read statements by shape, see _filter().
+_statement_cache: dict[tuple, Select] = {}
 
 P = ParamSpec("P")  # Represents the parameters of the decorated function
 R = TypeVar("R")    # Represents the return type of the decorated function
 
 MOVE_OFFSET = 1000000000
 
-def handle_session(*args, expunge: bool = False):
+# Completed instances untouched for this long are archived.
+ARCHIVE_AFTER = timedelta(days=30)
+
+# Ids per statement in delete_many(), below every database's bind limit.
+DELETE_CHUNK_SIZE = 5000
+
+# Writes to the ordering retry this many times, backing off from
+# RETRY_DELAY seconds, when they lose a race to another writer.
+RETRIES = 5
+RETRY_DELAY = 0.01
+# Postgres serialization_failure and deadlock_detected.
+RETRYABLE_SQLSTATES = ("40001", "40P01")
+
+SYNCED_MODEL_NAMES = ("Todo", "Project", "Note", "Tag")
+
+AGENDA_BUCKETS = ("overdue", "today", "this_week", "later")
+
+# Association tables by model, and the column naming the model's side.
+TAG_TABLES = {"Todo": ("todo_tag", "todo_id"), "Project": ("project_tag", "project_id")}
+NOTE_TABLES = {"Todo": ("todo_note", "todo_id"), "Project": ("project_note", "project_id")}
+# Models with denormalized todo counts, with their association table to
+# todo and the column there naming them.
+COUNTED_TABLES = {
+    "Project": ("project_contain_todo", "project_id"),
+    "Tag": ("todo_tag", "tag_id"),
+}
+# By (dependent model, prereq model): the table and its two columns.
+PREREQ_TABLES = {
+    ("Todo", "Todo"): ("todo_prereq_todo", "todo_id", "prereq_id"),
+    ("Todo", "Project"): ("todo_prereq_project", "todo_id", "project_id"),
+    ("Project", "Todo"): ("project_prereq_todo", "project_id", "todo_id"),
+    ("Project", "Project"): ("project_prereq_project", "project_id", "prereq_id"),
+}
+
+_unit_of_work: ContextVar[Session | None] = ContextVar(
+    "pydiditbackend_unit_of_work",
+    default=None,
+)
+
+class ConflictError(Exception):
+    """
+    An instance was changed by another writer since it was read.
+
+    From database version 67672dc38406 every update checks the version the
+    instance was read at.  Get the instance again and redo the change.
+    """
+
+@contextmanager
+def _conflicts() -> Iterator[None]:
+    try:
+        yield
+    except StaleDataError as error:
+        raise ConflictError(str(error)) from error
+
+def handle_session(
+    *args,
+    expunge: bool = False,
+    retry: bool = False,
+    read_only: bool = False,
+):
     def handle_session_inside(f: Callable[P, R]) -> Callable[P, R]:
         @wraps(f)
+        @_conflicts()
         def wrapper(*inside_args, **inside_kwargs):
-            if (session := inside_kwargs.get("session")) is None:
-                with sessionmaker() as session, session.begin():  # noqa: F821, PLR1704
-                    inside_kwargs["session"] = session
-                    to_return = f(*inside_args, **inside_kwargs)
-                    if expunge:
-                        session.expunge_all()
-                    return to_return
-            else:
+            if inside_kwargs.get("session") is None:
+                inside_kwargs["session"] = _unit_of_work.get()
+            if inside_kwargs.get("session") is not None:
+                # The caller owns the transaction, so only they can retry it.
                 return f(*inside_args, **inside_kwargs)
-        return wrapper
+            if read_only:
+                with _read_only_session() as session:
+                    inside_kwargs["session"] = session
+                    return f(*inside_args, **inside_kwargs)
+            for attempt in range(RETRIES + 1 if retry else 1):
+                try:
+                    with sessionmaker() as session, session.begin():  # noqa: F821
+                        inside_kwargs["session"] = session
+                        to_return = f(*inside_args, **inside_kwargs)
+                        if expunge:
+                            session.expunge_all()
+                        return to_return
+                except DBAPIError as error:
+                    if attempt == RETRIES or not _is_retryable(error):
+                        raise
+                time.sleep(random.uniform(0, RETRY_DELAY * 2 ** attempt))  # noqa: S311
+            return None
+        return debug.tracked(profiling.profiled(wrapper))
     if len(args) > 0 and callable(args[0]):
         return handle_session_inside(args[0])
     else:
         return handle_session_inside
 
+@contextmanager
+def _read_only_session() -> Iterator[Session]:
+    """
+    Open a session for reads only.
+
+    There is nothing to commit, flush before queries or expire afterwards,
+    and closing the session detaches everything it loaded in one go.  On
+    Postgres the transaction begins READ ONLY, in the same round trip.  The
+    session's info has read_only set, for a get_bind() routing reads to a
+    replica.
+    """
+    with sessionmaker(autoflush=False, info={"read_only": True}) as session:  # noqa: F821
+        # SQLite gets nothing extra: its driver opens no transaction for
+        # reads anyway, and PRAGMA query_only would expire every prepared
+        # statement each time it is set, doubling the cost of a get().
+        if session.get_bind().dialect.name == "postgresql":
+            session.connection(execution_options={"postgresql_readonly": True})
+        yield session
+
+def _is_retryable(error: DBAPIError) -> bool:
+    """Tell whether error means another writer won a race worth retrying."""
+    sqlstate = getattr(error.orig, "sqlstate", None) or getattr(error.orig, "pgcode", None)
+    return sqlstate in RETRYABLE_SQLSTATES or "database is locked" in str(error.orig)
+
+def _lock_ordering(session, table_name: str, scope: int | None = None) -> None:  # noqa: ANN001
+    """
+    Serialize writers to the display positions in table_name.
+
+    This must come before the ordering is read.  On Postgres it takes a
+    transaction-scoped advisory lock per list, the whole table or the rows
+    of one scope such as a project, so readers are not blocked.  SQLite has
+    no finer lock than the database, so the transaction is begun with BEGIN
+    IMMEDIATE, unless an earlier write already holds the lock.
+    """
+    connection = session.connection()
+    if connection.dialect.name == "postgresql":
+        connection.execute(
+            select(func.pg_advisory_xact_lock(bindparam("key"))),
+            {"key": zlib.crc32(f"{table_name}:{scope}".encode())},
+        )
+    elif connection.dialect.name == "sqlite":
+        driver_connection = connection.connection.driver_connection
+        if not driver_connection.in_transaction:
+            driver_connection.execute("BEGIN IMMEDIATE")
+
+@contextmanager
+def unit_of_work() -> Iterator[Session]:
+    """
+    Run every API call in the block in one session and transaction.
+
+    Calls inside the block join it without being passed a session, so a
+    request handler doing get, put, move and get again checks out one
+    connection and commits once.  A nested unit of work joins the outer one.
+    When the block finishes, pending changes are flushed and instances are
+    detached with their loaded state, like get() results, before the commit.
+    If the block raises, everything rolls back.
+    """
+    if (session := _unit_of_work.get()) is not None:
+        yield session
+        return
+    with _conflicts(), sessionmaker() as session, session.begin():  # noqa: F821, PLR1704
+        token = _unit_of_work.set(session)
+        try:
+            yield session
+            session.flush()
+            session.expunge_all()
+        finally:
+            _unit_of_work.reset(token)
+
 def prepare(
     provided_sessionmaker: sqlalchemy_sessionmaker,
     *,
     version_override=None,
+    debug_mode: bool = False,
+    profile_sample_rate: float | None = None,
+    use_visible_flag: bool = False,
 ) -> None:
     """
     Prepare the backend.
 
-    This must be called before using any of the other functions.
+    This must be called before using any of the other functions.  Pass
+    debug_mode=True to flag calls that explode into many raw rows or issue
+    repeated statements (see pydiditbackend.debug), and profile_sample_rate
+    to record the query plans of that share of calls (see
+    pydiditbackend.profiling).  Pass use_visible_flag=True to filter on the
+    visible column instead of comparing show_from to the current time;
+    activate_shown() must then run periodically (see
+    pydiditbackend.scheduler).
     """
     globals()["sessionmaker"] = provided_sessionmaker
+    globals()["materialized_visibility"] = use_visible_flag
+    _statement_cache.clear()
     models.prepare(provided_sessionmaker, version_override=version_override)
+    if debug_mode:
+        debug.enable()
+    if profile_sample_rate is not None:
+        profiling.enable(sample_rate=profile_sample_rate)
 
 @overload
 def get(
@@ -75,7 +268,7 @@ def get(
 ) -> Iterable[models.Base]:
     ...
 
-@handle_session(expunge=True)
+@handle_session(read_only=True)
 def get(
     model,
     *,
@@ -85,39 +278,511 @@ def get(
     session=None,
     where=None,
 ):
-    """Get instances."""
-    model = getattr(models, model) if isinstance(model, str) else model
-    query = select(model)
+    """
+    Get instances.
+
+    With include_completed=True, archived instances (see
+    archive_completed()) are merged in by display position.  They are
+    ArchivedTodo and ArchivedProject instances, without tags, notes,
+    projects or prerequisites, and delete(), move() and mark_completed()
+    do not reach them: unarchive() them first.
+    """
+    model = _resolve_model(model)
+    query, parameters = _filter(
+        ("get",),
+        lambda: select(model),
+        model,
+        filter_by=filter_by,
+        include_completed=include_completed,
+        include_future_show_from=include_future_show_from,
+        where=where,
+    )
+    instances = session.scalars(query, parameters).unique().all()  # type: ignore[attr-defined]
+    if include_completed and (archive := _archive_of(model)) is not None:
+        query, parameters = _filter(
+            ("get",),
+            lambda: select(archive),
+            archive,
+            filter_by=filter_by,
+            include_completed=True,
+            include_future_show_from=include_future_show_from,
+            where=_for_archive(where, model, archive),
+        )
+        archived = session.scalars(query, parameters).all()  # type: ignore[attr-defined]
+        instances = (
+            list(heapq.merge(instances, archived, key=attrgetter("display_position")))
+            if hasattr(model, "display_position")
+            else [*instances, *archived]
+        )
+    return instances
+
+@handle_session(read_only=True)
+def get_rows(
+    model: str | type[models.Base],
+    *,
+    columns: Iterable[str | ColumnElement] | None = None,
+    filter_by: dict[str, int | str] | None = None,
+    include_completed: bool = False,
+    include_future_show_from: bool = False,
+    session: sqlalchemy_sessionmaker | None = None,
+    where: ColumnElement[bool] | None = None,
+) -> list[Row]:
+    """
+    Get lightweight rows of column values.
+
+    Rows are named tuples selected straight from the model's table, so no
+    instances, relationships or identity map bookkeeping are involved.
+    columns holds column names or column expressions, and defaults to every
+    column of the model.  Filtering matches get().
+    """
+    model = _resolve_model(model)
+    if columns is None:
+        columns = [attribute.key for attribute in inspect(model).column_attrs]
+    columns = tuple(columns)
+    archive = _archive_of(model) if include_completed else None
+    rows = []
+    for source in (model, archive):
+        if source is None:
+            continue
+        query, parameters = _filter(
+            (
+                ("rows", columns)
+                if all(isinstance(column, str) for column in columns)
+                else None
+            ),
+            lambda source=source: select(*(
+                getattr(source, column)
+                if isinstance(column, str)
+                else _for_archive(column, model, source)
+                for column in columns
+            )),
+            source,
+            filter_by=filter_by,
+            include_completed=include_completed,
+            include_future_show_from=include_future_show_from,
+            where=_for_archive(where, model, source),
+        )
+        rows.extend(session.execute(query, parameters))  # type: ignore[attr-defined]
+    return rows
+
+def _resolve_model(model):
+    return getattr(models, model) if isinstance(model, str) else model
+
+def _archive_of(model):
+    return getattr(models, f"Archived{model.__name__}", None)
+
+def _for_archive(clause, model, archive):  # noqa: ANN001
+    """Point clause at the archive's columns instead of the model's."""
+    if clause is None or archive is model:
+        return clause
+    if hasattr(clause, "__clause_element__"):
+        # An ORM attribute, such as Todo.description, is not traversable.
+        clause = clause.__clause_element__()
+    return visitors.replacement_traverse(
+        clause,
+        {},
+        lambda element: (
+            archive.__table__.c[element.key]
+            if isinstance(element, Column) and element.table is model.__table__
+            else None
+        ),
+    )
+
+def _filter(  # noqa: PLR0913
+    shape: Hashable | None,
+    build: Callable[[], Select],
+    model,
+    *,
+    filter_by: dict[str, int | str] | None,
+    include_completed: bool,
+    include_future_show_from: bool,
+    where: ColumnElement[bool] | None,
+    ordered: bool = True,
+) -> tuple[Select, dict]:
+    """
+    Apply the filtering and ordering shared by the read APIs.
+
+    Returns the statement and the parameters to execute it with.  Filter
+    values and the current time are bind parameters, so the statement only
+    depends on shape (naming what build() selects), the model, the
+    filter_by keys and the flags.  It is built once per combination of
+    those and reused, so it is compiled once and can be prepared server
+    side by psycopg.  A filter_by value of None matches NULL, so which keys
+    are None is part of the combination.  Statements with a where clause, or a shape of None,
+    are built every time.
+    """
+    parameters = {
+        f"filter_by_{key}": value
+        for key, value in (filter_by or {}).items()
+        if value is not None
+    }
+    show_by_time = (
+        not include_future_show_from
+        and hasattr(model, "show_from")
+        and not _uses_visible_flag(model)
+    )
+    if show_by_time:
+        parameters["now"] = datetime.now()
+
+    cache_key = (
+        shape,
+        model,
+        # None is matched with IS NULL rather than bound.
+        tuple((key, value is None) for key, value in (filter_by or {}).items()),
+        include_completed,
+        include_future_show_from,
+        materialized_visibility,
+        ordered,
+    )
+    cacheable = shape is not None and where is None
+    if cacheable and (query := _statement_cache.get(cache_key)) is not None:
+        return query, parameters
+
+    query = build()
+    # Filter on explicit columns rather than Select.filter_by(), which
+    # targets whichever entity was joined last.
     if filter_by is not None:
-        query = query.filter_by(**filter_by)
+        query = query.where(*(
+            getattr(model, key).is_(None)
+            if value is None
+            else getattr(model, key) == bindparam(f"filter_by_{key}")
+            for key, value in filter_by.items()
+        ))
     if not include_completed and hasattr(model, "state"):
-        query = query.filter_by(state=models.enums.State.active)
+        query = query.where(model.state == models.enums.State.active)
     if not include_future_show_from and hasattr(model, "show_from"):
-        query = query.where(or_(
-            model.show_from == None,
-            model.show_from <= datetime.now(),
-        ))
+        query = query.where(_shown(model, bindparam("now")))
     if where is not None:
         query = query.where(where)
-    if hasattr(model, "display_position"):
+    if ordered and hasattr(model, "display_position"):
         query = query.order_by(model.display_position)
+    if cacheable:
+        _statement_cache[cache_key] = query
+    return query, parameters
+
+def _uses_visible_flag(model) -> bool:
+    return materialized_visibility and hasattr(model, "visible")
+
+def _shown(model, now: datetime | BindParameter) -> ColumnElement[bool]:
+    """Filter out instances whose show_from has not been reached."""
+    if _uses_visible_flag(model):
+        return model.visible == True
+    return or_(model.show_from == None, model.show_from <= now)
+
+
+@handle_session
+def activate_shown(
+    *,
+    now: datetime | None = None,
+    session: sqlalchemy_sessionmaker | None = None,
+) -> int:
+    """
+    Bring the visible flag up to date with show_from.
+
+    Instances whose show_from has been reached are made visible, and any
+    whose show_from has moved into the future are hidden again, each with a
+    single indexed UPDATE per model.  Returns how many instances changed.
+    See pydiditbackend.scheduler for running this periodically.
+    """
+    now = datetime.now() if now is None else now
+    changed = 0
+    for model_name in ("Todo", "Project"):
+        model = getattr(models, model_name)
+        if not hasattr(model, "visible"):
+            continue
+        shown = session.execute(  # type: ignore[attr-defined]
+            update(model).where(
+                model.visible == False,
+                or_(model.show_from == None, model.show_from <= now),
+            ).values(visible=True),
+        ).rowcount
+        shown += session.execute(  # type: ignore[attr-defined]
+            update(model).where(
+                model.visible == True,
+                model.show_from > now,
+            ).values(visible=False),
+        ).rowcount
+        if shown:
+            invalidation.record(session, model_name)
+        changed += shown
+    return changed
 
-    return session.scalars(query).unique().all()  # type: ignore[attr-defined]
 
 @handle_session
+def mark_overdue(
+    *,
+    now: datetime | None = None,
+    session: sqlalchemy_sessionmaker | None = None,
+) -> int:
+    """
+    Bring the overdue flag of todos up to date with due.
+
+    Like activate_shown(), with one indexed UPDATE each way.  The database
+    then moves the todos between the overdue counts of their projects and
+    tags.  Returns how many todos changed.
+    """
+    if not hasattr(models.Todo, "overdue"):
+        return 0
+    now = datetime.now() if now is None else now
+    todo = models.Todo
+    changed = session.execute(  # type: ignore[attr-defined]
+        update(todo).where(
+            todo.overdue == False,
+            todo.due < now,
+        ).values(overdue=True),
+    ).rowcount
+    changed += session.execute(  # type: ignore[attr-defined]
+        update(todo).where(
+            todo.overdue == True,
+            or_(todo.due == None, todo.due >= now),
+        ).values(overdue=False),
+    ).rowcount
+    if changed:
+        for model_name in ("Todo", *COUNTED_TABLES):
+            invalidation.record(session, model_name)
+    return changed
+
+
+@handle_session
+def materialize_recurring(
+    *,
+    now: datetime | None = None,
+    session: sqlalchemy_sessionmaker | None = None,
+) -> int:
+    """
+    Insert the next todo of every recurring todo whose time has come.
+
+    Todos whose recurs_at has been reached are found through its index and
+    read as plain rows.  Each gets a successor showing from that
+    occurrence, or from the latest one reached if several were missed, with
+    its due date as far after show_from as before, its tags, its projects
+    and its rule, which the old todo gives up.  Display positions at the
+    end of the list are allocated up front, so all the todos go in with a
+    single multi-row INSERT.  Returns how many todos were inserted.  See
+    pydiditbackend.scheduler for running this periodically.
+    """
+    if not hasattr(models.Todo, "recurrence"):
+        raise models.too_old("Recurrence", "ed834725badc")
+    now = datetime.now() if now is None else now
+    todo = models.Todo
+    _lock_ordering(session, todo.__tablename__)
+    recurring = session.execute(  # type: ignore[attr-defined]
+        select(
+            todo.id,
+            todo.description,
+            todo.created_at,
+            todo.show_from,
+            todo.due,
+            todo.recurrence,
+            todo.recurs_at,
+        ).where(todo.recurs_at <= now).order_by(todo.recurs_at, todo.id),
+    ).all()
+    if not recurring:
+        return 0
+    highest_display_position = session.scalar(  # type: ignore[attr-defined]
+        select(func.max(todo.display_position)),
+    )
+    rows = []
+    for offset, row in enumerate(recurring, start=1):
+        show_from, recurs_at = recurrence.latest_occurrence(row.recurrence, row.recurs_at, now)
+        rows.append({
+            "description": row.description,
+            "state": models.enums.State.active,
+            "show_from": show_from,
+            "due": (
+                None
+                if row.due is None
+                else row.due + (show_from - (row.show_from or row.created_at))
+            ),
+            "visible": True,
+            "display_position": (highest_display_position or 0) + offset,
+            "recurrence": None if recurs_at is None else row.recurrence,
+            "recurs_at": recurs_at,
+        })
+    new_ids = session.scalars(  # type: ignore[attr-defined]
+        sqlalchemy_insert(todo.__table__).returning(todo.id, sort_by_parameter_order=True),
+        rows,
+    ).all()
+    successors = {row.id: new_id for row, new_id in zip(recurring, new_ids, strict=True)}
+    session.execute(  # type: ignore[attr-defined]
+        update(todo)
+        .where(todo.id.in_(successors))
+        .values(recurrence=None, recurs_at=None, version=todo.version + 1)
+        .execution_options(synchronize_session=False),
+    )
+    invalidation.record(session, todo.__name__, [*successors, *successors.values()])
+
+    todo_tag = models.Base.metadata.tables["todo_tag"]
+    tag_rows = session.execute(  # type: ignore[attr-defined]
+        select(todo_tag).where(todo_tag.c.todo_id.in_(successors)),
+    ).all()
+    if tag_rows:
+        session.execute(sqlalchemy_insert(todo_tag), [  # type: ignore[attr-defined]
+            {"todo_id": successors[row.todo_id], "tag_id": row.tag_id}
+            for row in tag_rows
+        ])
+        _touch(session, models.Tag, {row.tag_id for row in tag_rows})
+    project_contain_todo = models.Base.metadata.tables["project_contain_todo"]
+    project_rows = session.execute(  # type: ignore[attr-defined]
+        select(project_contain_todo.c.project_id, project_contain_todo.c.todo_id)
+        .where(project_contain_todo.c.todo_id.in_(successors))
+        .order_by(project_contain_todo.c.project_id),
+    ).all()
+    if project_rows:
+        for project_id in sorted({row.project_id for row in project_rows}):
+            _lock_ordering(session, "project_contain_todo", project_id)
+        # Each goes to the end of its project, by the column default.
+        session.execute(sqlalchemy_insert(project_contain_todo), [  # type: ignore[attr-defined]
+            {"project_id": row.project_id, "todo_id": successors[row.todo_id]}
+            for row in project_rows
+        ])
+        _touch(session, models.Project, {row.project_id for row in project_rows})
+    session.expire_all()  # type: ignore[attr-defined]
+    return len(new_ids)
+
+@handle_session(read_only=True)
+def count(
+    model: str | type[models.Base],
+    *,
+    filter_by: dict[str, int | str] | None = None,
+    include_completed: bool = False,
+    include_future_show_from: bool = False,
+    session: sqlalchemy_sessionmaker | None = None,
+    where: ColumnElement[bool] | None = None,
+) -> int:
+    """Count instances in SQL.  Filtering, and reading the archive, matches get()."""
+    model = _resolve_model(model)
+    archive = _archive_of(model) if include_completed else None
+    counted = 0
+    for source in (model, archive):
+        if source is None:
+            continue
+        query, parameters = _filter(
+            ("count",),
+            lambda source=source: select(func.count(source.id)),
+            source,
+            filter_by=filter_by,
+            include_completed=include_completed,
+            include_future_show_from=include_future_show_from,
+            where=_for_archive(where, model, source),
+            ordered=False,
+        )
+        counted += session.scalar(query, parameters)  # type: ignore[attr-defined]
+    return counted
+
+@handle_session(read_only=True)
+def count_by(  # noqa: PLR0913
+    model: str | type[models.Base],
+    by: str,
+    *,
+    filter_by: dict[str, int | str] | None = None,
+    include_completed: bool = False,
+    include_future_show_from: bool = False,
+    session: sqlalchemy_sessionmaker | None = None,
+    where: ColumnElement[bool] | None = None,
+) -> dict:
+    """
+    Count instances per group with a single GROUP BY query.
+
+    by is "state", "tag" (keyed by tag id) or "project" (keyed by the id of
+    the containing project).  Filtering matches get() and applies to the
+    counted model, not the groups.  Archived instances are only counted by
+    state.
+    """
+    model = _resolve_model(model)
+    query, parameters = _filter(
+        ("count_by", by),
+        lambda: _count_by_query(model, by),
+        model,
+        filter_by=filter_by,
+        include_completed=include_completed,
+        include_future_show_from=include_future_show_from,
+        where=where,
+        ordered=False,
+    )
+    counts = dict(session.execute(query, parameters).all())  # type: ignore[attr-defined]
+    if by == "state" and include_completed and (archive := _archive_of(model)) is not None:
+        query, parameters = _filter(
+            ("count_by", by),
+            lambda: _count_by_query(archive, by),
+            archive,
+            filter_by=filter_by,
+            include_completed=True,
+            include_future_show_from=include_future_show_from,
+            where=_for_archive(where, model, archive),
+            ordered=False,
+        )
+        for state, archived in session.execute(query, parameters):  # type: ignore[attr-defined]
+            counts[state] = counts.get(state, 0) + archived
+    return counts
+
+_COUNT_BY_ATTRIBUTES = {
+    "state": "state",
+    "tag": "tags",
+    "project": "contained_by_projects",
+}
+
+def _count_by_query(model, by: str) -> Select:
+    if not hasattr(model, _COUNT_BY_ATTRIBUTES.get(by, "")):
+        raise ValueError(
+            f"Cannot count {model.__name__} by {by}.",
+        )
+    if by == "state":
+        key = model.state
+        query = select(key, func.count(model.id))
+    elif by == "tag":
+        key = models.Tag.id
+        query = select(key, func.count(model.id)).join(model.tags)
+    elif by == "project":
+        project = aliased(models.Project)
+        key = project.id
+        query = select(key, func.count(model.id)).join(
+            model.contained_by_projects.of_type(project),
+        )
+    return query.select_from(model).group_by(key)
+
+def count_overdue(
+    model: str | type[models.Base],
+    *,
+    now: datetime | None = None,
+    where: ColumnElement[bool] | None = None,
+    **kwargs,
+) -> int:
+    """Count instances whose due date has passed.  Other arguments match count()."""
+    model = _resolve_model(model)
+    if not hasattr(model, "due"):
+        raise ValueError(f"{model.__name__} has no due date.")
+    overdue = model.due < (datetime.now() if now is None else now)
+    return count(
+        model,
+        where=overdue if where is None else and_(overdue, where),
+        **kwargs,
+    )
+
+@handle_session(retry=True)
 def put(
     instance: models.Base,
     *,
     session: sqlalchemy_sessionmaker | None = None,
 ) -> models.Base:
     """Put an instance."""
+    if hasattr(type(instance), "display_position"):
+        _lock_ordering(session, type(instance).__tablename__)
+    # Joining a project appends to that project's list too.
+    for project in getattr(instance, "contained_by_projects", ()):
+        if project.id is not None:
+            _lock_ordering(session, "project_contain_todo", project.id)
     session.add(instance)  # type: ignore[attr-defined]
+    # Flush now, so a later put in the same unit of work sees this row when
+    # picking its default display position.
+    session.flush()  # type: ignore[attr-defined]
     return instance
 
 @overload
 def delete(
     instance: models.Base,
     *,
+    cascade: bool = False,
     session: sqlalchemy_sessionmaker | None = None,
 ) -> None:
     ...
@@ -127,6 +792,7 @@ def delete(
     model_name: str,
     instance_id: int,
     *,
+    cascade: bool = False,
     session: sqlalchemy_sessionmaker | None = None,
 ) -> None:
     ...
@@ -136,19 +802,289 @@ def delete(
     *args,
     **kwargs,
 ) -> None:
-    """Delete an instance."""
-    session = kwargs.get("session")
+    """Delete an instance.  See delete_many() for cascade."""
     if len(args) == 1:
-        instance = args[0]
+        model, instance_id = type(args[0]), args[0].id
     else:
-        instance = get(
-            args[0],
-            filter_by={"id": args[1]},
-            session=session,
-            include_completed=True,
-            include_future_show_from=True,
-        )[0]
-    session.delete(instance)  # type: ignore[attr-defined]
+        model, instance_id = getattr(models, args[0]), args[1]
+    delete_many(
+        model,
+        [instance_id],
+        cascade=kwargs.get("cascade", False),
+        session=kwargs.get("session"),
+    )
+
+def _association_columns(model) -> Iterator[tuple]:  # noqa: ANN001
+    """Find every association column pointing at model, with its other column."""
+    for table in _association_tables():
+        key_columns = list(table.primary_key.columns)
+        for column in key_columns:
+            if column.references(model.__table__.c.id):
+                [other_column] = [other for other in key_columns if other is not column]
+                yield table, column, other_column
+
+def _model_of(column) -> type[models.Base]:  # noqa: ANN001
+    """Find the synced model a foreign key column points at."""
+    [foreign_key] = column.foreign_keys
+    return next(
+        getattr(models, model_name)
+        for model_name in SYNCED_MODEL_NAMES
+        if getattr(models, model_name).__table__ is foreign_key.column.table
+    )
+
+@handle_session
+def delete_many(
+    model: str | type[models.Base],
+    instance_ids: Iterable[int],
+    *,
+    cascade: bool = False,
+    session: sqlalchemy_sessionmaker | None = None,
+) -> int:
+    """
+    Delete many instances without loading them or their collections.
+
+    Association rows go with set-based DELETEs across every association
+    table, and the instances on the other side get a new modified_at, as
+    they would through the ORM.  With cascade=True, deleting projects also
+    deletes their subprojects, found with a recursive CTE, and every todo
+    contained in any of them, even a todo another project contains too.
+    Returns how many instances were deleted.
+    """
+    model = _resolve_model(model)
+    session.flush()  # type: ignore[attr-defined]
+    to_delete = {model: list(instance_ids)}
+    if cascade and model is models.Project:
+        project_contain_project = models.Base.metadata.tables["project_contain_project"]
+        project_contain_todo = models.Base.metadata.tables["project_contain_todo"]
+        tree = select(
+            models.Project.id.label("id"),
+        ).where(models.Project.id.in_(to_delete[model])).cte("tree", recursive=True)
+        tree = tree.union(
+            select(project_contain_project.c.child_id).join(
+                tree,
+                project_contain_project.c.parent_id == tree.c.id,
+            ),
+        )
+        rows = session.execute(  # type: ignore[attr-defined]
+            select(literal("Project").label("model_name"), tree.c.id).union(
+                select(literal("Todo"), project_contain_todo.c.todo_id).join(
+                    tree,
+                    project_contain_todo.c.project_id == tree.c.id,
+                ),
+            ),
+        ).all()
+        to_delete = {
+            getattr(models, model_name): [
+                row.id for row in rows if row.model_name == model_name
+            ]
+            for model_name in ("Todo", "Project")
+        }
+
+    deleted = 0
+    for model, ids in to_delete.items():
+        for start in range(0, len(ids), DELETE_CHUNK_SIZE):
+            deleted += _delete_chunk(session, model, ids[start:start + DELETE_CHUNK_SIZE])
+
+    # Loaded instances may still hold the deleted ones in their collections.
+    for model, ids in to_delete.items():
+        for instance_id in ids:
+            identity_key = session.identity_key(model, instance_id)  # type: ignore[attr-defined]
+            if (instance := session.identity_map.get(identity_key)) is not None:  # type: ignore[attr-defined]
+                session.expunge(instance)  # type: ignore[attr-defined]
+    session.expire_all()  # type: ignore[attr-defined]
+    return deleted
+
+def _association_tables() -> Iterator:
+    """Tables whose primary key is made of foreign keys only."""
+    for table in models.Base.metadata.tables.values():
+        if all(column.foreign_keys for column in table.primary_key.columns):
+            yield table
+
+@handle_session
+def archive_completed(
+    older_than: timedelta = ARCHIVE_AFTER,
+    *,
+    now: datetime | None = None,
+    session: sqlalchemy_sessionmaker | None = None,
+) -> int:
+    """
+    Move completed todos and projects out of the hot tables.
+
+    Instances completed, and not modified since, more than older_than ago
+    go to the archive tables, and their association rows to ArchivedLink,
+    with INSERT ... SELECT and DELETE statements and nothing loaded.  The
+    todo and project tables, which every get() and move() works on, then
+    only hold live instances.  get(include_completed=True) reads both, but
+    archived instances come back without their relationships and only
+    unarchive() brings them back within reach of delete(), move() and
+    mark_completed().  Returns how many instances were archived.
+    """
+    if not hasattr(models, "ArchivedLink"):
+        raise models.too_old("Archiving", "81bb304d61c8")
+    cutoff = (datetime.now() if now is None else now) - older_than
+    archived = {
+        model: select(model.id).where(
+            model.state == models.enums.State.completed,
+            model.modified_at < cutoff,
+            # A todo still carrying a recurrence rule has to stay put for
+            # materialize_recurring() to find it.
+            *([model.recurrence == None] if hasattr(model, "recurrence") else []),  # noqa: E711
+        )
+        for model in (models.Todo, models.Project)
+    }
+    session.flush()  # type: ignore[attr-defined]
+
+    for table in _association_tables():
+        left_column, right_column = table.primary_key.columns
+        conditions = [
+            column.in_(ids)
+            for column in (left_column, right_column)
+            for model, ids in archived.items()
+            if column.references(model.__table__.c.id)
+        ]
+        if not conditions:
+            continue
+        archived_rows = or_(*conditions)
+        session.execute(sqlalchemy_insert(models.ArchivedLink).from_select(  # type: ignore[attr-defined]
+            ["table_name", "left_id", "right_id"],
+            select(literal(table.name), left_column, right_column).where(archived_rows),
+        ))
+        session.execute(sqlalchemy_delete(table).where(archived_rows))  # type: ignore[attr-defined]
+
+    count = 0
+    for model, ids in archived.items():
+        archive = _archive_of(model)
+        columns = [
+            column.name
+            for column in archive.__table__.columns
+            if column.name != "archived_at"
+        ]
+        session.execute(sqlalchemy_insert(archive).from_select(  # type: ignore[attr-defined]
+            columns,
+            select(*(model.__table__.c[column] for column in columns)).where(
+                model.id.in_(ids),
+            ),
+        ))
+        count += session.execute(  # type: ignore[attr-defined]
+            sqlalchemy_delete(model)
+            .where(model.id.in_(ids))
+            .execution_options(synchronize_session=False),
+        ).rowcount
+    if count:
+        # Instances linked to archived ones lost those links too.
+        for model_name in SYNCED_MODEL_NAMES:
+            invalidation.record(session, model_name)
+    session.expire_all()  # type: ignore[attr-defined]
+    return count
+
+@handle_session
+def unarchive(
+    model: str | type[models.Base],
+    instance_ids: Iterable[int],
+    *,
+    session: sqlalchemy_sessionmaker | None = None,
+) -> int:
+    """
+    Move archived instances back, with their ids and association rows.
+
+    They go to the end of their lists, since their old positions may have
+    been taken.  Association rows to instances that are still archived stay
+    archived until those are brought back too.  Returns how many instances
+    were brought back.
+    """
+    model = _resolve_model(model)
+    archive = _archive_of(model)
+    instance_ids = list(instance_ids)
+    rows = [
+        {
+            column.name: getattr(instance, column.key)
+            for column in archive.__table__.columns
+            if column.name not in ("display_position", "modified_at", "archived_at")
+        }
+        for instance in session.scalars(  # type: ignore[attr-defined]
+            select(archive)
+            .where(archive.id.in_(instance_ids))
+            .order_by(archive.display_position),
+        )
+    ]
+    if not rows:
+        return 0
+    _lock_ordering(session, model.__tablename__)
+    # Core inserts, so display_position gets the append-at-the-end default.
+    session.execute(sqlalchemy_insert(model.__table__), rows)  # type: ignore[attr-defined]
+    session.execute(sqlalchemy_delete(archive).where(archive.id.in_(instance_ids)))  # type: ignore[attr-defined]
+    invalidation.record(session, model.__name__, [row["id"] for row in rows])
+
+    link = models.ArchivedLink
+    for table in _association_tables():
+        left_column, right_column = table.primary_key.columns
+        if not any(
+            column.references(model.__table__.c.id)
+            for column in (left_column, right_column)
+        ):
+            continue
+        [left_table] = {key.column.table for key in left_column.foreign_keys}
+        [right_table] = {key.column.table for key in right_column.foreign_keys}
+        restorable = select(link.id, link.left_id, link.right_id).where(
+            link.table_name == table.name,
+            or_(*(
+                link_column.in_(instance_ids)
+                for column, link_column in (
+                    (left_column, link.left_id),
+                    (right_column, link.right_id),
+                )
+                if column.references(model.__table__.c.id)
+            )),
+            link.left_id.in_(select(left_table.c.id)),
+            link.right_id.in_(select(right_table.c.id)),
+        )
+        links = session.execute(restorable).all()  # type: ignore[attr-defined]
+        if links:
+            session.execute(sqlalchemy_insert(table), [  # type: ignore[attr-defined]
+                {left_column.name: row.left_id, right_column.name: row.right_id}
+                for row in links
+            ])
+            session.execute(sqlalchemy_delete(link).where(  # type: ignore[attr-defined]
+                link.id.in_([row.id for row in links]),
+            ))
+            for column, ids in (
+                (left_column, [row.left_id for row in links]),
+                (right_column, [row.right_id for row in links]),
+            ):
+                invalidation.record(session, _model_of(column).__name__, ids)  # type: ignore[arg-type]
+    session.expire_all()  # type: ignore[attr-defined]
+    return len(rows)
+
+def _delete_chunk(session, model, ids: list[int]) -> int:  # noqa: ANN001
+    for table, column, other_column in _association_columns(model):
+        other_model = _model_of(other_column)
+        if invalidation.installed():
+            invalidation.record(
+                session,
+                other_model.__name__,
+                session.scalars(select(other_column).where(column.in_(ids))).all(),
+            )
+        if hasattr(other_model, "modified_at"):
+            session.execute(
+                update(other_model)
+                .where(other_model.id.in_(
+                    select(other_column).where(column.in_(ids)),
+                ))
+                .values(modified_at=func.now())
+                .execution_options(synchronize_session=False),
+            )
+        session.execute(sqlalchemy_delete(table).where(column.in_(ids)))
+    if hasattr(models, "Tombstone"):
+        session.execute(sqlalchemy_insert(models.Tombstone).from_select(
+            ["model", "instance_id"],
+            select(literal(model.__name__), model.id).where(model.id.in_(ids)),
+        ))
+    invalidation.record(session, model.__name__, ids)
+    return session.execute(
+        sqlalchemy_delete(model)
+        .where(model.id.in_(ids))
+        .execution_options(synchronize_session=False),
+    ).rowcount
 
 @overload
 def mark_completed(
@@ -172,18 +1108,228 @@ def mark_completed(
     *args,
     **kwargs,
 ) -> None:
-    """Mark an instance as completed."""
+    """
+    Mark an instance as completed.
+
+    With version columns this is a single UPDATE, which for an instance
+    also compares its version, raising ConflictError if another writer got
+    there first.  The instance is updated to match.
+    """
+    session = kwargs.get("session")
     if len(args) == 1:
         instance = args[0]
+        model, instance_id = type(instance), instance.id
     else:
-        session = kwargs.get("session")
-        instance = get(
-            args[0],
-            filter_by={"id": args[1]},
-            session=session,
-            include_future_show_from=True,
-        )[0]
-    instance.state = models.enums.State.completed
+        instance = None
+        model, instance_id = getattr(models, args[0]), args[1]
+    if not hasattr(model, "version"):
+        if instance is None:
+            instance = get(
+                args[0],
+                filter_by={"id": args[1]},
+                session=session,
+                include_future_show_from=True,
+            )[0]
+        instance.state = models.enums.State.completed
+        return
+    if instance is not None and instance in session:
+        session.flush()
+    statement = update(model).where(model.id == instance_id)
+    if instance is not None:
+        statement = statement.where(model.version == instance.version)
+    completed = session.execute(
+        statement
+        .values(state=models.enums.State.completed, version=model.version + 1)
+        .execution_options(synchronize_session=False),
+    ).rowcount
+    if not completed:
+        if instance is None or session.scalar(
+            select(model.id).where(model.id == instance_id),
+        ) is None:
+            raise ValueError(f"There is no {model.__name__} {instance_id}.")
+        raise ConflictError(
+            f"{model.__name__} {instance_id} was changed since version {instance.version}.",
+        )
+    invalidation.record(session, model.__name__, [instance_id])
+    if instance is not None:
+        attributes.set_committed_value(instance, "state", models.enums.State.completed)
+        attributes.set_committed_value(instance, "version", instance.version + 1)
+    identity_key = session.identity_key(model, instance_id)
+    if (loaded := session.identity_map.get(identity_key)) not in (None, instance):
+        session.expire(loaded)
+
+def _id_of(instance: models.Base | int) -> int:
+    return instance if isinstance(instance, int) else instance.id
+
+def _touch(session, model, ids: Iterable[int]) -> None:  # noqa: ANN001
+    """
+    Record a relationship change made without the ORM.
+
+    The before_flush listener never sees these writes, so bump modified_at
+    for the change feed here, note them for the invalidation bus, and expire
+    any loaded instances so their collections are reloaded.
+    """
+    ids = list(ids)
+    invalidation.record(session, model.__name__, ids)
+    if hasattr(model, "modified_at"):
+        session.execute(
+            update(model)
+            .where(model.id.in_(ids))
+            .values(modified_at=func.now())
+            .execution_options(synchronize_session=False),
+        )
+    for instance_id in ids:
+        identity_key = session.identity_key(model, instance_id)
+        if (instance := session.identity_map.get(identity_key)) is not None:
+            session.expire(instance)
+
+def _link(  # noqa: PLR0913
+    session,  # noqa: ANN001
+    table_name: str,
+    one_column: str,
+    one: tuple[type[models.Base], int],
+    many_column: str,
+    many: tuple[type[models.Base], Iterable[int]],
+) -> int:
+    """
+    Link one instance to many in one INSERT ... SELECT.
+
+    Pairs that already exist are skipped by the database, and ids with no
+    row behind them are dropped by the SELECT, so nothing is loaded first.
+    """
+    table = models.Base.metadata.tables[table_name]
+    one_model, one_id = one
+    many_model, many_ids = many
+    many_ids = list(many_ids)
+    rows = select(
+        bindparam("one_id", one_id, type_=table.c[one_column].type),
+        many_model.id,
+    ).where(many_model.id.in_(many_ids))
+    dialect = {"postgresql": postgresql, "sqlite": sqlite}.get(
+        session.connection().dialect.name,
+    )
+    if dialect is not None:
+        statement = dialect.insert(table).from_select(
+            [one_column, many_column],
+            rows,
+        ).on_conflict_do_nothing()
+    else:
+        statement = sqlalchemy_insert(table).from_select(
+            [one_column, many_column],
+            rows.where(~select(table).where(
+                table.c[one_column] == one_id,
+                table.c[many_column] == many_model.id,
+            ).exists()),
+        )
+    linked = session.execute(statement).rowcount
+    if linked:
+        _touch(session, one_model, [one_id])
+        _touch(session, many_model, many_ids)
+    return linked
+
+def _unlink(  # noqa: PLR0913
+    session,  # noqa: ANN001
+    table_name: str,
+    one_column: str,
+    one: tuple[type[models.Base], int],
+    many_column: str,
+    many: tuple[type[models.Base], Iterable[int]],
+) -> int:
+    """Unlink one instance from many in one DELETE."""
+    table = models.Base.metadata.tables[table_name]
+    one_model, one_id = one
+    many_model, many_ids = many
+    many_ids = list(many_ids)
+    unlinked = session.execute(sqlalchemy_delete(table).where(
+        table.c[one_column] == one_id,
+        table.c[many_column].in_(many_ids),
+    )).rowcount
+    if unlinked:
+        _touch(session, one_model, [one_id])
+        _touch(session, many_model, many_ids)
+    return unlinked
+
+@handle_session
+def tag_many(
+    tag: models.Base | int,
+    instance_ids: Iterable[int],
+    *,
+    model: str = "Todo",
+    session: sqlalchemy_sessionmaker | None = None,
+) -> int:
+    """
+    Tag many todos, or projects, without loading them.
+
+    Returns how many were newly tagged.  Ids that are already tagged, or do
+    not exist, are skipped.
+    """
+    table_name, column = TAG_TABLES[model]
+    return _link(
+        session,
+        table_name,
+        "tag_id",
+        (models.Tag, _id_of(tag)),
+        column,
+        (getattr(models, model), instance_ids),
+    )
+
+@handle_session
+def untag_many(
+    tag: models.Base | int,
+    instance_ids: Iterable[int],
+    *,
+    model: str = "Todo",
+    session: sqlalchemy_sessionmaker | None = None,
+) -> int:
+    """Untag many todos, or projects, without loading them.  Returns how many were untagged."""
+    table_name, column = TAG_TABLES[model]
+    return _unlink(
+        session,
+        table_name,
+        "tag_id",
+        (models.Tag, _id_of(tag)),
+        column,
+        (getattr(models, model), instance_ids),
+    )
+
+@handle_session
+def attach_notes(
+    instance: models.Base | int,
+    note_ids: Iterable[int],
+    *,
+    model: str = "Todo",
+    session: sqlalchemy_sessionmaker | None = None,
+) -> int:
+    """Attach many notes to a todo, or project, without loading them.  Returns how many were attached."""
+    table_name, column = NOTE_TABLES[model]
+    return _link(
+        session,
+        table_name,
+        column,
+        (getattr(models, model), _id_of(instance)),
+        "note_id",
+        (models.Note, note_ids),
+    )
+
+@handle_session
+def link_prereqs(
+    instance: models.Base | int,
+    prereq_ids: Iterable[int],
+    *,
+    model: str = "Todo",
+    prereq_model: str = "Todo",
+    session: sqlalchemy_sessionmaker | None = None,
+) -> int:
+    """Make many todos, or projects, prereqs of a todo or project without loading them.  Returns how many were linked."""
+    table_name, column, prereq_column = PREREQ_TABLES[model, prereq_model]
+    return _link(
+        session,
+        table_name,
+        column,
+        (getattr(models, model), _id_of(instance)),
+        prereq_column,
+        (getattr(models, prereq_model), prereq_ids),
+    )
 
 def _move_to_boundary(
     instance: models.Base,
@@ -209,170 +1355,588 @@ def _move_to_boundary(
         else boundary_display_position + 1
     )
 
-
+@handle_session(retry=True)
 def move(
     *args,
+    **kwargs,
 ) -> None:
-    """Move an instance to a new display position. Unlike other backend function, this cannot be called with an existing session."""
+    """
+    Move an instance to a new display position.
+
+    Pass within=project to move a todo within that project's own list
+    instead of the global one.
+    """
+    session = kwargs.get("session")
     fix_offsets = False
-    with sessionmaker() as session, session.begin():
-        if len(args) < 2:
+    if len(args) < 2:
+        raise ValueError(
+            f"You must provide at least two args."
+        )
+    if (within := kwargs.get("within")) is not None:
+        _move_within_project(
+            session,
+            args[0].id if len(args) == 2 else args[1],
+            within if isinstance(within, int) else within.id,
+            args[-1],
+        )
+        return
+    _lock_ordering(
+        session,
+        (type(args[0]) if len(args) == 2 else getattr(models, args[0])).__tablename__,
+    )
+    if len(args) == 2:
+        instance = args[0]
+        instance = session.merge(instance)
+    else:
+        try:
+            instance = session.scalars(
+                select(getattr(models, args[0])).filter_by(id=args[1])
+            ).unique().one()
+        except NoResultFound:
             raise ValueError(
-                f"You must provide at least two args."
+                f"There must be exactly one {args[0]} to move."
             )
-        if len(args) == 2:
-            instance = args[0]
-            instance = session.merge(instance)
-        else:
-            try:
-                instance = session.scalars(
-                    select(getattr(models, args[0])).filter_by(id=args[1])
-                ).unique().one()
-            except NoResultFound:
-                raise ValueError(
-                    f"There must be exactly one {args[0]} to move."
-                )
 
-        instance_id = instance.id
-
-        if isinstance(args[-1], models.Base):
-            new_display_position = args[-1].display_position
-        else:
-            new_display_position = args[-1]
+    if isinstance(args[-1], models.Base):
+        new_display_position = args[-1].display_position
+    else:
+        new_display_position = args[-1]
 
-        # special cases
-        if new_display_position == "start" or new_display_position == "end":
-            _move_to_boundary(instance, session, start=(new_display_position == "start"))
-            return
+    # special cases
+    if new_display_position == "start" or new_display_position == "end":
+        _move_to_boundary(instance, session, start=(new_display_position == "start"))
+        return
 
-        new_display_position = int(new_display_position)
+    new_display_position = int(new_display_position)
 
-        # no real change
-        if instance.display_position == new_display_position:
-            return
+    # no real change
+    if instance.display_position == new_display_position:
+        return
 
-        display_position_column = getattr(
-            type(instance),
-            "display_position",
-        )
+    display_position_column = getattr(
+        type(instance),
+        "display_position",
+    )
 
-        # look for empty spot
-        try:
-            blocking_instance = session.scalars(
-                select(type(instance)).filter_by(
-                    display_position=new_display_position,
-                )
-            ).unique().one()
-        except NoResultFound:
-            instance.display_position = new_display_position
-            return
-        blocking_instance_id = blocking_instance.id
+    # look for empty spot
+    try:
+        blocking_instance = session.scalars(
+            select(type(instance)).filter_by(
+                display_position=new_display_position,
+            )
+        ).unique().one()
+    except NoResultFound:
+        instance.display_position = new_display_position
+        return
 
-        toward_start = instance.display_position > new_display_position
+    toward_start = instance.display_position > new_display_position
 
-        try:
-            next_instance = session.scalars(
-                select(type(instance)).where(
-                    display_position_column < new_display_position
-                    if toward_start
-                    else display_position_column > new_display_position
-                ).order_by(
-                    desc(display_position_column) if toward_start else display_position_column
-                ).limit(1)).unique().one()
-        except NoResultFound:
-            # we asked for the start or the end
+    try:
+        next_instance = session.scalars(
+            select(type(instance)).where(
+                display_position_column < new_display_position
+                if toward_start
+                else display_position_column > new_display_position
+            ).order_by(
+                desc(display_position_column) if toward_start else display_position_column
+            ).limit(1)).unique().one()
+    except NoResultFound:
+        # we asked for the start or the end
+        instance.display_position = (
+            new_display_position - 1
+            if toward_start
+            else new_display_position + 1
+        )
+    else:
+        if abs(new_display_position - next_instance.display_position) > 1:
+            # there's room in between the requested position and the next position, so use it
             instance.display_position = (
                 new_display_position - 1
                 if toward_start
                 else new_display_position + 1
             )
         else:
-            if abs(new_display_position - next_instance.display_position) > 1:
-                # there's room in between the requested position and the next position, so use it
-                instance.display_position = (
-                    new_display_position - 1
-                    if toward_start
-                    else new_display_position + 1
-                )
-            else:
-                # we need to move stuff to make room
-
-                # This is the logic if we are moving toward the start:
-                # Find highest empty display position between the input instance and new_display_position
-                # (which is occupied by blocking_instance), not inclusive of these endpoints.
-                # If there are none, then the *low* limit of the range we need to move is the
-                # input instance (except that we will be moving the input instance, so we really need to stop
-                # moving at the one next to the input instance, on the high side).  If there is one, then the
-                # low limit of the range we need to move is the one next to the empty display position, on the
-                # high side.  The high limit of the range we need to move is blocking_instance.  All within the
-                # range are moved one display position *lower*.  Then the input instance is assigned new_display_position.
-
-                # The logic for moving toward the end is reserved.
-
-                fix_offsets = True
-                updated_instance_ids = set()
-
-                in_between_query_range = and_(
-                    display_position_column > blocking_instance.display_position,
-                    display_position_column < instance.display_position,
-                ) if toward_start else and_(
-                    display_position_column < blocking_instance.display_position,
-                    display_position_column > instance.display_position,
-                )
+            # we need to move stuff to make room
 
-                in_between_order_by = display_position_column if toward_start else desc(display_position_column)
+            # This is the logic if we are moving toward the start:
+            # Find highest empty display position between the input instance and new_display_position
+            # (which is occupied by blocking_instance), not inclusive of these endpoints.
+            # If there are none, then the *low* limit of the range we need to move is the
+            # input instance (except that we will be moving the input instance, so we really need to stop
+            # moving at the one next to the input instance, on the high side).  If there is one, then the
+            # low limit of the range we need to move is the one next to the empty display position, on the
+            # high side.  The high limit of the range we need to move is blocking_instance.  All within the
+            # range are moved one display position *lower*.  Then the input instance is assigned new_display_position.
 
-                in_between_instances = session.scalars(
-                    select(type(instance)).where(in_between_query_range).order_by(in_between_order_by)
-                ).unique().all()
+            # The logic for moving toward the end is reserved.
 
-                display_position_range = range(
-                    blocking_instance.display_position + (1 if toward_start else -1),
-                    instance.display_position,
-                    1 if toward_start else -1,
-                )
+            fix_offsets = True
+            updated_instances = []
+
+            in_between_query_range = and_(
+                display_position_column > blocking_instance.display_position,
+                display_position_column < instance.display_position,
+            ) if toward_start else and_(
+                display_position_column < blocking_instance.display_position,
+                display_position_column > instance.display_position,
+            )
+
+            in_between_order_by = display_position_column if toward_start else desc(display_position_column)
 
-                for in_between_instance, display_position in zip(
-                    in_between_instances,
-                    display_position_range,
-                ):
-                    if in_between_instance.display_position == display_position:
-                        in_between_instance.display_position += (1 if toward_start else -1) + MOVE_OFFSET
-                        updated_instance_ids.add(in_between_instance.id)
-                    else:
-                        break
+            in_between_instances = session.scalars(
+                select(type(instance)).where(in_between_query_range).order_by(in_between_order_by)
+            ).unique().all()
 
-                blocking_instance.display_position += (1 if toward_start else -1) + MOVE_OFFSET
-                instance.display_position = new_display_position + MOVE_OFFSET
+            display_position_range = range(
+                blocking_instance.display_position + (1 if toward_start else -1),
+                instance.display_position,
+                1 if toward_start else -1,
+            )
+
+            for in_between_instance, display_position in zip(
+                in_between_instances,
+                display_position_range,
+            ):
+                if in_between_instance.display_position == display_position:
+                    in_between_instance.display_position += (1 if toward_start else -1) + MOVE_OFFSET
+                    updated_instances.append(in_between_instance)
+                else:
+                    break
+
+            blocking_instance.display_position += (1 if toward_start else -1) + MOVE_OFFSET
+            instance.display_position = new_display_position + MOVE_OFFSET
 
     # We have to play this offset game because sqlite, a DB we want to
-    # support, does not offer deferred unique constraints.
+    # support, does not offer deferred unique constraints.  Flushing first
+    # moves every shifted row out of the way, then a savepoint brings them
+    # back, all inside the caller's transaction.
     if fix_offsets:
-        with sessionmaker() as session, session.begin():
-            updated_instances = session.scalars(select(type(instance)).where(
-                type(instance).id.in_(updated_instance_ids)
-            )).unique().all()
+        session.flush()  # type: ignore[attr-defined]
+        with session.begin_nested():  # type: ignore[attr-defined]
             for updated_instance in updated_instances:
                 updated_instance.display_position -= MOVE_OFFSET
-            if blocking_instance_id is not None:
-                blocking_instance = session.scalars(select(type(instance)).filter_by(
-                    id=blocking_instance_id,
-                )).unique().one()
-                blocking_instance.display_position -= MOVE_OFFSET
-
-            instance = session.scalars(select(type(instance)).filter_by(
-                id=instance_id,
-            )).unique().one()
+            blocking_instance.display_position -= MOVE_OFFSET
             instance.display_position -= MOVE_OFFSET
 
-@handle_session(expunge=True)
+def _move_within_project(
+    session,  # noqa: ANN001
+    todo_id: int,
+    project_id: int,
+    new_display_position: int | str | models.Base,
+) -> None:
+    """
+    Move a todo within one project's list.
+
+    Only that project's project_contain_todo rows are locked, read or
+    shifted.  The rows in between shift with set-based UPDATEs, through
+    MOVE_OFFSET as in move(), because SQLite checks unique constraints
+    row by row.
+    """
+    _lock_ordering(session, "project_contain_todo", project_id)
+    table = models.Base.metadata.tables["project_contain_todo"]
+    display_position_column = table.c.display_position
+    in_project = table.c.project_id == project_id
+
+    def position_of(todo_id: int) -> int:
+        display_position = session.scalar(
+            select(display_position_column).where(
+                in_project,
+                table.c.todo_id == todo_id,
+            ),
+        )
+        if display_position is None:
+            raise ValueError(f"Todo {todo_id} is not in project {project_id}.")
+        return display_position
+
+    display_position = position_of(todo_id)
+    moved = update(table).where(in_project, table.c.todo_id == todo_id)
+
+    if new_display_position == "start" or new_display_position == "end":
+        boundary_display_position = session.scalar(
+            select(
+                func.min(display_position_column)
+                if new_display_position == "start"
+                else func.max(display_position_column),
+            ).where(in_project),
+        )
+        if boundary_display_position != display_position:
+            session.execute(moved.values(display_position=(
+                boundary_display_position - 1
+                if new_display_position == "start"
+                else boundary_display_position + 1
+            )))
+    else:
+        if isinstance(new_display_position, models.Base):
+            new_display_position = position_of(new_display_position.id)
+        new_display_position = int(new_display_position)
+        if new_display_position == display_position:
+            return
+        toward_start = new_display_position < display_position
+        session.execute(
+            update(table).where(
+                in_project,
+                display_position_column >= new_display_position
+                if toward_start
+                else display_position_column <= new_display_position,
+                display_position_column < display_position
+                if toward_start
+                else display_position_column > display_position,
+            ).values(display_position=(
+                display_position_column + (1 if toward_start else -1) + MOVE_OFFSET
+            )),
+        )
+        session.execute(moved.values(display_position=new_display_position))
+        session.execute(
+            update(table).where(
+                in_project,
+                display_position_column >= MOVE_OFFSET // 2,
+            ).values(display_position=display_position_column - MOVE_OFFSET),
+        )
+
+    invalidation.record(session, "Project", [project_id])
+    # A loaded project would otherwise keep listing its todos in the old order.
+    identity_key = session.identity_key(models.Project, project_id)
+    if (project := session.identity_map.get(identity_key)) is not None:
+        session.expire(project, ["contain_todos"])
+
+@handle_session
+def recover_move_offsets(
+    *,
+    dry_run: bool = False,
+    session: sqlalchemy_sessionmaker | None = None,
+) -> int:
+    """
+    Bring back rows left shifted by MOVE_OFFSET.
+
+    Older versions of move() undid the shift in a second transaction, so a
+    crash in between stranded rows at their position plus MOVE_OFFSET.  The
+    stranded rows are found with a range query on the unique, and so
+    indexed, display_position and shifted back with one UPDATE per model.
+    A row whose old position has since been taken goes to the end instead.
+    Running it again finds nothing to do, so it is safe on every deploy.
+    Returns how many rows were, or with dry_run would be, restored.
+    """
+    restored = 0
+    for model_name in ("Todo", "Project"):
+        model = getattr(models, model_name)
+        display_position_column = model.display_position
+        stranded = display_position_column >= MOVE_OFFSET // 2
+        if dry_run:
+            restored += session.scalar(  # type: ignore[attr-defined]
+                select(func.count()).select_from(model).where(stranded),
+            )
+            continue
+        _lock_ordering(session, model.__tablename__)
+        invalidation.record(session, model_name)
+        occupying = aliased(model)
+        restored += session.execute(  # type: ignore[attr-defined]
+            update(model).where(
+                stranded,
+                ~select(occupying.id).where(
+                    occupying.display_position == display_position_column - MOVE_OFFSET,
+                ).exists(),
+            ).values(
+                display_position=display_position_column - MOVE_OFFSET,
+                **({"version": model.version + 1} if hasattr(model, "version") else {}),
+            ),
+            execution_options={"synchronize_session": "fetch"},
+        ).rowcount
+        # Whatever is left collided with a row placed since the crash.
+        collided = session.scalars(  # type: ignore[attr-defined]
+            select(model).where(stranded).order_by(display_position_column),
+        ).unique().all()
+        if collided:
+            end_display_position = session.scalar(  # type: ignore[attr-defined]
+                select(func.max(display_position_column)).where(~stranded),
+            )
+            for offset, instance in enumerate(collided, start=1):
+                instance.display_position = end_display_position + offset
+            restored += len(collided)
+    return restored
+
+@handle_session
+def repair_counts(
+    *,
+    dry_run: bool = False,
+    session: sqlalchemy_sessionmaker | None = None,
+) -> int:
+    """
+    Recompute the denormalized todo counts of projects and tags.
+
+    Triggers keep the counts current, so this is for after they were off,
+    or rows were written with counts of their own, as import_stream() does.
+    Each model's counts are aggregated in one GROUP BY over its association
+    table, and only rows that disagree are written, in a single UPDATE.
+    Returns how many rows were, or with dry_run would be, repaired.
+    """
+    if not hasattr(models.Project, "todo_count"):
+        raise models.too_old("Counting todos", "5b0e6c2f9a41")
+    todo = models.Todo
+    active = todo.state == models.enums.State.active
+    repaired = 0
+    for model_name, (table_name, column_name) in COUNTED_TABLES.items():
+        model = getattr(models, model_name)
+        table = models.Base.metadata.tables[table_name]
+        counts = (
+            select(
+                model.id,
+                func.count(todo.id).label("todo_count"),
+                func.count(case((active, 1))).label("active_todo_count"),
+                func.count(case((and_(active, todo.overdue), 1))).label(
+                    "overdue_todo_count",
+                ),
+            )
+            .select_from(model)
+            .outerjoin(table, table.c[column_name] == model.id)
+            .outerjoin(todo, todo.id == table.c.todo_id)
+            .group_by(model.id)
+            .subquery()
+        )
+        count_names = ("todo_count", "active_todo_count", "overdue_todo_count")
+        wrong = and_(
+            model.id == counts.c.id,
+            or_(*(getattr(model, name) != counts.c[name] for name in count_names)),
+        )
+        if dry_run:
+            repaired += session.scalar(  # type: ignore[attr-defined]
+                select(func.count()).select_from(model).join(counts, wrong),
+            )
+            continue
+        repaired += session.execute(  # type: ignore[attr-defined]
+            update(model)
+            .where(wrong)
+            # Counts are not changes of the instance, as with the triggers.
+            .values(
+                modified_at=model.modified_at,
+                **{name: counts.c[name] for name in count_names},
+            )
+            .execution_options(synchronize_session=False),
+        ).rowcount
+        invalidation.record(session, model_name)
+    session.expire_all()  # type: ignore[attr-defined]
+    return repaired
+
+def bucketed_clock(
+    resolution: timedelta = timedelta(minutes=1),
+    clock: Callable[[], datetime] = datetime.now,
+) -> Callable[[], datetime]:
+    """
+    Make a clock that only moves every resolution.
+
+    Reads through it see the same time, and so the same results, for the
+    whole of a time bucket, which makes them cacheable per bucket.
+    """
+    def bucketed() -> datetime:
+        now = clock()
+        return now - (now - datetime.min) % resolution
+    return bucketed
+
+@handle_session(read_only=True)
+def get_agenda(  # noqa: PLR0913
+    start: datetime | None = None,
+    end: datetime | None = None,
+    *,
+    model: str | type[models.Base] = "Todo",
+    clock: Callable[[], datetime] = datetime.now,
+    include_completed: bool = False,
+    session: sqlalchemy_sessionmaker | None = None,
+) -> dict[str, list[models.Base]]:
+    """
+    Get instances that are due, bucketed by urgency.
+
+    Instances due in [start, end) are returned in the buckets of
+    AGENDA_BUCKETS, which are assigned in SQL relative to clock(): overdue,
+    due today, due before next Monday, or later.  start defaults to
+    everything overdue and end to the end of this week.  Instances that are
+    not shown yet are left out.
+    """
+    model = _resolve_model(model)
+    now = clock()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    tomorrow = today + timedelta(days=1)
+    next_week = today + timedelta(days=7 - today.weekday())
+
+    bucket = case(
+        (model.due < now, "overdue"),
+        (model.due < tomorrow, "today"),
+        (model.due < next_week, "this_week"),
+        else_="later",
+    )
+    query = select(model, bucket).where(
+        model.due < (next_week if end is None else end),
+        _shown(model, now),
+    ).order_by(model.due, model.display_position)
+    if start is not None:
+        query = query.where(model.due >= start)
+    if not include_completed:
+        query = query.where(model.state == models.enums.State.active)
+
+    agenda: dict[str, list[models.Base]] = {name: [] for name in AGENDA_BUCKETS}
+    for instance, name in session.execute(query).unique():  # type: ignore[attr-defined]
+        agenda[name].append(instance)
+    return agenda
+
+class Workspace(NamedTuple):
+    """
+    An id-indexed snapshot of the workspace, as returned by load_workspace().
+
+    instances maps each model name to its rows by id.  edges maps each model
+    name and relationship name to the related ids by id, so
+    edges["Project"]["contain_todos"][project_id] lists the project's todos
+    in order.
+    """
+
+    instances: dict[str, dict[int, Row]]
+    edges: dict[str, dict[str, dict[int, list[int]]]]
+
+@handle_session(read_only=True)
+def load_workspace(
+    *,
+    include_completed: bool = False,
+    include_future_show_from: bool = False,
+    session: sqlalchemy_sessionmaker | None = None,
+) -> Workspace:
+    """
+    Load every todo, project, note and tag with the edges between them.
+
+    Each table and each association table is read exactly once with a flat
+    query, and the read model is put together in memory, so the result
+    grows linearly with the data instead of repeating joined graphs.  Rows
+    are those get_rows() returns.  Filtering matches get(), and edges to
+    instances left out by it are dropped.
+    """
+    instances = {
+        model_name: {
+            row.id: row
+            for row in get_rows(
+                model_name,
+                include_completed=include_completed,
+                include_future_show_from=include_future_show_from,
+                session=session,
+            )
+        }
+        for model_name in SYNCED_MODEL_NAMES
+    }
+
+    links: dict[str, list[Row]] = {}
+    edges: dict[str, dict[str, dict[int, list[int]]]] = {}
+    for model_name in SYNCED_MODEL_NAMES:
+        edges[model_name] = {}
+        for relationship in inspect(getattr(models, model_name)).relationships:
+            if relationship.secondary is None:
+                continue
+            table = relationship.secondary
+            if table.name not in links:
+                query = select(table)
+                if "display_position" in table.c:
+                    query = query.order_by(table.c.display_position)
+                links[table.name] = session.execute(query).all()  # type: ignore[attr-defined]
+            [(_, key_column)] = relationship.synchronize_pairs
+            [(_, value_column)] = relationship.secondary_synchronize_pairs
+            keys = instances[model_name]
+            values = instances[relationship.mapper.class_.__name__]
+            adjacency = edges[model_name][relationship.key] = {
+                instance_id: [] for instance_id in keys
+            }
+            for link in links[table.name]:
+                key, value = link._mapping[key_column], link._mapping[value_column]
+                if key in keys and value in values:
+                    adjacency[key].append(value)
+    return Workspace(instances=instances, edges=edges)
+
+class Changes(NamedTuple):
+    """What changed since a watermark, as returned by changes_since()."""
+
+    updated: dict[str, list[models.Base]]
+    deleted: dict[str, list[int]]
+    watermark: datetime | None
+
+@handle_session(read_only=True)
+def changes_since(
+    watermark: datetime | None,
+    *,
+    session: sqlalchemy_sessionmaker | None = None,
+) -> Changes:
+    """
+    Get the instances inserted, updated or deleted since a watermark.
+
+    Pass None to get everything, then pass the returned watermark to the
+    next call.  A change is timestamped when its transaction began, so the
+    returned watermark is held back by models.util.COMMIT_WINDOW from the
+    database clock: every change committed within that long of its
+    transaction beginning is returned by some call, and the changes of the
+    last COMMIT_WINDOW come back on every call.  Changes, including those
+    at the watermark, may thus be returned more than once and should be
+    applied idempotently.
+    """
+    if not hasattr(models, "Tombstone"):
+        raise models.too_old("The change feed", "fd6249b0b314")
+    latest = [] if watermark is None else [watermark]
+    updated = {}
+    for model_name in SYNCED_MODEL_NAMES:
+        model = getattr(models, model_name)
+        updated[model_name] = get(
+            model,
+            where=None if watermark is None else model.modified_at >= watermark,
+            include_completed=True,
+            include_future_show_from=True,
+            session=session,
+        )
+        latest.extend(instance.modified_at for instance in updated[model_name])
+
+    deleted: dict[str, list[int]] = {
+        model_name: []
+        for model_name in SYNCED_MODEL_NAMES
+    }
+    query = select(
+        models.Tombstone.model,
+        models.Tombstone.instance_id,
+        models.Tombstone.deleted_at,
+    ).order_by(models.Tombstone.deleted_at)
+    if watermark is not None:
+        query = query.where(models.Tombstone.deleted_at >= watermark)
+    for tombstone in session.execute(query):  # type: ignore[attr-defined]
+        deleted.setdefault(tombstone.model, []).append(tombstone.instance_id)
+        latest.append(tombstone.deleted_at)
+
+    held_back = models.util.hold_back(session, max(latest, default=None))
+    return Changes(
+        updated=updated,
+        deleted=deleted,
+        # Never behind the watermark passed in, which was held back already.
+        watermark=held_back if watermark is None else max(watermark, held_back),
+    )
+
+@handle_session
+def purge_tombstones(
+    before: datetime,
+    *,
+    session: sqlalchemy_sessionmaker | None = None,
+) -> None:
+    """Forget deletions older than every client's watermark."""
+    session.execute(  # type: ignore[attr-defined]
+        sqlalchemy_delete(models.Tombstone).where(
+            models.Tombstone.deleted_at < before,
+        ),
+    )
+
+@handle_session(read_only=True)
 def search(
     *args,
     **kwargs,
 ) -> list[models.Base]:
-    """Search all models by primary descriptor."""
+    """
+    Search all models by primary descriptor.
+
+    Pass fuzzy=True to match by trigram similarity instead, tolerating
+    typos, with the most similar instances of each model first.  This needs
+    Postgres with pg_trgm, from database version 3f585508923b; see
+    pydiditbackend.autocomplete for an in-memory alternative.
+    """
     # TODO (alincoln) add switches to include completed or future show from
     session = kwargs.get("session")
+    if kwargs.get("fuzzy"):
+        return _search_similar(args[0], session)
     instances = []
     for model_name in ("Todo", "Project", "Tag", "Note"):
         model = getattr(models, model_name)
@@ -386,6 +1950,31 @@ def search(
         ))
     return instances
 
+def _search_similar(text: str, session) -> list[models.Base]:  # noqa: ANN001
+    if session.connection().dialect.name != "postgresql":
+        raise models.UnsupportedDatabaseError("Fuzzy search needs Postgres with pg_trgm.")
+    instances = []
+    for model_name in ("Todo", "Project", "Tag", "Note"):
+        model = getattr(models, model_name)
+        descriptor = getattr(model, model.primary_descriptor)
+        query, parameters = _filter(
+            None,
+            lambda model=model: select(model),
+            model,
+            filter_by=None,
+            include_completed=False,
+            include_future_show_from=False,
+            # % is the pg_trgm similarity operator, which the trigram
+            # indexes serve.
+            where=descriptor.op("%")(text),
+            ordered=False,
+        )
+        instances.extend(session.scalars(
+            query.order_by(desc(func.similarity(descriptor, text))),
+            parameters,
+        ).unique())
+    return instances
+
 """
 if __name__ == "__main__":
     prepare(sqlalchemy_sessionmaker(create_engine(os.environ["PYDIDIT_DB_URL"])))
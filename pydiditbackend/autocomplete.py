@@ -0,0 +1,262 @@
+"""
+In-memory autocompletion of tag names and todo and project descriptions.
+
+An Autocompleter loads the searchable text once and answers every keystroke
+from memory: prefix queries by bisecting a sorted array holding every word
+suffix of every entry, and typo tolerant queries by trigram similarity, as
+pg_trgm computes it.  It stays current by applying change notifications
+(see pydiditbackend.notify) one row at a time.
+
+    completer = Autocompleter()
+    completer.complete("gro")     # "groceries", "buy groceries", ...
+    completer.fuzzy("grocreies")  # "groceries", ...
+    completer.stop()
+
+On Postgres, pydiditbackend.search(text, fuzzy=True) ranks by pg_trgm
+similarity in the database instead.
+"""
+
+import heapq
+import itertools
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+from functools import lru_cache
+from typing import NamedTuple, Self
+
+import pydiditbackend
+from pydiditbackend.notify import ChangeEvent
+
+AUTOCOMPLETE_MODEL_NAMES = ("Tag", "Todo", "Project")
+LIMIT = 10
+SIMILARITY_THRESHOLD = 0.3
+# Entries scored per fuzzy query, at most.
+CANDIDATE_LIMIT = 1000
+WORD_CACHE_SIZE = 65536
+
+_WORD = re.compile(r"\w+")
+
+
+class Match(NamedTuple):
+    """An autocompletion, best first."""
+
+    model: str
+    id: int
+    text: str
+    score: float
+
+
+@lru_cache(maxsize=WORD_CACHE_SIZE)
+def _word_trigrams(word: str) -> frozenset[str]:
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def trigrams(text: str) -> set[str]:
+    """Split text into trigrams the way pg_trgm does."""
+    found: set[str] = set()
+    # Words repeat across entries, so each is split once.
+    found.update(*map(_word_trigrams, _WORD.findall(text.lower())))
+    return found
+
+
+class Autocompleter:
+    """Prefix and fuzzy lookups over the searchable text of the workspace."""
+
+    def __init__(
+        self,
+        model_names: tuple[str, ...] = AUTOCOMPLETE_MODEL_NAMES,
+        *,
+        follow_changes: bool = True,
+        poll_interval: float | None = None,
+    ) -> None:
+        """Load every entry, and follow changes unless told not to."""
+        self.model_names = model_names
+        self._lock = threading.Lock()
+        self._texts: dict[tuple[str, int], str] = {}
+        # (word suffix, model, id), sorted, for prefix queries.
+        self._suffixes: list[tuple[str, str, int]] = []
+        self._trigrams: dict[tuple[str, int], set[str]] = {}
+        self._postings: defaultdict[str, set[tuple[str, int]]] = defaultdict(set)
+        self._subscription = None
+        # Changes are applied one at a time, so a slow read cannot overwrite
+        # what a later change read.
+        self._apply_lock = threading.Lock()
+        # Entries changed while loading, whose loaded rows may be stale.
+        self._changed_while_loading: set[tuple[str, int]] | None = set()
+        # Subscribe first, so nothing written while loading is missed.
+        if follow_changes:
+            kwargs = {} if poll_interval is None else {"poll_interval": poll_interval}
+            self._subscription = pydiditbackend.subscribe(self.apply, **kwargs)
+        loaded = [
+            (model_name, row.id, row.text)
+            for model_name in model_names
+            for row in self._rows(model_name)
+        ]
+        with self._lock:
+            suffixes = []
+            for model_name, instance_id, text in loaded:
+                if (model_name, instance_id) not in self._changed_while_loading:
+                    suffixes.extend(self._index(model_name, instance_id, text))
+            # One sort, rather than an insort per suffix.
+            self._suffixes.extend(suffixes)
+            self._suffixes.sort()
+            self._changed_while_loading = None
+
+    def _rows(self, model_name: str, instance_id: int | None = None) -> list:
+        model = getattr(pydiditbackend.models, model_name)
+        return pydiditbackend.get_rows(
+            model,
+            columns=[
+                model.id,
+                getattr(model, model.primary_descriptor).label("text"),
+            ],
+            filter_by=None if instance_id is None else {"id": instance_id},
+        )
+
+    def _index(
+        self,
+        model_name: str,
+        instance_id: int,
+        text: str,
+    ) -> list[tuple[str, str, int]]:
+        """Index an entry by trigram, returning its suffixes to insert."""
+        key = (model_name, instance_id)
+        self._texts[key] = text
+        self._trigrams[key] = trigrams(text)
+        for trigram in self._trigrams[key]:
+            self._postings[trigram].add(key)
+        lowered = text.lower()
+        return [
+            (lowered[word.start():], model_name, instance_id)
+            for word in _WORD.finditer(lowered)
+        ]
+
+    def _add(self, model_name: str, instance_id: int, text: str) -> None:
+        self._remove(model_name, instance_id)
+        for suffix in self._index(model_name, instance_id, text):
+            insort(self._suffixes, suffix)
+
+    def _remove(self, model_name: str, instance_id: int) -> None:
+        key = (model_name, instance_id)
+        if (text := self._texts.pop(key, None)) is None:
+            return
+        lowered = text.lower()
+        for word in _WORD.finditer(lowered):
+            suffix = (lowered[word.start():], model_name, instance_id)
+            del self._suffixes[bisect_left(self._suffixes, suffix)]
+        for trigram in self._trigrams.pop(key):
+            self._postings[trigram].discard(key)
+
+    def _changed(self, model_name: str, instance_id: int) -> None:
+        if self._changed_while_loading is not None:
+            self._changed_while_loading.add((model_name, instance_id))
+
+    def refresh(self, model_name: str, instance_id: int) -> None:
+        """Reload one entry, dropping it if it is gone or no longer shown."""
+        with self._apply_lock:
+            rows = self._rows(model_name, instance_id)
+            with self._lock:
+                self._changed(model_name, instance_id)
+                self._remove(model_name, instance_id)
+                for row in rows:
+                    self._add(model_name, row.id, row.text)
+
+    def apply(self, event: ChangeEvent) -> None:
+        """Bring the index up to date with a change notification."""
+        for model_name in self.model_names:
+            if event.table == getattr(pydiditbackend.models, model_name).__tablename__:
+                if event.operation == "DELETE":
+                    with self._apply_lock, self._lock:
+                        self._changed(model_name, event.keys["id"])
+                        self._remove(model_name, event.keys["id"])
+                else:
+                    self.refresh(model_name, event.keys["id"])
+
+    def complete(self, prefix: str, *, limit: int = LIMIT) -> list[Match]:
+        """
+        Find entries with a word starting with prefix.
+
+        The first limit entries in alphabetical order of the matching word
+        are returned, those whose whole text starts with prefix first.
+        """
+        prefix = prefix.lower()
+        matches: dict[tuple[str, int], Match] = {}
+        with self._lock:
+            for index in range(
+                bisect_left(self._suffixes, (prefix,)),
+                len(self._suffixes),
+            ):
+                suffix, model_name, instance_id = self._suffixes[index]
+                if not suffix.startswith(prefix) or len(matches) == limit:
+                    break
+                key = (model_name, instance_id)
+                if key not in matches:
+                    text = self._texts[key]
+                    matches[key] = Match(
+                        model_name,
+                        instance_id,
+                        text,
+                        1.0 if text.lower().startswith(prefix) else 0.5,
+                    )
+        return sorted(matches.values(), key=lambda match: -match.score)
+
+    def fuzzy(
+        self,
+        query: str,
+        *,
+        limit: int = LIMIT,
+        threshold: float = SIMILARITY_THRESHOLD,
+    ) -> list[Match]:
+        """
+        Find the entries most similar to query, tolerating typos.
+
+        An entry at threshold similarity shares at least threshold of the
+        query's trigrams, so it has one of the rarest of them beyond that
+        many: only their postings are read for candidates, and the common
+        trigrams, which would make nearly everything a candidate, are not.
+        At most CANDIDATE_LIMIT candidates are then checked, those too long
+        to reach threshold without computing their similarity.
+        """
+        query_trigrams = trigrams(query)
+        with self._lock:
+            by_rarity = sorted(
+                query_trigrams,
+                key=lambda trigram: len(self._postings.get(trigram, ())),
+            )
+            needed = math.ceil(threshold * len(query_trigrams))
+            candidates: set[tuple[str, int]] = set()
+            for trigram in by_rarity[:len(by_rarity) - needed + 1]:
+                candidates.update(self._postings.get(trigram, ()))
+                if len(candidates) >= CANDIDATE_LIMIT:
+                    break
+            # Sharing all the query's trigrams, an entry with more than this
+            # many is still too dissimilar.
+            largest = len(query_trigrams) / threshold if threshold else math.inf
+            scored = []
+            for key in itertools.islice(candidates, CANDIDATE_LIMIT):
+                entry_trigrams = self._trigrams[key]
+                if len(entry_trigrams) > largest:
+                    continue
+                shared = len(query_trigrams & entry_trigrams)
+                score = shared / (len(query_trigrams) + len(entry_trigrams) - shared)
+                if score >= threshold:
+                    scored.append((score, key))
+            best = heapq.nlargest(limit, scored)
+            return [
+                Match(model_name, instance_id, self._texts[model_name, instance_id], score)
+                for score, (model_name, instance_id) in best
+            ]
+
+    def stop(self) -> None:
+        """Stop following changes."""
+        if self._subscription is not None:
+            self._subscription.stop()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
@@ -0,0 +1,239 @@
+"""
+A debug mode for tuning how models load their relationships.
+
+When enabled, every API call is watched for two patterns:
+
+* row explosion, where joined eager loading makes the database return many
+  more raw rows than there are unique entities in the result, and
+* repeated near-identical statements, the signature of N+1 lazy loading.
+
+Calls that cross a threshold are logged as warnings and kept in ``reports``,
+along with the relationships whose collections fanned out the most.
+"""
+
+import logging
+import re
+from collections import Counter, deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import ParamSpec, TypeVar
+
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Engine, Row
+from sqlalchemy.orm import ORMExecuteState, Session
+
+logger = logging.getLogger(__name__)
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+ROW_RATIO_THRESHOLD = 10
+REPEAT_THRESHOLD = 5
+REPORT_LIMIT = 100
+
+_LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+_settings = {
+    "enabled": False,
+    "row_ratio_threshold": ROW_RATIO_THRESHOLD,
+    "repeat_threshold": REPEAT_THRESHOLD,
+}
+
+
+@dataclass
+class CallStats:
+    """What a single API call asked of the database."""
+
+    name: str
+    raw_rows: int = 0
+    unique_entities: int = 0
+    statements: Counter[str] = field(default_factory=Counter)
+    fanouts: dict[str, list[int]] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class Report:
+    """A flagged API call."""
+
+    call: str
+    raw_rows: int
+    unique_entities: int
+    repeated_statements: dict[str, int]
+    relationships: dict[str, tuple[float, int]]
+
+    def __str__(self) -> str:
+        lines = [
+            f"{self.call}: {self.raw_rows} raw rows for "
+            f"{self.unique_entities} entities",
+        ]
+        lines.extend(
+            f"  {key}: mean fan-out {mean:.1f}, max {maximum}"
+            for key, (mean, maximum) in self.relationships.items()
+        )
+        lines.extend(
+            f"  repeated {count}x: {statement}"
+            for statement, count in self.repeated_statements.items()
+        )
+        return "\n".join(lines)
+
+
+reports: deque[Report] = deque(maxlen=REPORT_LIMIT)
+
+_current_call: ContextVar[CallStats | None] = ContextVar(
+    "pydiditbackend_debug_call",
+    default=None,
+)
+
+
+def enable(
+    *,
+    row_ratio_threshold: float = ROW_RATIO_THRESHOLD,
+    repeat_threshold: int = REPEAT_THRESHOLD,
+) -> None:
+    """Turn on debug mode for every engine and session."""
+    _settings["row_ratio_threshold"] = row_ratio_threshold
+    _settings["repeat_threshold"] = repeat_threshold
+    if not _settings["enabled"]:
+        event.listen(Session, "do_orm_execute", _on_orm_execute)
+        event.listen(Engine, "before_cursor_execute", _on_cursor_execute)
+        _settings["enabled"] = True
+
+
+def disable() -> None:
+    """Turn off debug mode."""
+    if _settings["enabled"]:
+        event.remove(Session, "do_orm_execute", _on_orm_execute)
+        event.remove(Engine, "before_cursor_execute", _on_cursor_execute)
+        _settings["enabled"] = False
+
+
+def is_enabled() -> bool:
+    """Whether debug mode is on."""
+    return bool(_settings["enabled"])
+
+
+@contextmanager
+def track_call(name: str) -> Iterator[CallStats | None]:
+    """Collect statistics for one top level API call."""
+    if not _settings["enabled"] or _current_call.get() is not None:
+        yield None
+        return
+    stats = CallStats(name)
+    token = _current_call.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_call.reset(token)
+    _evaluate(stats)
+
+
+def tracked(f: Callable[P, R]) -> Callable[P, R]:
+    """Track every call of an API function."""
+    @wraps(f)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        with track_call(f.__name__):
+            return f(*args, **kwargs)
+    return wrapper
+
+
+def normalize_statement(statement: str) -> str:
+    """Reduce a statement to its shape so near-identical ones compare equal."""
+    return _WHITESPACE_PATTERN.sub(
+        " ",
+        _LITERAL_PATTERN.sub("?", statement),
+    ).strip()
+
+
+def _on_cursor_execute(  # noqa: PLR0913
+    conn,  # noqa: ANN001, ARG001
+    cursor,  # noqa: ANN001, ARG001
+    statement: str,
+    parameters,  # noqa: ANN001, ARG001
+    context,  # noqa: ANN001, ARG001
+    executemany: bool,  # noqa: ARG001, FBT001
+) -> None:
+    if (stats := _current_call.get()) is not None:
+        stats.statements[normalize_statement(statement)] += 1
+
+
+def _on_orm_execute(orm_execute_state: ORMExecuteState):  # noqa: ANN202
+    stats = _current_call.get()
+    if (
+        stats is None
+        or not orm_execute_state.is_select
+        or orm_execute_state.execution_options.get("yield_per")
+        or orm_execute_state.execution_options.get("stream_results")
+    ):
+        return None
+
+    # Freezing keeps every raw row, before any unique() call collapses them.
+    frozen = orm_execute_state.invoke_statement().freeze()
+    entities = {}
+    for row in frozen.data:
+        entity = row[0] if isinstance(row, Row) else row
+        if (state := inspect(entity, raiseerr=False)) is not None:
+            entities[id(entity)] = state
+    if entities:
+        stats.raw_rows += len(frozen.data)
+        stats.unique_entities += len(entities)
+        _record_fanouts(stats, entities.values())
+    return frozen()
+
+
+def _record_fanouts(stats: CallStats, states) -> None:  # noqa: ANN001
+    """Walk loaded collections, noting how many members each one holds."""
+    seen = set()
+    pending = list(states)
+    while pending:
+        state = pending.pop()
+        if state.key in seen:
+            continue
+        seen.add(state.key)
+        for relationship in state.mapper.relationships:
+            if not relationship.uselist or relationship.lazy != "joined":
+                continue
+            if (collection := state.dict.get(relationship.key)) is None:
+                continue
+            stats.fanouts.setdefault(
+                f"{state.class_.__name__}.{relationship.key}",
+                [],
+            ).append(len(collection))
+            pending.extend(inspect(member) for member in collection)
+
+
+def _evaluate(stats: CallStats) -> None:
+    repeated = {
+        statement: count
+        for statement, count in stats.statements.most_common()
+        if count >= _settings["repeat_threshold"]
+    }
+    exploded = (
+        stats.unique_entities > 0
+        and stats.raw_rows / stats.unique_entities
+        >= _settings["row_ratio_threshold"]
+    )
+    if not exploded and not repeated:
+        return
+
+    relationships = {
+        key: (sum(counts) / len(counts), max(counts))
+        for key, counts in sorted(
+            stats.fanouts.items(),
+            key=lambda item: sum(item[1]) / len(item[1]),
+            reverse=True,
+        )
+        if max(counts) > 1
+    }
+    report = Report(
+        call=stats.name,
+        raw_rows=stats.raw_rows,
+        unique_entities=stats.unique_entities,
+        repeated_statements=repeated,
+        relationships=relationships,
+    )
+    reports.append(report)
+    logger.warning("%s", report)
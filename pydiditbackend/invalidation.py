@@ -0,0 +1,540 @@
+"""
+Cache invalidation across processes.
+
+Worker processes sharing a database can cache get() results or display
+positions only if they hear about each other's writes.  Once install() is
+called, every committed write through pydiditbackend, whether put(),
+delete(), mark_completed(), move() or a relationship change, is published
+after the commit as Invalidations naming the model and ids touched.  They
+go to this process's subscribers right away and to other processes over a
+transport:
+
+- PostgresTransport, NOTIFY on a channel of the shared database, sent in
+  the committing transaction itself;
+- SocketTransport, datagrams between Unix sockets in a shared directory;
+- TableTransport, a version table in a SQLite file every process can open.
+
+Cache holds loaded values and drops them when they are invalidated.  A
+listener that loses its transport reopens it and invalidates everything,
+since it may have missed messages meanwhile.
+
+    bus = invalidation.install()
+    cache = invalidation.Cache(bus)
+    todos = cache.get("Todo", "all", lambda: pydiditbackend.get("Todo"))
+    ...
+    invalidation.uninstall()
+"""
+
+import contextlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from collections.abc import Callable, Hashable
+from pathlib import Path
+from typing import NamedTuple, Self
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from pydiditbackend.models import session as session_module
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "pydidit_invalidations"
+POLL_INTERVAL = 0.1
+INVALIDATED_MODEL_NAMES = ("Todo", "Project", "Note", "Tag")
+# More ids than this go out as the whole model, keeping each message below
+# the 8000 byte NOTIFY payload limit.
+MAX_IDS = 200
+# Versions kept by TableTransport for processes that fall behind.
+RETAINED_VERSIONS = 10000
+
+_SESSION_KEY = "pydidit_invalidations"
+_SENT_KEY = "pydidit_invalidations_sent"
+
+_bus: "InvalidationBus | None" = None
+
+
+class Invalidation(NamedTuple):
+    """
+    Instances that may have changed.
+
+    ids is None when any instance of the model may have, and model is None
+    when anything at all may have.
+    """
+
+    model: str | None
+    ids: frozenset[int] | None
+
+
+class PostgresTransport:
+    """NOTIFY and LISTEN on the database itself."""
+
+    def __init__(self, engine, channel: str = CHANNEL) -> None:  # noqa: ANN001
+        """Use engine, which must connect through psycopg to listen."""
+        self.engine = engine
+        self.channel = channel
+        self._connection = None
+
+    def publish(self, payload: str) -> None:
+        with self.engine.begin() as connection:
+            self.publish_in(connection, payload)
+
+    def publish_in(self, connection, payload: str) -> None:  # noqa: ANN001
+        """Notify in connection's transaction, so it goes out on commit."""
+        connection.execute(select(func.pg_notify(self.channel, payload)))
+
+    def open(self) -> None:
+        self._connection = self.engine.raw_connection()
+        driver_connection = self._connection.driver_connection
+        driver_connection.autocommit = True
+        driver_connection.execute(f"LISTEN {self.channel}")
+
+    def receive(self, timeout: float) -> list[str]:
+        return [
+            notification.payload
+            for notification in self._connection.driver_connection.notifies(
+                timeout=timeout,
+            )
+        ]
+
+    def close(self) -> None:
+        if self._connection is not None:
+            # The connection was switched to autocommit, so keep it out of
+            # the pool.
+            self._connection.invalidate()
+            self._connection = None
+
+
+class SocketTransport:
+    """
+    Datagrams between Unix sockets in one directory.
+
+    Each listening process binds a socket in the directory, and publishing
+    sends to every socket there, removing those nobody listens on anymore.
+    Sends never block: a listener too far behind to take a message misses
+    it, rather than stalling every writer.
+    """
+
+    def __init__(self, directory: str | Path) -> None:
+        """Use directory, which is created if missing."""
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._path: Path | None = None
+        self._socket: socket.socket | None = None
+
+    def publish(self, payload: str) -> None:
+        data = payload.encode()
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+            sender.setblocking(False)
+            for path in self.directory.glob("*.sock"):
+                if path == self._path:
+                    continue
+                try:
+                    sender.sendto(data, str(path))
+                except (ConnectionRefusedError, FileNotFoundError):
+                    path.unlink(missing_ok=True)
+                except BlockingIOError:
+                    logger.warning("Dropped an invalidation for %s, its queue is full", path)
+
+    def open(self) -> None:
+        # Short, since Unix socket paths are limited to about 100 bytes.
+        self._path = self.directory / f"{os.getpid()}-{uuid.uuid4().hex[:8]}.sock"
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.bind(str(self._path))
+
+    def receive(self, timeout: float) -> list[str]:
+        self._socket.settimeout(timeout)
+        try:
+            payloads = [self._socket.recv(65536).decode()]
+        except TimeoutError:
+            return []
+        self._socket.setblocking(False)
+        with contextlib.suppress(BlockingIOError):
+            while True:
+                payloads.append(self._socket.recv(65536).decode())
+        return payloads
+
+    def close(self) -> None:
+        if self._socket is not None:
+            self._socket.close()
+            self._path.unlink(missing_ok=True)
+            self._socket = None
+
+
+class TableTransport:
+    """
+    A version table in a SQLite file.
+
+    Publishing inserts the next version, and listening polls for versions
+    past the last one seen.  The newest RETAINED_VERSIONS are kept, and a
+    process that falls further behind invalidates everything.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        """Use the SQLite file at path, which is created if missing."""
+        self.path = Path(path)
+        self._version = 0
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS invalidation_version ("
+                "version INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "payload TEXT NOT NULL)",
+            )
+
+    def _connect(self) -> contextlib.closing:
+        return contextlib.closing(sqlite3.connect(self.path, timeout=30))
+
+    def publish(self, payload: str) -> None:
+        with self._connect() as connection, connection:
+            version = connection.execute(
+                "INSERT INTO invalidation_version (payload) VALUES (?)",
+                (payload,),
+            ).lastrowid
+            connection.execute(
+                "DELETE FROM invalidation_version WHERE version <= ?",
+                (version - RETAINED_VERSIONS,),
+            )
+
+    def open(self) -> None:
+        with self._connect() as connection:
+            (self._version,) = connection.execute(
+                "SELECT coalesce(max(version), 0) FROM invalidation_version",
+            ).fetchone()
+
+    def receive(self, timeout: float) -> list[str]:
+        time.sleep(timeout)
+        with self._connect() as connection:
+            (oldest,) = connection.execute(
+                "SELECT min(version) FROM invalidation_version",
+            ).fetchone()
+            rows = connection.execute(
+                "SELECT version, payload FROM invalidation_version "
+                "WHERE version > ? ORDER BY version",
+                (self._version,),
+            ).fetchall()
+        if not rows:
+            return []
+        payloads = [payload for _, payload in rows]
+        if oldest > self._version + 1:
+            payloads.insert(0, _encode(None, [Invalidation(None, None)]))
+        self._version = rows[-1][0]
+        return payloads
+
+    def close(self) -> None:
+        pass
+
+
+def _encode(origin: str | None, invalidations: list[Invalidation]) -> str:
+    return json.dumps({
+        "origin": origin,
+        "invalidations": [
+            [
+                invalidation.model,
+                (
+                    None
+                    if invalidation.ids is None or len(invalidation.ids) > MAX_IDS
+                    else sorted(invalidation.ids)
+                ),
+            ]
+            for invalidation in invalidations
+        ],
+    })
+
+
+class InvalidationBus:
+    """Delivers invalidations to subscribers here and publishes them to other processes."""
+
+    def __init__(self, transport, *, poll_interval: float = POLL_INTERVAL) -> None:  # noqa: ANN001
+        """Use transport, see the module docstring."""
+        self.transport = transport
+        self.poll_interval = poll_interval
+        # Tells this process's own messages apart when they come back.
+        self.origin = uuid.uuid4().hex
+        self._callbacks: list[Callable[[Invalidation], object]] = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def subscribe(self, callback: Callable[[Invalidation], object]) -> None:
+        """Call callback for every invalidation, from any thread."""
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def unsubscribe(self, callback: Callable[[Invalidation], object]) -> None:
+        """Stop calling callback."""
+        with self._lock:
+            self._callbacks.remove(callback)
+
+    def publish(self, invalidations: list[Invalidation]) -> None:
+        """Deliver invalidations here, then to every other process."""
+        self._deliver(invalidations)
+        self.transport.publish(_encode(self.origin, invalidations))
+
+    def publish_in(self, connection, invalidations: list[Invalidation]) -> bool:  # noqa: ANN001
+        """
+        Publish invalidations to other processes in connection's transaction.
+
+        Returns False, having done nothing, if the transport cannot.
+        """
+        if not hasattr(self.transport, "publish_in"):
+            return False
+        self.transport.publish_in(connection, _encode(self.origin, invalidations))
+        return True
+
+    def _deliver(self, invalidations: list[Invalidation]) -> None:
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for invalidation in invalidations:
+            for callback in callbacks:
+                callback(invalidation)
+
+    def start(self) -> Self:
+        """Start listening to other processes."""
+        self.transport.open()
+        self._thread = threading.Thread(
+            target=self._listen,
+            name="pydidit-invalidation",
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop listening."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.transport.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+    def _listen(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                payloads = self.transport.receive(self.poll_interval)
+            except Exception:
+                logger.exception("Lost the invalidation transport, reopening it")
+                self._reopen()
+                continue
+            for payload in payloads:
+                try:
+                    message = json.loads(payload)
+                    if message["origin"] == self.origin:
+                        continue
+                    self._deliver([
+                        Invalidation(model, None if ids is None else frozenset(ids))
+                        for model, ids in message["invalidations"]
+                    ])
+                except Exception:
+                    logger.exception("Could not deliver an invalidation")
+
+    def _reopen(self) -> None:
+        """Reopen the transport, invalidating everything sent meanwhile."""
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                self.transport.close()
+                self.transport.open()
+            except Exception:
+                logger.exception("Could not reopen the invalidation transport")
+                continue
+            self._deliver([Invalidation(None, None)])
+            return
+
+
+class Cache:
+    """
+    Values loaded from the database, kept until invalidated.
+
+    A value stored with ids is dropped when any of those instances is
+    invalidated, and one stored without, such as a query result, when any
+    instance of its model is.
+    """
+
+    def __init__(self, bus: InvalidationBus) -> None:
+        """Follow bus."""
+        self._bus = bus
+        self._values: dict[tuple[str, Hashable], tuple[object, frozenset[int] | None]] = {}
+        # Keys being loaded, with their ids and how many loads are running.
+        self._loading: dict[tuple[str, Hashable], frozenset[int] | None] = {}
+        self._loaders: Counter[tuple[str, Hashable]] = Counter()
+        # Bumped by every invalidation of a key, so a load that an
+        # invalidation overtook is not cached.
+        self._generations: Counter[tuple[str, Hashable]] = Counter()
+        self._lock = threading.Lock()
+        bus.subscribe(self.invalidate)
+
+    def get(
+        self,
+        model: str,
+        key: Hashable,
+        load: Callable[[], object],
+        *,
+        ids: frozenset[int] | None = None,
+    ) -> object:
+        """
+        Return the value cached under model and key, calling load if there is none.
+
+        The loaded value is returned but not cached if the key was
+        invalidated while loading, as it may be from before the change.
+        """
+        cache_key = (model, key)
+        with self._lock:
+            if cache_key in self._values:
+                return self._values[cache_key][0]
+            generation = self._generations[cache_key]
+            self._loading[cache_key] = ids
+            self._loaders[cache_key] += 1
+        try:
+            value = load()
+        except BaseException:
+            with self._lock:
+                self._loaded(cache_key)
+            raise
+        with self._lock:
+            if self._generations[cache_key] == generation:
+                self._values[cache_key] = (value, ids)
+            self._loaded(cache_key)
+        return value
+
+    def _loaded(self, cache_key: tuple[str, Hashable]) -> None:
+        self._loaders[cache_key] -= 1
+        if not self._loaders[cache_key]:
+            del self._loaders[cache_key]
+            del self._loading[cache_key]
+            # Only running loads compare generations.
+            self._generations.pop(cache_key, None)
+
+    def invalidate(self, invalidation: Invalidation) -> None:
+        """Drop the values invalidation touches, and outdate their running loads."""
+        with self._lock:
+            for cache_key, ids in [
+                *((cache_key, ids) for cache_key, (_, ids) in self._values.items()),
+                *self._loading.items(),
+            ]:
+                if invalidation.model is not None and cache_key[0] != invalidation.model:
+                    continue
+                if invalidation.ids is None or ids is None or ids & invalidation.ids:
+                    self._values.pop(cache_key, None)
+                    self._generations[cache_key] += 1
+
+    def close(self) -> None:
+        """Stop following the bus."""
+        self._bus.unsubscribe(self.invalidate)
+
+
+def installed() -> bool:
+    """Tell whether writes are being published."""
+    return _bus is not None
+
+
+def record(session: Session, model: str, ids=None) -> None:  # noqa: ANN001
+    """
+    Note that the session's transaction wrote instances of model.
+
+    Writes made through the ORM are noted when they are flushed, so this
+    is for set-based statements.  Leave out ids when they are unknown.
+    Nothing is noted unless a bus is installed.
+    """
+    if _bus is None or (ids is not None and not len(ids)):
+        return
+    pending = session.info.setdefault(_SESSION_KEY, {})
+    if ids is None or pending.get(model, set()) is None:
+        pending[model] = None
+    else:
+        pending.setdefault(model, set()).update(ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flushed(session: Session, flush_context) -> None:  # noqa: ANN001, ARG001
+    # Relationship changes leave the instances on both sides dirty.
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        model = type(instance).__name__
+        if model in INVALIDATED_MODEL_NAMES:
+            record(session, model, [instance.id])
+
+
+def _pending(session: Session) -> list[Invalidation]:
+    return [
+        Invalidation(model, None if ids is None else frozenset(ids))
+        for model, ids in session.info.get(_SESSION_KEY, {}).items()
+    ]
+
+
+@event.listens_for(Session, "before_commit")
+def _publish_in_transaction(session: Session) -> None:
+    if _bus is None or not hasattr(_bus.transport, "publish_in"):
+        return
+    # Commit flushes after this, so flush first to note everything.
+    session.flush()
+    if (invalidations := _pending(session)) and _bus.publish_in(
+        session.connection(),
+        invalidations,
+    ):
+        session.info[_SENT_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session: Session) -> None:
+    invalidations = _pending(session)
+    sent = session.info.pop(_SENT_KEY, False)
+    session.info.pop(_SESSION_KEY, None)
+    if invalidations and _bus is not None:
+        if sent:
+            _bus._deliver(invalidations)  # noqa: SLF001
+            return
+        try:
+            _bus.publish(invalidations)
+        except Exception:
+            # The write is committed, so failing it now would only get it
+            # retried.
+            logger.exception("Could not publish invalidations")
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _forget_rolled_back(session: Session, transaction) -> None:  # noqa: ANN001
+    if transaction.parent is None:
+        session.info.pop(_SESSION_KEY, None)
+        session.info.pop(_SENT_KEY, None)
+
+
+def default_transport():  # noqa: ANN201
+    """Pick a transport reaching every process on the prepared database."""
+    engine = session_module.sessionmaker.kw["bind"]  # type: ignore[attr-defined]
+    if engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg":
+        return PostgresTransport(engine)
+    if engine.dialect.name == "sqlite" and engine.url.database not in (None, "", ":memory:"):
+        return TableTransport(f"{engine.url.database}-invalidation")
+    raise ValueError(
+        "No transport reaches other processes on this database, pass one.",
+    )
+
+
+def install(transport=None) -> InvalidationBus:  # noqa: ANN001
+    """
+    Publish every write from now on, and return the started bus.
+
+    The transport defaults to one picked for the prepared database.
+    """
+    uninstall()
+    bus = InvalidationBus(default_transport() if transport is None else transport)
+    globals()["_bus"] = bus.start()
+    return bus
+
+
+def uninstall() -> None:
+    """Stop publishing writes and stop the installed bus."""
+    if (bus := _bus) is not None:
+        globals()["_bus"] = None
+        bus.stop()
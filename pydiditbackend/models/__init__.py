@@ -14,6 +14,21 @@ from sqlalchemy.orm import (
 from pydiditbackend.models.base import Base
 from pydiditbackend.models.session import prepare_sessionmaker
 
+# The database version the models were prepared for.
+version_num: str
+
+
+class UnsupportedDatabaseError(RuntimeError):
+    """The database cannot do what was asked: it is too old, or not Postgres."""
+
+
+def too_old(feature: str, required: str) -> UnsupportedDatabaseError:
+    """Build the error for a feature the prepared database version predates."""
+    return UnsupportedDatabaseError(
+        f"{feature} needs database version {required} or later, "
+        f"but the database is at {globals().get('version_num')}.",
+    )
+
 
 class AlembicVersion(Base):
     """The model for the alembic_version table."""
@@ -36,6 +51,7 @@ def prepare(
             ).one().version_num
     else:
         version_num = version_override
+    globals()["version_num"] = version_num
     versioned_models = import_module(
         f"pydiditbackend.models.models_{version_num}",
     )
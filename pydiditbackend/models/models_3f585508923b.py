@@ -0,0 +1,47 @@
+"""
+Models for the database version with search indexes.
+
+Only indexes were added, so the models are those of the archive version
+with the indexes attached to their tables.  The trigram indexes, and the
+pg_trgm extension they need, only exist on Postgres.
+"""
+
+from sqlalchemy import DDL, Index, event
+
+from pydiditbackend.models.base import Base
+from pydiditbackend.models.models_81bb304d61c8 import (
+    ArchivedLink,
+    ArchivedProject,
+    ArchivedTodo,
+    Note,
+    Project,
+    Tag,
+    Todo,
+    Tombstone,
+)
+
+__all__ = [
+    "ArchivedLink",
+    "ArchivedProject",
+    "ArchivedTodo",
+    "Note",
+    "Project",
+    "Tag",
+    "Todo",
+    "Tombstone",
+]
+
+Index("ix_tag_name", Tag.name)
+
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+for column in (Todo.description, Project.description, Tag.name):
+    Index(
+        f"ix_{column.class_.__tablename__}_{column.key}_trgm",
+        column,
+        postgresql_using="gin",
+        postgresql_ops={column.key: "gin_trgm_ops"},
+    ).ddl_if(dialect="postgresql")
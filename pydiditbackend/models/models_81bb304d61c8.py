@@ -0,0 +1,433 @@
+# ruff: noqa: D105
+"""Models for the database version with archive tables."""
+
+from datetime import datetime
+from textwrap import shorten
+
+from sqlalchemy import (
+    Column,
+    ForeignKey,
+    Integer,
+    Table,
+    Unicode,
+    UnicodeText,
+    UniqueConstraint,
+    event,
+    func,
+)
+from sqlalchemy.orm import (
+    Mapped,
+    Session,
+    attributes,
+    mapped_column,
+    relationship,
+)
+
+from pydiditbackend.models.base import Base
+from pydiditbackend.models.enums import State
+from pydiditbackend.models.util import (
+    NOW_COMPARABLE_DATETIME,
+    get_new_lowest_display_position_default,
+    get_new_lowest_project_display_position_default,
+    get_visible_default,
+    is_visible,
+)
+
+todo_note = Table(
+    "todo_note",
+    Base.metadata,
+    Column("todo_id", ForeignKey("todo.id"), primary_key=True),
+    Column("note_id", ForeignKey("note.id"), primary_key=True),
+)
+
+todo_tag = Table(
+    "todo_tag",
+    Base.metadata,
+    Column("todo_id", ForeignKey("todo.id"), primary_key=True),
+    Column("tag_id", ForeignKey("tag.id"), primary_key=True),
+)
+
+project_note = Table(
+    "project_note",
+    Base.metadata,
+    Column("project_id", ForeignKey("project.id"), primary_key=True),
+    Column("note_id", ForeignKey("note.id"), primary_key=True),
+)
+
+project_tag = Table(
+    "project_tag",
+    Base.metadata,
+    Column("project_id", ForeignKey("project.id"), primary_key=True),
+    Column("tag_id", ForeignKey("tag.id"), primary_key=True),
+)
+
+todo_prereq_todo = Table(
+    "todo_prereq_todo",
+    Base.metadata,
+    Column("todo_id", ForeignKey("todo.id"), primary_key=True),
+    Column("prereq_id", ForeignKey("todo.id"), primary_key=True),
+)
+
+todo_prereq_project = Table(
+    "todo_prereq_project",
+    Base.metadata,
+    Column("todo_id", ForeignKey("todo.id"), primary_key=True),
+    Column("project_id", ForeignKey("project.id"), primary_key=True),
+)
+
+project_prereq_project = Table(
+    "project_prereq_project",
+    Base.metadata,
+    Column("project_id", ForeignKey("project.id"), primary_key=True),
+    Column("prereq_id", ForeignKey("project.id"), primary_key=True),
+)
+
+project_prereq_todo = Table(
+    "project_prereq_todo",
+    Base.metadata,
+    Column("project_id", ForeignKey("project.id"), primary_key=True),
+    Column("todo_id", ForeignKey("todo.id"), primary_key=True),
+)
+
+project_contain_project = Table(
+    "project_contain_project",
+    Base.metadata,
+    Column("parent_id", ForeignKey("project.id"), primary_key=True),
+    Column("child_id", ForeignKey("project.id"), primary_key=True),
+)
+
+project_contain_todo = Table(
+    "project_contain_todo",
+    Base.metadata,
+    Column("project_id", ForeignKey("project.id"), primary_key=True),
+    Column("todo_id", ForeignKey("todo.id"), primary_key=True),
+    # The todo's position within this project, see move(within=...).
+    Column(
+        "display_position",
+        Integer,
+        nullable=False,
+        default=get_new_lowest_project_display_position_default,
+    ),
+    UniqueConstraint(
+        "project_id",
+        "display_position",
+        name="uq_project_contain_todo_display_position",
+    ),
+)
+
+class Todo(Base):
+    """The Todo model."""
+
+    __tablename__ = "todo"
+    # Never reuse the id of an archived todo, see ArchivedTodo.
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Mapped[int] = mapped_column(autoincrement=True, primary_key=True)
+    description: Mapped[str] = mapped_column(Unicode(255))
+    state: Mapped[State] = mapped_column(default=State.active)
+    created_at: Mapped[datetime] = mapped_column(default=func.now())
+    modified_at: Mapped[datetime] = mapped_column(
+        NOW_COMPARABLE_DATETIME,
+        default=func.now(),
+        onupdate=func.now(),
+        index=True,
+    )
+    show_from: Mapped[datetime | None] = mapped_column(index=True)
+    due: Mapped[datetime | None] = mapped_column(index=True)
+    visible: Mapped[bool] = mapped_column(
+        default=get_visible_default,
+        index=True,
+    )
+    display_position: Mapped[int] = mapped_column(
+        default=get_new_lowest_display_position_default,
+        unique=True,
+    )
+    prereq_todos: Mapped[list["Todo"]] = relationship(
+        secondary=todo_prereq_todo,
+        back_populates="dependent_todos",
+        primaryjoin=id == todo_prereq_todo.c.todo_id,
+        secondaryjoin=id == todo_prereq_todo.c.prereq_id,
+        lazy="joined",
+    )
+    prereq_projects: Mapped[list["Project"]] = relationship(
+        secondary=todo_prereq_project,
+        back_populates="dependent_todos",
+        lazy="joined",
+    )
+    dependent_todos: Mapped[list["Todo"]] = relationship(
+        secondary=todo_prereq_todo,
+        back_populates="prereq_todos",
+        primaryjoin=id == todo_prereq_todo.c.prereq_id,
+        secondaryjoin=id == todo_prereq_todo.c.todo_id,
+        lazy="joined",
+    )
+    dependent_projects: Mapped[list["Project"]] = relationship(
+        secondary=project_prereq_todo,
+        back_populates="prereq_todos",
+        lazy="joined",
+    )
+    contained_by_projects: Mapped[list["Project"]] = relationship(
+        secondary=project_contain_todo,
+        back_populates="contain_todos",
+        lazy="joined",
+    )
+    notes: Mapped[list["Note"]] = relationship(
+        secondary=todo_note,
+        back_populates="todos",
+        lazy="joined",
+    )
+    tags: Mapped[list["Tag"]] = relationship(
+        secondary=todo_tag,
+        back_populates="todos",
+        lazy="joined",
+    )
+    primary_descriptor: str = "description"
+
+    def __repr__(self) -> str:
+        return f'<Todo {shorten(self.description, 20, placeholder="...")} id={self.id} {self.state.value} display_position={self.display_position}>'  # noqa: E501
+
+class Project(Base):
+    """The Project model."""
+
+    __tablename__ = "project"
+    # Never reuse the id of an archived project, see ArchivedProject.
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Mapped[int] = mapped_column(autoincrement=True, primary_key=True)
+    description: Mapped[str] = mapped_column(Unicode(255))
+    state: Mapped[State] = mapped_column(default=State.active)
+    created_at: Mapped[datetime] = mapped_column(default=func.now())
+    modified_at: Mapped[datetime] = mapped_column(
+        NOW_COMPARABLE_DATETIME,
+        default=func.now(),
+        onupdate=func.now(),
+        index=True,
+    )
+    show_from: Mapped[datetime | None] = mapped_column(index=True)
+    due: Mapped[datetime | None] = mapped_column(index=True)
+    visible: Mapped[bool] = mapped_column(
+        default=get_visible_default,
+        index=True,
+    )
+    display_position: Mapped[int] = mapped_column(
+        default=get_new_lowest_display_position_default,
+        unique=True,
+    )
+    prereq_projects: Mapped[list["Project"]] = relationship(
+        secondary=project_prereq_project,
+        back_populates="dependent_projects",
+        primaryjoin=id == project_prereq_project.c.project_id,
+        secondaryjoin=id == project_prereq_project.c.prereq_id,
+        lazy="joined",
+    )
+    dependent_projects: Mapped[list["Project"]] = relationship(
+        secondary=project_prereq_project,
+        back_populates="prereq_projects",
+        primaryjoin=id == project_prereq_project.c.prereq_id,
+        secondaryjoin=id == project_prereq_project.c.project_id,
+        lazy="joined",
+    )
+    dependent_todos: Mapped[list[Todo]] = relationship(
+        secondary=todo_prereq_project,
+        back_populates="prereq_projects",
+        lazy="joined",
+    )
+    prereq_todos: Mapped[list[Todo]] = relationship(
+        secondary=project_prereq_todo,
+        back_populates="dependent_projects",
+        lazy="joined",
+    )
+    contain_todos: Mapped[list[Todo]] = relationship(
+        secondary=project_contain_todo,
+        back_populates="contained_by_projects",
+        order_by=project_contain_todo.c.display_position,
+        lazy="joined",
+    )
+    contain_projects: Mapped[list["Project"]] = relationship(
+        secondary=project_contain_project,
+        back_populates="contained_by_projects",
+        primaryjoin=id == project_contain_project.c.parent_id,
+        secondaryjoin=id == project_contain_project.c.child_id,
+        lazy="joined",
+    )
+    contained_by_projects: Mapped[list["Project"]] = relationship(
+        secondary=project_contain_project,
+        back_populates="contain_projects",
+        primaryjoin=id == project_contain_project.c.child_id,
+        secondaryjoin=id == project_contain_project.c.parent_id,
+        lazy="joined",
+    )
+    notes: Mapped[list["Note"]] = relationship(
+        secondary=project_note,
+        back_populates="projects",
+        lazy="joined",
+    )
+    tags: Mapped[list["Tag"]] = relationship(
+        secondary=project_tag,
+        back_populates="projects",
+        lazy="joined",
+    )
+    primary_descriptor: str = "description"
+
+    def __repr__(self) -> str:
+        return f'<Project {shorten(self.description, 20, placeholder="...")} id={self.id} {self.state.value} display_position={self.display_position} {len(self.contain_todos)} todos>'  # noqa: E501
+
+class Note(Base):
+    """The Note model."""
+
+    __tablename__ = "note"
+
+    id: Mapped[int] = mapped_column(autoincrement=True, primary_key=True)
+    text: Mapped[str] = mapped_column(UnicodeText())
+    created_at: Mapped[datetime] = mapped_column(default=func.now())
+    modified_at: Mapped[datetime] = mapped_column(
+        NOW_COMPARABLE_DATETIME,
+        default=func.now(),
+        onupdate=func.now(),
+        index=True,
+    )
+    todos: Mapped[list[Todo]] = relationship(
+        secondary=todo_note,
+        back_populates="notes",
+        lazy="joined",
+    )
+    projects: Mapped[list[Project]] = relationship(
+        secondary=project_note,
+        back_populates="notes",
+        lazy="joined",
+    )
+    primary_descriptor: str = "text"
+
+    def __repr__(self) -> str:
+        return f'<Note id={self.id} "{shorten(self.text, 20, placeholder="...")}">'
+
+class Tag(Base):
+    """The Tag model."""
+
+    __tablename__ = "tag"
+
+    id: Mapped[int] = mapped_column(autoincrement=True, primary_key=True)
+    name: Mapped[str] = mapped_column(Unicode(255))
+    created_at: Mapped[datetime] = mapped_column(default=func.now())
+    modified_at: Mapped[datetime] = mapped_column(
+        NOW_COMPARABLE_DATETIME,
+        default=func.now(),
+        onupdate=func.now(),
+        index=True,
+    )
+    todos: Mapped[list[Todo]] = relationship(
+        secondary=todo_tag,
+        back_populates="tags",
+        lazy="joined",
+    )
+    projects: Mapped[list[Project]] = relationship(
+        secondary=project_tag,
+        back_populates="tags",
+        lazy="joined",
+    )
+    primary_descriptor: str = "name"
+
+    def __repr__(self) -> str:
+        return f'<Tag {shorten(self.name, 20, placeholder="...")} id={self.id}>'
+
+class Tombstone(Base):
+    """A record of a deleted instance, for the change feed."""
+
+    __tablename__ = "tombstone"
+
+    id: Mapped[int] = mapped_column(autoincrement=True, primary_key=True)
+    model: Mapped[str] = mapped_column(Unicode(255))
+    instance_id: Mapped[int]
+    deleted_at: Mapped[datetime] = mapped_column(
+        NOW_COMPARABLE_DATETIME,
+        default=func.now(),
+        index=True,
+    )
+
+    def __repr__(self) -> str:
+        return f"<Tombstone {self.model} id={self.instance_id} deleted_at={self.deleted_at}>"
+
+class ArchivedTodo(Base):
+    """
+    A completed todo moved out of the todo table by archive_completed().
+
+    Only the columns are kept here, its association rows are in
+    ArchivedLink until unarchive() puts both back.
+    """
+
+    __tablename__ = "todo_archive"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    description: Mapped[str] = mapped_column(Unicode(255))
+    state: Mapped[State]
+    created_at: Mapped[datetime]
+    modified_at: Mapped[datetime] = mapped_column(NOW_COMPARABLE_DATETIME)
+    show_from: Mapped[datetime | None]
+    due: Mapped[datetime | None]
+    visible: Mapped[bool]
+    display_position: Mapped[int]
+    archived_at: Mapped[datetime] = mapped_column(default=func.now())
+    primary_descriptor: str = "description"
+
+    def __repr__(self) -> str:
+        return f'<ArchivedTodo {shorten(self.description, 20, placeholder="...")} id={self.id} {self.state.value}>'  # noqa: E501
+
+class ArchivedProject(Base):
+    """A completed project moved out of the project table, like ArchivedTodo."""
+
+    __tablename__ = "project_archive"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    description: Mapped[str] = mapped_column(Unicode(255))
+    state: Mapped[State]
+    created_at: Mapped[datetime]
+    modified_at: Mapped[datetime] = mapped_column(NOW_COMPARABLE_DATETIME)
+    show_from: Mapped[datetime | None]
+    due: Mapped[datetime | None]
+    visible: Mapped[bool]
+    display_position: Mapped[int]
+    archived_at: Mapped[datetime] = mapped_column(default=func.now())
+    primary_descriptor: str = "description"
+
+    def __repr__(self) -> str:
+        return f'<ArchivedProject {shorten(self.description, 20, placeholder="...")} id={self.id} {self.state.value}>'  # noqa: E501
+
+class ArchivedLink(Base):
+    """An association row of an archived instance, by table and primary key."""
+
+    __tablename__ = "archived_link"
+
+    id: Mapped[int] = mapped_column(autoincrement=True, primary_key=True)
+    table_name: Mapped[str] = mapped_column(Unicode(255))
+    left_id: Mapped[int] = mapped_column(index=True)
+    right_id: Mapped[int] = mapped_column(index=True)
+
+    def __repr__(self) -> str:
+        return f"<ArchivedLink {self.table_name} ({self.left_id}, {self.right_id})>"
+
+SYNCED_MODELS = (Todo, Project, Note, Tag)
+
+@event.listens_for(Session, "before_flush")
+def track_changes(session: Session, flush_context, instances) -> None:  # noqa: ANN001, ARG001
+    """
+    Keep the change feed and visibility up to date.
+
+    Deleted instances leave a tombstone behind, and instances whose only
+    change is to a relationship collection still get a new modified_at,
+    which onupdate alone would not give them.  Changing show_from updates
+    visible right away rather than at the next scheduler tick.
+    """
+    for instance in session.deleted:
+        if isinstance(instance, SYNCED_MODELS):
+            session.add(Tombstone(
+                model=type(instance).__name__,
+                instance_id=instance.id,
+            ))
+    for instance in session.dirty:
+        if isinstance(instance, SYNCED_MODELS) and session.is_modified(instance):
+            instance.modified_at = func.now()
+        if (
+            isinstance(instance, (Todo, Project))
+            and attributes.get_history(instance, "show_from").has_changes()
+        ):
+            instance.visible = is_visible(instance.show_from)
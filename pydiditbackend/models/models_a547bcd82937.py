@@ -0,0 +1,16 @@
+"""
+Models for the database version with change notifications.
+
+Notifications are sent by database triggers, so the models are unchanged
+from the change feed version.
+"""
+
+from pydiditbackend.models.models_fd6249b0b314 import (
+    Note,
+    Project,
+    Tag,
+    Todo,
+    Tombstone,
+)
+
+__all__ = ["Note", "Project", "Tag", "Todo", "Tombstone"]
@@ -0,0 +1,23 @@
+"""
+Models for the database version with agenda indexes.
+
+Only indexes on due and show_from were added, so the models are those of
+the change notifications version with the indexes attached to their tables.
+"""
+
+from sqlalchemy import Index
+
+from pydiditbackend.models.models_a547bcd82937 import (
+    Note,
+    Project,
+    Tag,
+    Todo,
+    Tombstone,
+)
+
+__all__ = ["Note", "Project", "Tag", "Todo", "Tombstone"]
+
+Index("ix_todo_due", Todo.due)
+Index("ix_todo_show_from", Todo.show_from)
+Index("ix_project_due", Project.due)
+Index("ix_project_show_from", Project.show_from)
@@ -0,0 +1,137 @@
+"""
+Triggers maintaining the todo counts of projects and tags.
+
+Shared by the models, which create them along with the tables, and by the
+migration adding them to an existing database, so both get the same SQL.
+"""
+
+# The counted tables, each with its association table to todo and the
+# column there naming it.
+COUNTED_TABLES = {
+    "project": ("project_contain_todo", "project_id"),
+    "tag": ("todo_tag", "tag_id"),
+}
+DIALECTS = ("sqlite", "postgresql")
+
+# SET clauses moving a todo's contribution from its OLD to its NEW row.
+STATE_CHANGES = """
+    active_todo_count = active_todo_count
+        + CASE WHEN NEW.state = 'active' THEN 1 ELSE 0 END
+        - CASE WHEN OLD.state = 'active' THEN 1 ELSE 0 END,
+    overdue_todo_count = overdue_todo_count
+        + CASE WHEN NEW.state = 'active' AND NEW.overdue THEN 1 ELSE 0 END
+        - CASE WHEN OLD.state = 'active' AND OLD.overdue THEN 1 ELSE 0 END
+"""
+
+
+def _count_changes(row: str, sign: str) -> str:
+    """SET clauses adding a todo row's contribution to the counts."""
+    return f"""
+        todo_count = todo_count {sign} 1,
+        active_todo_count = active_todo_count {sign} (
+            SELECT count(*) FROM todo WHERE id = {row}.todo_id AND state = 'active'
+        ),
+        overdue_todo_count = overdue_todo_count {sign} (
+            SELECT count(*) FROM todo
+            WHERE id = {row}.todo_id AND state = 'active' AND overdue
+        )
+    """
+
+
+def _sqlite_count_triggers(table: str, link_table: str, column: str) -> list[str]:
+    return [
+        *(
+            f"""
+                CREATE TRIGGER IF NOT EXISTS {link_table}_count_{operation.lower()}
+                AFTER {operation} ON {link_table}
+                BEGIN
+                    UPDATE {table} SET {_count_changes(row, sign)}
+                    WHERE id = {row}.{column};
+                END
+            """
+            for operation, row, sign in (("INSERT", "NEW", "+"), ("DELETE", "OLD", "-"))
+        ),
+        f"""
+            CREATE TRIGGER IF NOT EXISTS todo_count_{table}
+            AFTER UPDATE OF state, overdue ON todo
+            BEGIN
+                UPDATE {table} SET {STATE_CHANGES}
+                WHERE id IN (SELECT {column} FROM {link_table} WHERE todo_id = NEW.id);
+            END
+        """,
+    ]
+
+
+def _postgresql_count_triggers(table: str, link_table: str, column: str) -> list[str]:
+    # Postgres triggers run functions, and cannot be created if missing.
+    return [
+        f"""
+            CREATE OR REPLACE FUNCTION {link_table}_count() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    UPDATE {table} SET {_count_changes("NEW", "+")}
+                    WHERE id = NEW.{column};
+                ELSE
+                    UPDATE {table} SET {_count_changes("OLD", "-")}
+                    WHERE id = OLD.{column};
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """,
+        f"DROP TRIGGER IF EXISTS {link_table}_count ON {link_table}",
+        f"""
+            CREATE TRIGGER {link_table}_count
+            AFTER INSERT OR DELETE ON {link_table}
+            FOR EACH ROW EXECUTE FUNCTION {link_table}_count()
+        """,
+        f"""
+            CREATE OR REPLACE FUNCTION todo_count_{table}() RETURNS trigger AS $$
+            BEGIN
+                UPDATE {table} SET {STATE_CHANGES}
+                WHERE id IN (
+                    SELECT {column} FROM {link_table} WHERE todo_id = NEW.id
+                );
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """,
+        f"DROP TRIGGER IF EXISTS todo_count_{table} ON todo",
+        f"""
+            CREATE TRIGGER todo_count_{table}
+            AFTER UPDATE OF state, overdue ON todo
+            FOR EACH ROW EXECUTE FUNCTION todo_count_{table}()
+        """,
+    ]
+
+
+def count_triggers(dialect: str) -> list[str]:
+    """The statements creating the count triggers on dialect, if missing."""
+    create = (
+        _postgresql_count_triggers if dialect == "postgresql" else _sqlite_count_triggers
+    )
+    return [
+        statement
+        for table, (link_table, column) in COUNTED_TABLES.items()
+        for statement in create(table, link_table, column)
+    ]
+
+
+def drop_count_triggers(dialect: str) -> list[str]:
+    """The statements dropping the count triggers on dialect."""
+    statements = []
+    for table, (link_table, _) in COUNTED_TABLES.items():
+        if dialect == "postgresql":
+            statements.extend((
+                f"DROP TRIGGER {link_table}_count ON {link_table}",
+                f"DROP FUNCTION {link_table}_count()",
+                f"DROP TRIGGER todo_count_{table} ON todo",
+                f"DROP FUNCTION todo_count_{table}()",
+            ))
+        else:
+            statements.extend((
+                f"DROP TRIGGER {link_table}_count_insert",
+                f"DROP TRIGGER {link_table}_count_delete",
+                f"DROP TRIGGER todo_count_{table}",
+            ))
+    return statements
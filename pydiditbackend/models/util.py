@@ -1,18 +1,104 @@
 """Model utils."""
 
-from sqlalchemy import desc, select
+from datetime import datetime, timedelta
 
-from pydiditbackend.models.session import sessionmaker  # type: ignore[attr-defined]
+from sqlalchemy import DateTime, desc, func, select
+from sqlalchemy.dialects import sqlite
 
+from pydiditbackend.models import session as session_module
+
+# SQLite stores func.now() as "YYYY-MM-DD HH:MM:SS" text, while a bound
+# datetime renders with microseconds, so the two compare wrongly as strings.
+# Timestamps that are filtered against a bound datetime (watermarks) use the
+# same second-resolution format as the database on SQLite.
+NOW_COMPARABLE_DATETIME = DateTime().with_variant(
+    sqlite.DATETIME(
+        storage_format=(
+            "%(year)04d-%(month)02d-%(day)02d "
+            "%(hour)02d:%(minute)02d:%(second)02d"
+        ),
+    ),
+    "sqlite",
+)
+
+# modified_at and deleted_at come from func.now(), which on Postgres is when
+# the writing transaction began, so a long transaction can commit with a
+# timestamp behind rows already read.  Watermarks are held this far behind
+# the database clock, and transactions committing within it are not missed.
+COMMIT_WINDOW = timedelta(minutes=5)
+
+
+def hold_back(session, latest: datetime | None) -> datetime | None:  # noqa: ANN001
+    """Hold a watermark back by COMMIT_WINDOW from the database clock."""
+    if latest is None:
+        return None
+    return min(latest, session.scalar(select(func.now())) - COMMIT_WINDOW)
+
+
+def _allocate_display_position(context, column, query, scope=None) -> int:  # noqa: ANN001
+    """
+    Pick the position after the lowest one in the list.
+
+    Query through the inserting connection, so rows flushed earlier in the
+    same transaction are seen and no second connection is checked out.
+    Rows inserted by the same executemany are not in the table yet, so
+    positions already handed out by this execution are remembered on it.
+    """
+    allocated = vars(context).setdefault("allocated_display_positions", {})
+    if (column, scope) in allocated:
+        allocated[column, scope] += 1
+    else:
+        lowest_display_position = context.connection.scalar(query)
+        allocated[column, scope] = (
+            0
+            if lowest_display_position is None
+            else lowest_display_position + 1
+        )
+    return allocated[column, scope]
 
 def get_new_lowest_display_position_default(context) -> int:  # noqa: ANN001
     """Get the new lowest display position for a default sqlalchemy value."""
-    return get_new_lowest_display_position(context.current_column)
+    column = context.current_column
+    return _allocate_display_position(
+        context,
+        column,
+        select(column).order_by(desc(column)).limit(1),
+    )
+
+def get_new_lowest_project_display_position_default(context) -> int:  # noqa: ANN001
+    """Get the new lowest display position within a project."""
+    column = context.current_column
+    project_id = context.get_current_parameters()["project_id"]
+    return _allocate_display_position(
+        context,
+        column,
+        select(column)
+        .where(column.table.c.project_id == project_id)
+        .order_by(desc(column))
+        .limit(1),
+        project_id,
+    )
 
 def get_new_lowest_display_position(column) -> int:
     """Get the new lowest display position."""
-    with sessionmaker() as session:
+    with session_module.sessionmaker() as session:  # type: ignore[attr-defined]
         lowest_display_position = session.scalars(
             select(column).order_by(desc(column)),
         ).first()
     return 0 if lowest_display_position is None else lowest_display_position + 1
+
+def is_visible(show_from: datetime | None, now: datetime | None = None) -> bool:
+    """Whether an instance with this show_from should be shown now."""
+    return show_from is None or show_from <= (datetime.now() if now is None else now)
+
+def get_visible_default(context) -> bool:  # noqa: ANN001
+    """Get the initial visibility for a default sqlalchemy value."""
+    return is_visible(context.get_current_parameters().get("show_from"))
+
+def is_overdue(due: datetime | None, now: datetime | None = None) -> bool:
+    """Whether an instance with this due is overdue now."""
+    return due is not None and due < (datetime.now() if now is None else now)
+
+def get_overdue_default(context) -> bool:  # noqa: ANN001
+    """Get the initial overdue flag for a default sqlalchemy value."""
+    return is_overdue(context.get_current_parameters().get("due"))
@@ -0,0 +1,274 @@
+"""
+Change notifications.
+
+subscribe() delivers an event for every write to the pydidit tables, either
+to callbacks or through an async iterator.  On Postgres the events come from
+the triggers added in database version a547bcd82937 via LISTEN/NOTIFY.
+Other databases fall back to polling the indexed modified_at columns and the
+tombstone table, where a relationship change shows up as an update of the
+instances on either side.  Each poll rereads the last
+models.util.COMMIT_WINDOW, so the changes of a transaction committing
+within that long of beginning are delivered too, once.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from collections.abc import AsyncIterator, Callable
+from datetime import datetime
+from typing import NamedTuple, Self
+
+from sqlalchemy import func, select
+
+from pydiditbackend import models
+from pydiditbackend.models import session as session_module
+
+CHANNEL = "pydidit_changes"
+POLL_INTERVAL = 1.0
+POLLED_MODEL_NAMES = ("Todo", "Project", "Note", "Tag")
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeEvent(NamedTuple):
+    """A write to one row of a pydidit table."""
+
+    table: str
+    operation: str
+    keys: dict[str, int]
+
+
+class Subscription:
+    """A running subscription, delivering events from a background thread."""
+
+    def __init__(
+        self,
+        engine,  # noqa: ANN001
+        *,
+        mode: str,
+        poll_interval: float,
+    ) -> None:
+        """Start listening."""
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self._engine = engine
+        self._callbacks: list[Callable[[ChangeEvent], object]] = []
+        self._queues: list[Callable[[ChangeEvent | None], None]] = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(
+            target=self._listen if mode == "listen" else self._poll,
+            name=f"pydidit-{mode}",
+            daemon=True,
+        )
+        self._thread.start()
+        self._ready.wait()
+
+    def add_callback(self, callback: Callable[[ChangeEvent], object]) -> None:
+        """Call callback, from the background thread, for every event."""
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def remove_callback(self, callback: Callable[[ChangeEvent], object]) -> None:
+        """Stop calling callback."""
+        with self._lock:
+            self._callbacks.remove(callback)
+
+    def stop(self) -> None:
+        """Stop listening and end any async iteration."""
+        self._stopped.set()
+        self._thread.join()
+        with self._lock:
+            queues = list(self._queues)
+        for enqueue in queues:
+            enqueue(None)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+    def __aiter__(self) -> AsyncIterator[ChangeEvent]:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue[ChangeEvent | None] = asyncio.Queue()
+
+        def enqueue(event: ChangeEvent | None) -> None:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+        with self._lock:
+            self._queues.append(enqueue)
+        return self._drain(queue, enqueue)
+
+    async def _drain(self, queue, enqueue) -> AsyncIterator[ChangeEvent]:  # noqa: ANN001
+        try:
+            while (event := await queue.get()) is not None:
+                yield event
+        finally:
+            with self._lock:
+                self._queues.remove(enqueue)
+
+    def _publish(self, event: ChangeEvent) -> None:
+        with self._lock:
+            callbacks = [*self._callbacks, *self._queues]
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("Could not deliver a change")
+
+    def _listen(self) -> None:
+        # Database errors end the connection, not the subscription.
+        while not self._stopped.is_set():
+            connection = None
+            try:
+                connection = self._engine.raw_connection()
+                driver_connection = connection.driver_connection
+                driver_connection.autocommit = True
+                driver_connection.execute(f"LISTEN {CHANNEL}")
+                self._ready.set()
+                while not self._stopped.is_set():
+                    for notification in driver_connection.notifies(
+                        timeout=self.poll_interval,
+                    ):
+                        payload = json.loads(notification.payload)
+                        self._publish(ChangeEvent(
+                            table=payload.pop("table"),
+                            operation=payload.pop("operation"),
+                            keys=payload,
+                        ))
+            except Exception:
+                logger.exception("Lost the change notification connection, reconnecting")
+                self._stopped.wait(self.poll_interval)
+            finally:
+                self._ready.set()
+                if connection is not None:
+                    # The connection was switched to autocommit, so keep it
+                    # out of the pool.
+                    connection.invalidate()
+
+    def _start_polling(self) -> tuple[datetime, set]:
+        watermark = self._current_watermark()
+        # Rows already at the starting watermark are not news.
+        return watermark, {change for change, _ in self._changes_since(watermark)[0]}
+
+    def _poll(self) -> None:
+        watermark = None
+        try:
+            watermark, seen = self._start_polling()
+        except Exception:
+            logger.exception("Could not start polling for changes, retrying")
+        finally:
+            self._ready.set()
+        # Database errors cost a poll, not the subscription.
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                if watermark is None:
+                    watermark, seen = self._start_polling()
+                    continue
+                events, latest = self._changes_since(watermark)
+            except Exception:
+                logger.exception("Could not poll for changes")
+                continue
+            for change, event in events:
+                if change not in seen:
+                    seen.add(change)
+                    self._publish(event)
+            if latest is not None and latest > watermark:
+                # Rows before the new watermark cannot come back, so only
+                # the rows at it need remembering.
+                seen = {change for change in seen if change[2] >= latest}
+                watermark = latest
+
+    def _current_watermark(self) -> datetime:
+        with session_module.sessionmaker() as session:  # type: ignore[attr-defined]
+            watermarks = [
+                session.scalar(select(func.max(model.modified_at)))
+                for model in _polled_models()
+            ]
+            watermarks.append(session.scalar(
+                select(func.max(models.Tombstone.deleted_at)),
+            ))
+            latest = max(
+                (watermark for watermark in watermarks if watermark is not None),
+                default=None,
+            )
+            return models.util.hold_back(session, latest) or datetime.min
+
+    def _changes_since(self, watermark: datetime) -> tuple[list, datetime | None]:
+        events = []
+        latest = None
+        with session_module.sessionmaker() as session:  # type: ignore[attr-defined]
+            for model in _polled_models():
+                for row in session.execute(
+                    select(model.id, model.created_at, model.modified_at)
+                    .where(model.modified_at >= watermark)
+                    .order_by(model.modified_at),
+                ):
+                    events.append((
+                        (model.__tablename__, row.id, row.modified_at),
+                        ChangeEvent(
+                            table=model.__tablename__,
+                            operation=(
+                                "INSERT"
+                                if row.created_at >= watermark
+                                else "UPDATE"
+                            ),
+                            keys={"id": row.id},
+                        ),
+                    ))
+                    latest = max(latest or row.modified_at, row.modified_at)
+            for row in session.execute(
+                select(models.Tombstone)
+                .where(models.Tombstone.deleted_at >= watermark)
+                .order_by(models.Tombstone.deleted_at),
+            ).scalars():
+                table = getattr(models, row.model).__tablename__
+                events.append((
+                    ("tombstone", row.id, row.deleted_at),
+                    ChangeEvent(
+                        table=table,
+                        operation="DELETE",
+                        keys={"id": row.instance_id},
+                    ),
+                ))
+                latest = max(latest or row.deleted_at, row.deleted_at)
+            # Changes within COMMIT_WINDOW are read again, and told apart
+            # from ones already published by the seen set.
+            return events, models.util.hold_back(session, latest)
+
+
+def _polled_models() -> list:
+    return [getattr(models, model_name) for model_name in POLLED_MODEL_NAMES]
+
+
+def subscribe(
+    callback: Callable[[ChangeEvent], object] | None = None,
+    *,
+    mode: str | None = None,
+    poll_interval: float = POLL_INTERVAL,
+) -> Subscription:
+    """
+    Subscribe to changes.
+
+    Events go to callback, if given, and to anything iterating the returned
+    subscription with ``async for``.  mode is "listen" or "poll" and is
+    chosen from the database when not given.  Stop the subscription, or use
+    it as a context manager, when done.
+    """
+    if not hasattr(models, "Tombstone"):
+        raise models.too_old("Change notification", "fd6249b0b314")
+    engine = session_module.sessionmaker.kw["bind"]  # type: ignore[attr-defined]
+    if mode is None:
+        mode = (
+            "listen"
+            if engine.dialect.name == "postgresql"
+            and engine.dialect.driver == "psycopg"
+            else "poll"
+        )
+    subscription = Subscription(engine, mode=mode, poll_interval=poll_interval)
+    if callback is not None:
+        subscription.add_callback(callback)
+    return subscription
@@ -0,0 +1,348 @@
+# ruff: noqa: T201
+"""
+A profiling mode capturing the query plans of sampled API calls.
+
+When enabled, a sample of top level API calls is profiled: every statement
+the call issues is timed and explained right after it runs, on the same
+connection and with the same parameters, with EXPLAIN QUERY PLAN on SQLite
+and EXPLAIN on Postgres.  EXPLAIN (ANALYZE, BUFFERS) runs the statement a
+second time, so on Postgres only SELECTs in read-only transactions, which
+the read APIs use, are analyzed; anything else gets the planner's estimates.
+Each profiled call, with its latency, less the time spent explaining, and
+its arguments, is kept in ``profiles``, and appended to a file if given.
+
+Dump the slowest shapes, calls issuing the same statements up to literal
+values, from such a file with
+
+    python -m pydiditbackend.profiling PATH [--limit N]
+"""
+
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from functools import wraps
+from pathlib import Path
+from typing import ParamSpec, TypeVar
+
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.expression import ClauseElement
+
+from pydiditbackend.debug import normalize_statement
+
+logger = logging.getLogger(__name__)
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+SAMPLE_RATE = 0.01
+PROFILE_LIMIT = 1000
+SHAPE_LIMIT = 10
+ARGUMENT_LENGTH = 500
+
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+_SAVEPOINT = "pydidit_explain"
+
+_settings: dict = {
+    "enabled": False,
+    "sample_rate": SAMPLE_RATE,
+    "path": None,
+}
+_write_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class StatementProfile:
+    """One statement of a profiled call, with its plan."""
+
+    statement: str
+    parameters: str
+    duration: float
+    plan: str | None
+
+
+@dataclass(frozen=True)
+class Profile:
+    """A profiled API call."""
+
+    call: str
+    arguments: str
+    latency: float
+    statements: tuple[StatementProfile, ...]
+
+    @property
+    def shape(self) -> tuple[str, tuple[str, ...]]:
+        """The call and its statements, up to literal values."""
+        return self.call, tuple(
+            normalize_statement(statement.statement)
+            for statement in self.statements
+        )
+
+
+@dataclass(frozen=True)
+class Shape:
+    """Every profile of one shape, summarized."""
+
+    call: str
+    statements: tuple[str, ...]
+    count: int
+    mean_latency: float
+    slowest: Profile
+
+    def __str__(self) -> str:
+        lines = [
+            f"{self.call}: {self.count} calls, mean {self.mean_latency * 1000:.2f} ms, "
+            f"slowest {self.slowest.latency * 1000:.2f} ms",
+            f"  slowest arguments: {self.slowest.arguments}",
+        ]
+        for statement in self.slowest.statements:
+            lines.append(f"  {statement.duration * 1000:.2f} ms: {statement.statement}")
+            lines.append(f"    parameters: {statement.parameters}")
+            lines.extend(
+                f"    {line}"
+                for line in (statement.plan or "no plan").splitlines()
+            )
+        return "\n".join(lines)
+
+
+@dataclass
+class _Call:
+    name: str
+    arguments: str
+    statements: list[StatementProfile] = field(default_factory=list)
+    overhead: float = 0.0
+
+
+profiles: deque[Profile] = deque(maxlen=PROFILE_LIMIT)
+
+_current_call: ContextVar[_Call | None] = ContextVar(
+    "pydiditbackend_profiling_call",
+    default=None,
+)
+
+
+def enable(
+    *,
+    sample_rate: float = SAMPLE_RATE,
+    path: str | Path | None = None,
+) -> None:
+    """Profile sample_rate of all API calls, appending each to path if given."""
+    _settings["sample_rate"] = sample_rate
+    _settings["path"] = None if path is None else Path(path)
+    if not _settings["enabled"]:
+        event.listen(Engine, "before_cursor_execute", _on_before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _on_after_cursor_execute)
+        _settings["enabled"] = True
+
+
+def disable() -> None:
+    """Turn off profiling."""
+    if _settings["enabled"]:
+        event.remove(Engine, "before_cursor_execute", _on_before_cursor_execute)
+        event.remove(Engine, "after_cursor_execute", _on_after_cursor_execute)
+        _settings["enabled"] = False
+
+
+def is_enabled() -> bool:
+    """Whether profiling is on."""
+    return bool(_settings["enabled"])
+
+
+def _describe(value: object) -> str:
+    # A where= clause reads better as the SQL it renders.
+    if isinstance(value, ClauseElement):
+        return str(value)
+    # A model's repr may load attributes, or need ones a new instance lacks.
+    state = inspect(value, raiseerr=False)
+    if state is not None and hasattr(state, "mapper"):
+        identity = None if state.identity is None else state.identity[0]
+        return f"<{type(value).__name__} id={identity}>"
+    return repr(value)
+
+
+def _arguments(args: tuple, kwargs: dict) -> str:
+    described = ", ".join([
+        *(_describe(arg) for arg in args),
+        *(
+            f"{name}={_describe(value)}"
+            for name, value in kwargs.items()
+            if name != "session"
+        ),
+    ])
+    return described[:ARGUMENT_LENGTH]
+
+
+@contextmanager
+def profile_call(name: str, args: tuple, kwargs: dict) -> Iterator[None]:
+    """Profile one top level API call, if it is sampled."""
+    if (
+        not _settings["enabled"]
+        or _current_call.get() is not None
+        or random.random() >= _settings["sample_rate"]  # noqa: S311
+    ):
+        yield
+        return
+    call = _Call(name, _arguments(args, kwargs))
+    token = _current_call.set(call)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        latency = time.perf_counter() - started - call.overhead
+        _current_call.reset(token)
+        _record(Profile(call.name, call.arguments, latency, tuple(call.statements)))
+
+
+def profiled(f: Callable[P, R]) -> Callable[P, R]:
+    """Profile a sample of the calls of an API function."""
+    @wraps(f)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        with profile_call(f.__name__, args, kwargs):
+            return f(*args, **kwargs)
+    return wrapper
+
+
+def _record(profile: Profile) -> None:
+    profiles.append(profile)
+    if (path := _settings["path"]) is not None:
+        with _write_lock, path.open("a") as file:
+            file.write(json.dumps(asdict(profile)) + "\n")
+
+
+def _on_before_cursor_execute(  # noqa: PLR0913
+    conn,  # noqa: ANN001, ARG001
+    cursor,  # noqa: ANN001, ARG001
+    statement: str,  # noqa: ARG001
+    parameters,  # noqa: ANN001, ARG001
+    context,  # noqa: ANN001
+    executemany: bool,  # noqa: ARG001, FBT001
+) -> None:
+    if _current_call.get() is not None and context is not None:
+        vars(context)["profiling_started"] = time.perf_counter()
+
+
+def _on_after_cursor_execute(  # noqa: PLR0913
+    conn,  # noqa: ANN001
+    cursor,  # noqa: ANN001, ARG001
+    statement: str,
+    parameters,  # noqa: ANN001
+    context,  # noqa: ANN001
+    executemany: bool,  # noqa: FBT001
+) -> None:
+    if (call := _current_call.get()) is None or context is None:
+        return
+    finished = time.perf_counter()
+    duration = finished - vars(context).get("profiling_started", finished)
+    plan = None
+    if not executemany and statement.lstrip().upper().startswith(_EXPLAINABLE):
+        plan = _explain(conn, statement, parameters)
+    call.statements.append(StatementProfile(
+        statement,
+        repr(parameters)[:ARGUMENT_LENGTH],
+        duration,
+        plan,
+    ))
+    call.overhead += time.perf_counter() - finished
+
+
+def _explain(conn, statement: str, parameters) -> str | None:  # noqa: ANN001
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    elif dialect == "postgresql":
+        analyze = (
+            statement.lstrip().upper().startswith("SELECT")
+            and conn.get_execution_options().get("postgresql_readonly")
+        )
+        prefix = "EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN "
+    else:
+        return None
+    # A cursor of its own leaves the statement's results unread.  A failed
+    # statement aborts a Postgres transaction, so EXPLAIN runs in a
+    # savepoint there, and a failure only costs the plan.
+    savepoint = dialect == "postgresql" and conn.in_transaction()
+    cursor = conn.connection.cursor()
+    try:
+        if savepoint:
+            cursor.execute(f"SAVEPOINT {_SAVEPOINT}")
+        try:
+            cursor.execute(prefix + statement, parameters)
+            rows = cursor.fetchall()
+        except Exception:
+            logger.warning("Could not explain %s", statement, exc_info=True)
+            if savepoint:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {_SAVEPOINT}")
+            return None
+        if savepoint:
+            cursor.execute(f"RELEASE SAVEPOINT {_SAVEPOINT}")
+    finally:
+        cursor.close()
+    if dialect == "postgresql":
+        return "\n".join(row[0] for row in rows)
+    # SQLite plan rows are (id, parent, unused, detail), children after parents.
+    depths = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depths[node_id] = depths.get(parent, -1) + 1
+        lines.append("  " * depths[node_id] + detail)
+    return "\n".join(lines)
+
+
+def slowest_shapes(
+    recorded: Iterable[Profile] | None = None,
+    limit: int = SHAPE_LIMIT,
+) -> list[Shape]:
+    """Group profiles, profiles by default, by shape, slowest on average first."""
+    by_shape: dict[tuple, list[Profile]] = {}
+    for profile in profiles if recorded is None else recorded:
+        by_shape.setdefault(profile.shape, []).append(profile)
+    shapes = [
+        Shape(
+            call=call,
+            statements=statements,
+            count=len(grouped),
+            mean_latency=sum(profile.latency for profile in grouped) / len(grouped),
+            slowest=max(grouped, key=lambda profile: profile.latency),
+        )
+        for (call, statements), grouped in by_shape.items()
+    ]
+    shapes.sort(key=lambda shape: shape.mean_latency, reverse=True)
+    return shapes[:limit]
+
+
+def load(path: str | Path) -> list[Profile]:
+    """Read the profiles appended to path."""
+    loaded = []
+    with Path(path).open() as file:
+        for line in file:
+            recorded = json.loads(line)
+            recorded["statements"] = tuple(
+                StatementProfile(**statement)
+                for statement in recorded["statements"]
+            )
+            loaded.append(Profile(**recorded))
+    return loaded
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Print the slowest shapes profiled into a file."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("path")
+    parser.add_argument("--limit", type=int, default=SHAPE_LIMIT)
+    args = parser.parse_args(argv)
+
+    for shape in slowest_shapes(load(args.path), args.limit):
+        print(shape)
+        print()
+
+
+if __name__ == "__main__":
+    main()
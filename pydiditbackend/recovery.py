@@ -0,0 +1,49 @@
+# ruff: noqa: T201
+"""
+Restore rows a crashed move() left shifted by MOVE_OFFSET, and wrong counts.
+
+Run it on every deploy, it does nothing when nothing is stranded or wrong:
+
+    python -m pydiditbackend.recovery [--check]
+
+which reads the database URL from PYDIDIT_DB_URL.  With --check nothing is
+changed and the exit status is 1 if any rows are stranded or miscounted.
+"""
+
+import argparse
+import os
+import sys
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker as sqlalchemy_sessionmaker
+
+import pydiditbackend
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Check for, or restore, stranded rows and denormalized counts."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args(argv)
+
+    from pydiditbackend.utils import build_rds_db_url  # noqa: PLC0415
+
+    pydiditbackend.prepare(sqlalchemy_sessionmaker(
+        create_engine(build_rds_db_url(os.environ["PYDIDIT_DB_URL"])),
+    ))
+    stranded = pydiditbackend.recover_move_offsets(dry_run=args.check)
+    miscounted = (
+        pydiditbackend.repair_counts(dry_run=args.check)
+        if hasattr(pydiditbackend.models.Project, "todo_count")
+        else 0
+    )
+    if args.check:
+        print(f"{stranded} instances stranded at MOVE_OFFSET")
+        print(f"{miscounted} instances with wrong todo counts")
+        sys.exit(1 if stranded or miscounted else 0)
+    print(f"{stranded} instances restored from MOVE_OFFSET")
+    print(f"{miscounted} instances with todo counts repaired")
+
+
+if __name__ == "__main__":
+    main()
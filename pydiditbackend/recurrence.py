@@ -0,0 +1,143 @@
+"""
+Recurrence rules for todos.
+
+A rule is a subset of the iCalendar RRULE syntax: FREQ, one of DAILY,
+WEEKLY, MONTHLY or YEARLY, with an optional INTERVAL and UNTIL, and the
+DTSTART of the series, as in
+
+    DTSTART=20260131T090000;FREQ=MONTHLY;UNTIL=20271231T000000
+
+Every occurrence is counted from DTSTART, so a monthly series started on
+the 31st falls on the last day of shorter months and is back on the 31st
+after them.  A rule set on a todo without one is anchored at the todo's
+show_from, or at the time it was set.  A todo with a rule only ever exists
+once.  When its next occurrence is
+reached, materialize_recurring() inserts the next todo, which takes the rule
+over.
+"""
+
+import calendar
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+DATETIME_FORMAT = "%Y%m%dT%H%M%S"
+
+
+class Rule(NamedTuple):
+    """A parsed recurrence rule."""
+
+    frequency: str
+    interval: int = 1
+    until: datetime | None = None
+    start: datetime | None = None
+
+
+def parse(rule: str) -> Rule:
+    """Parse rule, raising ValueError if it is not one pydidit supports."""
+    parts = {}
+    for part in rule.split(";"):
+        name, _, value = part.partition("=")
+        parts[name.strip().upper()] = value.strip()
+    frequency = parts.pop("FREQ", "").upper()
+    if frequency not in FREQUENCIES:
+        raise ValueError(f"FREQ must be one of {', '.join(FREQUENCIES)}, in {rule!r}.")
+    interval = int(parts.pop("INTERVAL", "1"))
+    if interval < 1:
+        raise ValueError(f"INTERVAL must be positive, in {rule!r}.")
+    until = parts.pop("UNTIL", None)
+    start = parts.pop("DTSTART", None)
+    if parts:
+        raise ValueError(f"Unsupported {', '.join(parts)} in {rule!r}.")
+    return Rule(
+        frequency,
+        interval,
+        None if until is None else _parse_datetime(until),
+        None if start is None else _parse_datetime(start),
+    )
+
+
+def _parse_datetime(value: str) -> datetime:
+    return datetime.strptime(value.rstrip("Z"), DATETIME_FORMAT)
+
+
+def anchor(rule: str, start: datetime) -> str:
+    """Give rule a DTSTART of start, unless it has one."""
+    if parse(rule).start is not None:
+        return rule
+    return f"DTSTART={start.strftime(DATETIME_FORMAT)};{rule}"
+
+
+def _add_months(when: datetime, months: int) -> datetime:
+    month_index = when.month - 1 + months
+    year, month = when.year + month_index // 12, month_index % 12 + 1
+    # A day past the end of a shorter month becomes its last day.
+    day = min(when.day, calendar.monthrange(year, month)[1])
+    return when.replace(year=year, month=month, day=day)
+
+
+def _occurrence(rule: Rule, start: datetime, index: int) -> datetime:
+    """The index-th occurrence after start, counted from start itself."""
+    if rule.frequency == "DAILY":
+        return start + timedelta(days=index * rule.interval)
+    if rule.frequency == "WEEKLY":
+        return start + timedelta(weeks=index * rule.interval)
+    months = rule.interval if rule.frequency == "MONTHLY" else 12 * rule.interval
+    return _add_months(start, index * months)
+
+
+def _index_after(rule: Rule, start: datetime, after: datetime) -> int:
+    """The index of the first occurrence later than after."""
+    if after < start:
+        return 0
+    if rule.frequency in ("DAILY", "WEEKLY"):
+        step = _occurrence(rule, start, 1) - start
+        index = (after - start) // step
+    else:
+        months = (after.year - start.year) * 12 + after.month - start.month
+        step = rule.interval if rule.frequency == "MONTHLY" else 12 * rule.interval
+        # No earlier index can be later than after, as its month is earlier.
+        index = months // step
+    while _occurrence(rule, start, index) <= after:
+        index += 1
+    return index
+
+
+def _until(rule: Rule, occurrence: datetime) -> datetime | None:
+    if rule.until is not None and occurrence > rule.until:
+        return None
+    return occurrence
+
+
+def next_occurrence(rule: str | Rule, after: datetime) -> datetime | None:
+    """
+    The occurrence following after, or None once the rule has ended.
+
+    Without a DTSTART the series is taken to start at after.
+    """
+    if isinstance(rule, str):
+        rule = parse(rule)
+    start = after if rule.start is None else rule.start
+    return _until(rule, _occurrence(rule, start, _index_after(rule, start, after)))
+
+
+def latest_occurrence(
+    rule: str | Rule,
+    occurrence: datetime,
+    now: datetime,
+) -> tuple[datetime, datetime | None]:
+    """
+    Skip from a reached occurrence to the latest one reached by now.
+
+    Returns it with the occurrence after it, so a todo missed for a while
+    comes back once, not once per missed occurrence.
+    """
+    if isinstance(rule, str):
+        rule = parse(rule)
+    start = occurrence if rule.start is None else rule.start
+    reached = now if rule.until is None else min(now, rule.until)
+    index = max(_index_after(rule, start, max(reached, occurrence)), 1)
+    return (
+        _occurrence(rule, start, index - 1),
+        _until(rule, _occurrence(rule, start, index)),
+    )
@@ -0,0 +1,113 @@
+# ruff: noqa: T201
+"""
+Keep the visible and overdue flags current, and recurring todos coming.
+
+Run it in-process with start(), or tick from cron or a timer with
+
+    python -m pydiditbackend.scheduler [--interval SECONDS]
+
+which reads the database URL from PYDIDIT_DB_URL.
+"""
+
+import argparse
+import logging
+import os
+import threading
+import time
+from typing import Self
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker as sqlalchemy_sessionmaker
+
+import pydiditbackend
+
+INTERVAL = 60.0
+
+logger = logging.getLogger(__name__)
+
+
+def tick() -> tuple[int, int, int]:
+    """
+    Bring everything time-dependent up to date.
+
+    Returns how many instances changed visibility, how many recurring todos
+    were materialized and how many todos became, or stopped being, overdue.
+    """
+    shown = pydiditbackend.activate_shown()
+    materialized = (
+        pydiditbackend.materialize_recurring()
+        if hasattr(pydiditbackend.models.Todo, "recurrence")
+        else 0
+    )
+    return shown, materialized, pydiditbackend.mark_overdue()
+
+
+def _tick_logged() -> None:
+    try:
+        tick()
+    except Exception:
+        # The next tick may well succeed, so carry on.
+        logger.exception("Scheduler tick failed")
+
+
+class Scheduler:
+    """A background thread calling tick() every interval seconds."""
+
+    def __init__(self, interval: float = INTERVAL) -> None:
+        """Start ticking."""
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            name="pydidit-scheduler",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            _tick_logged()
+            if self._stopped.wait(self.interval):
+                return
+
+    def stop(self) -> None:
+        """Stop ticking."""
+        self._stopped.set()
+        self._thread.join()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+
+def start(interval: float = INTERVAL) -> Scheduler:
+    """Start a scheduler in this process."""
+    return Scheduler(interval)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Tick once, or every --interval seconds."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--interval", type=float)
+    args = parser.parse_args(argv)
+
+    from pydiditbackend.utils import build_rds_db_url  # noqa: PLC0415
+
+    pydiditbackend.prepare(sqlalchemy_sessionmaker(
+        create_engine(build_rds_db_url(os.environ["PYDIDIT_DB_URL"])),
+    ))
+    if args.interval is None:
+        shown, materialized, overdue = tick()
+        print(f"{shown} instances changed visibility")
+        print(f"{materialized} recurring todos materialized")
+        print(f"{overdue} todos changed overdue")
+    else:
+        while True:
+            _tick_logged()
+            time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Streaming export and import of a whole pydidit database.
+
+export_stream() writes every table, association tables included, and
+import_stream() bulk inserts it into another database with the same ids
+and display positions, for backups and for moving between SQLite and
+Postgres.  Rows are read in batches through server-side cursors and written
+in batches, so memory use does not grow with the database.
+
+The default format is NDJSON: a header line, then for each table a line
+naming it and its columns followed by one JSON array per row.  With pyarrow
+installed, format="parquet" writes a directory holding a Parquet file per
+table and a manifest.
+"""
+
+import json
+from collections.abc import Iterator
+from contextlib import ExitStack, suppress
+from datetime import datetime
+from pathlib import Path
+from typing import IO
+
+from sqlalchemy import Boolean, DateTime, Integer, Table, false, func, select
+
+import pydiditbackend
+from pydiditbackend import models
+from pydiditbackend.models import session as session_module
+
+with suppress(ImportError):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+BATCH_SIZE = 1000
+FORMATS = ("ndjson", "parquet")
+MANIFEST = "manifest.json"
+
+
+def _models_version() -> str:
+    return models.version_num
+
+
+def _tables() -> list[Table]:
+    """Every table of the prepared models, parents before children."""
+    return [
+        table
+        for table in models.Base.metadata.sorted_tables
+        if table.name != models.AlembicVersion.__tablename__
+    ]
+
+
+def _check_format(format: str) -> None:  # noqa: A002
+    if format not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}.")
+    if format == "parquet" and "pq" not in globals():
+        raise ImportError("The parquet format needs pyarrow installed.")
+
+
+def _snapshot(session) -> None:  # noqa: ANN001
+    """
+    Read everything that follows from one snapshot of the database.
+
+    Otherwise a write committed between two tables could leave the export
+    with a todo and not its tags, or a link to a todo it does not have.
+    """
+    if session.get_bind().dialect.name == "postgresql":
+        session.connection(execution_options={
+            "isolation_level": "REPEATABLE READ",
+            "postgresql_readonly": True,
+        })
+    else:
+        # The SQLite driver begins no transaction for reads, so each SELECT
+        # would see the latest commit.
+        session.connection().exec_driver_sql("BEGIN")
+
+
+def _batches(session, table: Table, batch_size: int) -> Iterator[list]:  # noqa: ANN001
+    result = session.execute(
+        select(table).order_by(*table.primary_key.columns),
+        execution_options={"yield_per": batch_size},
+    )
+    for partition in result.partitions():
+        yield [tuple(row) for row in partition]
+
+
+def export_stream(
+    destination: IO[str] | str | Path,
+    *,
+    format: str = "ndjson",  # noqa: A002
+    batch_size: int = BATCH_SIZE,
+) -> dict[str, int]:
+    """
+    Export every table, as of one moment, in one read-only transaction.
+
+    destination is a text file, or a path, for NDJSON, and a directory path
+    for Parquet.  Returns how many rows each table had.
+    """
+    _check_format(format)
+    counts = {}
+    with session_module.sessionmaker() as session, ExitStack() as stack:  # type: ignore[attr-defined]
+        _snapshot(session)
+        if format == "parquet":
+            directory = Path(destination)
+            directory.mkdir(parents=True, exist_ok=True)
+            (directory / MANIFEST).write_text(json.dumps({
+                "models_version": _models_version(),
+                "tables": [table.name for table in _tables()],
+            }))
+        else:
+            if isinstance(destination, str | Path):
+                destination = stack.enter_context(Path(destination).open("w"))
+            destination.write(json.dumps({"models_version": _models_version()}) + "\n")
+
+        for table in _tables():
+            counts[table.name] = 0
+            if format == "parquet":
+                schema = _arrow_schema(table)
+                with pq.ParquetWriter(directory / f"{table.name}.parquet", schema) as writer:
+                    for batch in _batches(session, table, batch_size):
+                        writer.write_batch(pa.RecordBatch.from_pylist(
+                            [dict(zip(schema.names, row, strict=True)) for row in batch],
+                            schema=schema,
+                        ))
+                        counts[table.name] += len(batch)
+            else:
+                destination.write(json.dumps({
+                    "table": table.name,
+                    "columns": [column.name for column in table.columns],
+                }) + "\n")
+                for batch in _batches(session, table, batch_size):
+                    destination.writelines(
+                        json.dumps(row, default=datetime.isoformat) + "\n"
+                        for row in batch
+                    )
+                    counts[table.name] += len(batch)
+    return counts
+
+
+def import_stream(
+    source: IO[str] | str | Path,
+    *,
+    format: str = "ndjson",  # noqa: A002
+    batch_size: int = BATCH_SIZE,
+) -> dict[str, int]:
+    """
+    Import an export into empty tables, in one transaction.
+
+    The export must come from the same database version.  Ids and display
+    positions are inserted as they are, and Postgres sequences are moved
+    past the imported ids afterwards, and denormalized counts recomputed.
+    Returns how many rows each table got.
+    """
+    _check_format(format)
+    counts = {}
+    with (
+        session_module.sessionmaker() as session,  # type: ignore[attr-defined]
+        session.begin(),
+        ExitStack() as stack,
+    ):
+        if format == "parquet":
+            directory = Path(source)
+            manifest = json.loads((directory / MANIFEST).read_text())
+            _check_version(manifest["models_version"])
+            for table_name in manifest["tables"]:
+                table = models.Base.metadata.tables[table_name]
+                counts[table_name] = 0
+                parquet_file = pq.ParquetFile(directory / f"{table_name}.parquet")
+                for batch in parquet_file.iter_batches(batch_size=batch_size):
+                    rows = batch.to_pylist()
+                    if rows:
+                        session.execute(table.insert(), rows)
+                    counts[table_name] += len(rows)
+        else:
+            if isinstance(source, str | Path):
+                source = stack.enter_context(Path(source).open())
+            _check_version(json.loads(source.readline())["models_version"])
+            table = None
+            rows: list[dict] = []
+            for line in source:
+                value = json.loads(line)
+                if isinstance(value, dict):
+                    _insert(session, table, rows)
+                    table = models.Base.metadata.tables[value["table"]]
+                    columns = [table.c[name] for name in value["columns"]]
+                    counts[table.name] = 0
+                    continue
+                rows.append({
+                    column.name: _decode(column, item)
+                    for column, item in zip(columns, value, strict=True)
+                })
+                counts[table.name] += 1
+                if len(rows) == batch_size:
+                    _insert(session, table, rows)
+            _insert(session, table, rows)
+
+        if hasattr(models.Project, "todo_count"):
+            # The count triggers added the imported links to the imported counts.
+            pydiditbackend.repair_counts(session=session)
+        if session.connection().dialect.name == "postgresql":
+            _reset_sequences(session)
+    return counts
+
+
+def _check_version(models_version: str) -> None:
+    if models_version != _models_version():
+        raise ValueError(
+            f"The export is from database version {models_version}, "
+            f"not {_models_version()}.",
+        )
+
+
+def _insert(session, table: Table | None, rows: list[dict]) -> None:  # noqa: ANN001
+    """Insert rows and empty the list."""
+    if rows:
+        session.execute(table.insert(), rows)
+        rows.clear()
+
+
+def _decode(column, value):  # noqa: ANN001, ANN202
+    if value is not None and isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def _arrow_schema(table: Table) -> "pa.Schema":
+    def arrow_type(column):  # noqa: ANN001, ANN202
+        if isinstance(column.type, Boolean):
+            return pa.bool_()
+        if isinstance(column.type, Integer):
+            return pa.int64()
+        if isinstance(column.type, DateTime):
+            return pa.timestamp("us")
+        # Text and enums.
+        return pa.string()
+
+    return pa.schema([
+        pa.field(column.name, arrow_type(column), nullable=column.nullable)
+        for column in table.columns
+    ])
+
+
+def _reset_sequences(session) -> None:  # noqa: ANN001
+    """Move each serial id sequence past the imported ids."""
+    for table in _tables():
+        if table.autoincrement_column is None:
+            continue
+        session.execute(
+            select(func.setval(
+                func.pg_get_serial_sequence(table.name, table.autoincrement_column.name),
+                select(func.coalesce(func.max(table.autoincrement_column), 0) + 1)
+                .scalar_subquery(),
+                false(),
+            )),
+        )
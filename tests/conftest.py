@@ -0,0 +1,44 @@
+import pydiditbackend
+import pytest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker as sqlalchemy_sessionmaker
+
+BASELINE_MODELS_VERSION = "3c2c44a6ac9b"
+MODELS_VERSION = "5b0e6c2f9a41"
+
+def pytest_addoption(parser):
+    # The models of one version are all a process can load.
+    parser.addoption("--models-version", default=MODELS_VERSION)
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "models_versions(*versions): the models versions to run on, by default the latest",
+    )
+
+def pytest_collection_modifyitems(config, items):
+    models_version = config.getoption("models_version")
+    selected, deselected = [], []
+    for item in items:
+        marker = item.get_closest_marker("models_versions")
+        versions = marker.args if marker else (MODELS_VERSION,)
+        (selected if models_version in versions else deselected).append(item)
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = selected
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite:///:memory:", echo=True)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def prepare(engine, request):
+    pydiditbackend.prepare(
+        sqlalchemy_sessionmaker(engine),
+        version_override=request.config.getoption("models_version"),
+    )
+    pydiditbackend.models.base.Base.metadata.create_all(engine)
+    yield
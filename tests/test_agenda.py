@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+import pydiditbackend
+import pytest
+
+# A Wednesday afternoon.
+NOW = datetime(2025, 7, 9, 15, 30)
+
+
+@pytest.fixture
+def populated(prepare):
+    dues = {
+        "long overdue": NOW - timedelta(days=30),
+        "overdue": NOW - timedelta(hours=1),
+        "today": NOW + timedelta(hours=1),
+        "friday": NOW + timedelta(days=2),
+        "next week": NOW + timedelta(days=6),
+        "undated": None,
+    }
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        for i, (description, due) in enumerate(dues.items()):
+            pydiditbackend.put(
+                pydiditbackend.models.Todo(description=description, due=due, display_position=i),
+                session=session,
+            )
+        pydiditbackend.put(
+            pydiditbackend.models.Todo(
+                description="hidden",
+                due=NOW + timedelta(hours=2),
+                show_from=NOW + timedelta(hours=1),
+                display_position=len(dues),
+            ),
+            session=session,
+        )
+        pydiditbackend.put(
+            pydiditbackend.models.Todo(
+                description="done",
+                due=NOW - timedelta(hours=2),
+                state=pydiditbackend.models.enums.State.completed,
+                display_position=len(dues) + 1,
+            ),
+            session=session,
+        )
+
+
+def _descriptions(agenda):
+    return {
+        name: [instance.description for instance in instances]
+        for name, instances in agenda.items()
+    }
+
+
+def test_default_agenda(populated):
+    assert _descriptions(pydiditbackend.get_agenda(clock=lambda: NOW)) == {
+        "overdue": ["long overdue", "overdue"],
+        "today": ["today"],
+        "this_week": ["friday"],
+        "later": [],
+    }
+
+
+def test_agenda_range(populated):
+    agenda = pydiditbackend.get_agenda(
+        NOW - timedelta(days=1),
+        NOW + timedelta(days=10),
+        clock=lambda: NOW,
+        include_completed=True,
+    )
+
+    assert _descriptions(agenda) == {
+        "overdue": ["done", "overdue"],
+        "today": ["today"],
+        "this_week": ["friday"],
+        "later": ["next week"],
+    }
+
+
+def test_agenda_projects(populated):
+    assert _descriptions(pydiditbackend.get_agenda(model="Project", clock=lambda: NOW)) == {
+        "overdue": [],
+        "today": [],
+        "this_week": [],
+        "later": [],
+    }
+
+
+def test_bucketed_clock():
+    clock = pydiditbackend.bucketed_clock(timedelta(minutes=15), clock=lambda: NOW + timedelta(minutes=7, seconds=3))
+
+    assert clock() == NOW
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+
+import pydiditbackend
+import pytest
+
+from sqlalchemy import func, select
+
+from tests.conftest import BASELINE_MODELS_VERSION
+
+NOW = datetime(2030, 1, 1)
+
+
+@pytest.fixture
+def populated(prepare):
+    models = pydiditbackend.models
+    State = models.enums.State
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        tag = models.Tag(name="tag")
+        done = models.Todo(description="done", state=State.completed, display_position=0, tags=[tag])
+        live = models.Todo(description="live", display_position=1, tags=[tag], prereq_todos=[done])
+        project = models.Project(
+            description="project",
+            state=State.completed,
+            display_position=0,
+            contain_todos=[done, live],
+        )
+        session.add_all([done, live, project])
+        session.flush()
+        return {instance.description: instance.id for instance in (done, live, project)}
+
+
+def _rows(table_name):
+    table = pydiditbackend.models.Base.metadata.tables[table_name]
+    with pydiditbackend.sessionmaker() as session:
+        return session.scalar(select(func.count()).select_from(table))
+
+
+def test_archive_moves_completed_instances_and_links(populated):
+    assert pydiditbackend.archive_completed(timedelta(days=1), now=NOW) == 2
+
+    assert [todo.description for todo in pydiditbackend.get("Todo", include_completed=True)] == ["done", "live"]
+    assert pydiditbackend.count("Todo", include_completed=True) == 2
+    assert pydiditbackend.count("Todo") == 1
+    assert pydiditbackend.count_by("Todo", "state", include_completed=True) == {
+        pydiditbackend.models.enums.State.active: 1,
+        pydiditbackend.models.enums.State.completed: 1,
+    }
+    assert [row.description for row in pydiditbackend.get_rows(
+        "Todo",
+        columns=["description"],
+        include_completed=True,
+        where=pydiditbackend.models.Todo.description == "done",
+    )] == ["done"]
+    with pydiditbackend.sessionmaker() as session:
+        assert session.scalar(select(func.count(pydiditbackend.models.Todo.id))) == 1
+    assert _rows("todo_tag") == 1
+    assert _rows("todo_prereq_todo") == 0
+    assert _rows("project_contain_todo") == 0
+    assert _rows("archived_link") == 4
+    assert pydiditbackend.get("Project", include_completed=True)[0].description == "project"
+
+
+def test_model_columns_read_the_archive(populated):
+    pydiditbackend.archive_completed(timedelta(days=1), now=NOW)
+    todo = pydiditbackend.models.Todo
+
+    rows = pydiditbackend.get_rows(
+        "Todo",
+        columns=[todo.id, todo.description],
+        include_completed=True,
+    )
+
+    assert sorted(tuple(row) for row in rows) == [
+        (populated["done"], "done"),
+        (populated["live"], "live"),
+    ]
+
+
+def test_recent_and_active_instances_stay(populated):
+    assert pydiditbackend.archive_completed(timedelta(days=1)) == 0
+    assert pydiditbackend.archive_completed(timedelta(days=1), now=NOW) == 2
+    assert pydiditbackend.archive_completed(timedelta(days=1), now=NOW) == 0
+
+
+def test_unarchive_brings_links_back(populated):
+    pydiditbackend.archive_completed(timedelta(days=1), now=NOW)
+    pydiditbackend.put(pydiditbackend.models.Todo(description="new"))
+
+    assert pydiditbackend.unarchive("Todo", [populated["done"]]) == 1
+    # The project is still archived, so only the links to live instances return.
+    assert _rows("archived_link") == 2
+    todos = pydiditbackend.get("Todo", include_completed=True)
+    assert [todo.description for todo in todos] == ["live", "new", "done"]
+    assert todos[2].id == populated["done"]
+    assert [tag.name for tag in todos[2].tags] == ["tag"]
+
+    assert pydiditbackend.unarchive("Project", [populated["project"]]) == 1
+    assert _rows("archived_link") == 0
+    project = pydiditbackend.get("Project", include_completed=True)[0]
+    assert [todo.description for todo in project.contain_todos] == ["done", "live"]
+
+
+def test_archived_ids_are_not_reused(populated):
+    pydiditbackend.archive_completed(timedelta(days=1), now=NOW)
+    pydiditbackend.delete("Todo", populated["live"])
+
+    pydiditbackend.put(pydiditbackend.models.Todo(description="new"))
+
+    todo = pydiditbackend.get("Todo", filter_by={"description": "new"})[0]
+    assert todo.id not in (populated["done"], populated["live"])
+
+
+@pytest.mark.models_versions(BASELINE_MODELS_VERSION)
+def test_archiving_needs_the_archive(prepare):
+    with pytest.raises(pydiditbackend.UnsupportedDatabaseError, match="81bb304d61c8"):
+        pydiditbackend.archive_completed(now=NOW)
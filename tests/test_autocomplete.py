@@ -0,0 +1,137 @@
+import time
+
+import pydiditbackend
+import pytest
+
+from sqlalchemy import create_engine, inspect
+
+from pydiditbackend.autocomplete import Autocompleter, trigrams
+from pydiditbackend.notify import ChangeEvent
+
+TIMEOUT = 5
+
+
+def _populate():
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        for name in ("groceries", "garden", "work"):
+            pydiditbackend.put(pydiditbackend.models.Tag(name=name), session=session)
+        for i, description in enumerate(("Buy groceries", "Call the garage", "Water garden")):
+            pydiditbackend.put(
+                pydiditbackend.models.Todo(description=description, display_position=i),
+                session=session,
+            )
+
+
+def test_trigrams_match_pg_trgm():
+    assert trigrams("cat") == {"  c", " ca", "cat", "at "}
+
+
+def test_complete_prefers_text_prefix(prepare):
+    _populate()
+
+    with Autocompleter(follow_changes=False) as completer:
+        matches = completer.complete("gar")
+
+    assert [match.text for match in matches] == ["garden", "Call the garage", "Water garden"]
+    assert [match.text for match in completer.complete("GRO")] == ["groceries", "Buy groceries"]
+    assert len(completer.complete("gar", limit=1)) == 1
+    assert completer.complete("xyz") == []
+
+
+def test_fuzzy_tolerates_typos(prepare):
+    _populate()
+
+    with Autocompleter(follow_changes=False) as completer:
+        matches = completer.fuzzy("grocreies")
+
+    assert matches[0].text == "groceries"
+    assert all(match.score >= 0.3 for match in matches)
+    assert "work" not in [match.text for match in matches]
+
+
+def test_apply_updates_the_index(prepare):
+    _populate()
+    completer = Autocompleter(follow_changes=False)
+    tag = pydiditbackend.get("Tag", filter_by={"name": "work"})[0]
+    tag_id = tag.id
+
+    tag.name = "workshop"
+    pydiditbackend.put(tag)
+    completer.apply(ChangeEvent("tag", "UPDATE", {"id": tag_id}))
+    assert [match.text for match in completer.complete("works")] == ["workshop"]
+
+    pydiditbackend.delete("Tag", tag_id)
+    completer.apply(ChangeEvent("tag", "DELETE", {"id": tag_id}))
+    assert completer.complete("work") == []
+    assert completer.fuzzy("workshop") == []
+
+
+def test_changes_while_loading_win(prepare):
+    _populate()
+    [tag_id] = [row.id for row in pydiditbackend.get_rows(
+        "Tag",
+        columns=["id"],
+        filter_by={"name": "work"},
+    )]
+
+    class DeletedWhileLoading(Autocompleter):
+        def _rows(self, model_name, instance_id=None):
+            rows = super()._rows(model_name, instance_id)
+            if model_name == "Tag" and instance_id is None:
+                # Read before the delete, applied after it.
+                pydiditbackend.delete("Tag", tag_id)
+                self.apply(ChangeEvent("tag", "DELETE", {"id": tag_id}))
+            return rows
+
+    completer = DeletedWhileLoading(follow_changes=False)
+
+    assert completer.complete("work") == []
+    assert [match.text for match in completer.complete("gro")] == ["groceries", "Buy groceries"]
+
+
+def test_fuzzy_leaves_out_long_entries(prepare):
+    _populate()
+    pydiditbackend.put(pydiditbackend.models.Tag(name="groceries and a great many other words"))
+
+    with Autocompleter(follow_changes=False) as completer:
+        matches = completer.fuzzy("groceries")
+
+    assert [match.text for match in matches] == ["groceries", "Buy groceries"]
+
+
+def test_tag_name_is_indexed(prepare, engine):
+    indexes = inspect(engine).get_indexes("tag")
+
+    assert {"name": "ix_tag_name", "column_names": ["name"]}.items() <= {
+        key: value for index in indexes if index["name"] == "ix_tag_name"
+        for key, value in index.items()
+    }.items()
+
+
+def test_fuzzy_search_needs_postgres(prepare):
+    with pytest.raises(pydiditbackend.UnsupportedDatabaseError):
+        pydiditbackend.search("groceries", fuzzy=True)
+
+
+class TestFollowChanges:
+    @pytest.fixture
+    def engine(self, tmp_path):
+        # The poller runs in its own thread, which needs to see the same database.
+        engine = create_engine(f"sqlite:///{tmp_path / 'autocomplete.db'}", echo=True)
+        yield engine
+        engine.dispose()
+
+    def test_follows_writes(self, prepare):
+        _populate()
+
+        with Autocompleter(poll_interval=0.05) as completer:
+            pydiditbackend.put(pydiditbackend.models.Tag(name="gardening"))
+            deadline = time.monotonic() + TIMEOUT
+            while len(completer.complete("garden")) < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        assert [match.text for match in completer.complete("garden")] == [
+            "garden",
+            "gardening",
+            "Water garden",
+        ]
@@ -0,0 +1,29 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from tests.conftest import BASELINE_MODELS_VERSION
+
+
+def test_suites_pass_on_the_baseline_models():
+    # The models of one version are all a process can load, so the suites
+    # marked for the first version run again in a process of their own.
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "pytest",
+            "-q",
+            "-p",
+            "no:cacheprovider",
+            f"--models-version={BASELINE_MODELS_VERSION}",
+            "tests",
+        ],
+        cwd=Path(__file__).parent.parent,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+
+    assert result.returncode == 0, result.stdout[-5000:]
+    assert " passed" in result.stdout.splitlines()[-1]
@@ -0,0 +1,51 @@
+import pytest
+
+from sqlalchemy import create_engine
+
+from benchmarks import run
+
+
+def test_run_produces_comparable_report():
+    report = run.run(
+        sizes=[40],
+        backends=["sqlite-memory", "postgres"],
+        operations=list(run.OPERATIONS),
+        repeat=1,
+    )
+
+    assert report["metadata"]["models_version"] == run.MODELS_VERSION
+    assert {result["operation"] for result in report["results"]} == set(run.OPERATIONS)
+    assert {result["backend"] for result in report["results"]} == {"sqlite-memory"}
+
+    comparison = run.compare(report, report)
+    assert len(comparison) == len(run.OPERATIONS)
+    assert all(row["ratio"] == 1 for row in comparison)
+
+
+def test_run_measures_concurrent_writes():
+    report = run.run(
+        sizes=[40],
+        backends=["sqlite-file"],
+        operations=["get_todo"],
+        repeat=1,
+        writers=4,
+    )
+
+    writes = {
+        result["operation"]: result
+        for result in report["results"]
+        if result["operation"].startswith("writes_")
+    }
+    assert set(writes) == {"writes_1_threads", "writes_4_threads"}
+    assert writes["writes_4_threads"]["repeat"] == 4 * run.WRITES
+    assert all(result["ops_per_second"] > 0 for result in writes.values())
+
+
+def test_refuses_to_drop_existing_tables(prepare, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'existing.db'}")
+    run.models.Base.metadata.create_all(engine)
+
+    with pytest.raises(ValueError, match="--destroy"):
+        run._check_scratch(engine, destroy=False)
+    run._check_scratch(engine, destroy=True)
+    engine.dispose()
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+import pydiditbackend
+import pytest
+
+from sqlalchemy import func, select, update
+
+from tests.conftest import BASELINE_MODELS_VERSION
+
+LONG_AGO = datetime(2000, 1, 1)
+WATERMARK = datetime(2000, 1, 2)
+
+
+@pytest.fixture
+def ids(prepare):
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        kept = pydiditbackend.models.Todo(description="kept", display_position=0)
+        removed = pydiditbackend.models.Todo(description="removed", display_position=1)
+        tag = pydiditbackend.models.Tag(name="tag")
+        for instance in (kept, removed, tag):
+            pydiditbackend.put(instance, session=session)
+        session.flush()
+        ids = {"kept": kept.id, "removed": removed.id, "tag": tag.id}
+        for model in (pydiditbackend.models.Todo, pydiditbackend.models.Tag):
+            session.execute(update(model).values(modified_at=LONG_AGO))
+    return ids
+
+
+def test_full_snapshot(ids):
+    changes = pydiditbackend.changes_since(None)
+
+    assert len(changes.updated["Todo"]) == 2
+    assert len(changes.updated["Tag"]) == 1
+    assert changes.deleted["Todo"] == []
+    assert changes.watermark == LONG_AGO
+
+
+def test_nothing_changed(ids):
+    changes = pydiditbackend.changes_since(WATERMARK)
+
+    assert all(instances == [] for instances in changes.updated.values())
+    assert all(instance_ids == [] for instance_ids in changes.deleted.values())
+    assert changes.watermark == WATERMARK
+
+
+def test_relationship_and_delete_changes(ids):
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        todo = pydiditbackend.get("Todo", filter_by={"id": ids["kept"]}, session=session)[0]
+        todo.tags.append(pydiditbackend.get("Tag", session=session)[0])
+    pydiditbackend.delete("Todo", ids["removed"])
+
+    changes = pydiditbackend.changes_since(WATERMARK)
+
+    assert [todo.id for todo in changes.updated["Todo"]] == [ids["kept"]]
+    assert [tag.id for tag in changes.updated["Tag"]] == [ids["tag"]]
+    assert changes.updated["Note"] == []
+    assert changes.deleted["Todo"] == [ids["removed"]]
+    assert changes.watermark > WATERMARK
+
+
+def test_late_commits_are_not_skipped(ids):
+    pydiditbackend.put(pydiditbackend.models.Todo(description="new"))
+    watermark = pydiditbackend.changes_since(WATERMARK).watermark
+    # A transaction begun a minute ago commits after that read.
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        began = session.scalar(select(func.now())) - timedelta(minutes=1)
+        session.execute(
+            update(pydiditbackend.models.Todo)
+            .where(pydiditbackend.models.Todo.id == ids["kept"])
+            .values(modified_at=began),
+        )
+
+    changes = pydiditbackend.changes_since(watermark)
+
+    assert ids["kept"] in [todo.id for todo in changes.updated["Todo"]]
+    assert changes.watermark >= watermark
+
+
+def test_purge_tombstones(ids):
+    pydiditbackend.delete("Todo", ids["removed"])
+
+    pydiditbackend.purge_tombstones(datetime(2999, 1, 1))
+
+    assert pydiditbackend.changes_since(WATERMARK).deleted["Todo"] == []
+
+
+@pytest.mark.models_versions(BASELINE_MODELS_VERSION)
+def test_change_feed_needs_tombstones(prepare):
+    with pytest.raises(pydiditbackend.UnsupportedDatabaseError, match="fd6249b0b314"):
+        pydiditbackend.changes_since(None)
@@ -0,0 +1,80 @@
+import random
+import threading
+
+import pydiditbackend
+import pytest
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import DBAPIError
+
+THREADS = 8
+OPERATIONS = 25
+TODOS = 20
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # Every writer thread needs to see the same database.
+    engine = create_engine(f"sqlite:///{tmp_path / 'concurrency.db'}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def populated(prepare):
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        for i in range(TODOS):
+            session.add(pydiditbackend.models.Todo(description=f"todo{i}", display_position=i))
+
+
+def _write(seed, errors):
+    rng = random.Random(seed)
+    try:
+        for i in range(OPERATIONS):
+            roll = rng.random()
+            if roll < 0.3:
+                pydiditbackend.put(pydiditbackend.models.Todo(description=f"todo{seed}-{i}"))
+            elif roll < 0.5:
+                pydiditbackend.move("Todo", rng.randint(1, TODOS), rng.choice(("start", "end")))
+            else:
+                pydiditbackend.move("Todo", rng.randint(1, TODOS), rng.randint(0, TODOS))
+    except Exception as error:  # noqa: BLE001
+        errors.append(error)
+
+
+def test_concurrent_puts_and_moves(populated):
+    errors = []
+    threads = [
+        threading.Thread(target=_write, args=(seed, errors))
+        for seed in range(THREADS)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    todos = pydiditbackend.get("Todo")
+    display_positions = [todo.display_position for todo in todos]
+    assert len(set(display_positions)) == len(todos)
+    assert all(abs(display_position) < pydiditbackend.MOVE_OFFSET // 2 for display_position in display_positions)
+    puts = sum(todo.description.count("-") for todo in todos)
+    assert len(todos) == TODOS + puts
+    assert {f"todo{i}" for i in range(TODOS)} <= {todo.description for todo in todos}
+
+
+def test_lost_race_is_retried(prepare, monkeypatch):
+    pydiditbackend.put(pydiditbackend.models.Todo(description="todo", display_position=0))
+    lock_ordering = pydiditbackend._lock_ordering
+    failures = [DBAPIError("BEGIN IMMEDIATE", None, Exception("database is locked"))]
+
+    def flaky_lock_ordering(*args, **kwargs):
+        if failures:
+            raise failures.pop()
+        return lock_ordering(*args, **kwargs)
+
+    monkeypatch.setattr(pydiditbackend, "_lock_ordering", flaky_lock_ordering)
+    pydiditbackend.move("Todo", 1, 5)
+
+    assert failures == []
+    assert pydiditbackend.get("Todo")[0].display_position == 5
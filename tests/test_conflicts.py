@@ -0,0 +1,83 @@
+import pydiditbackend
+import pytest
+
+from sqlalchemy import event
+
+from pydiditbackend import ConflictError
+from pydiditbackend.models.enums import State
+
+
+@pytest.fixture
+def todo_ids(prepare):
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        for i in range(3):
+            pydiditbackend.put(
+                pydiditbackend.models.Todo(description=f"todo{i}", display_position=i),
+                session=session,
+            )
+    return [todo.id for todo in pydiditbackend.get("Todo")]
+
+
+def test_stale_put_conflicts(todo_ids):
+    [first] = pydiditbackend.get("Todo", filter_by={"id": todo_ids[0]})
+    [second] = pydiditbackend.get("Todo", filter_by={"id": todo_ids[0]})
+    first.description = "first"
+    pydiditbackend.put(first)
+
+    second.description = "second"
+    with pytest.raises(ConflictError):
+        pydiditbackend.put(second)
+
+    [todo] = pydiditbackend.get("Todo", filter_by={"id": todo_ids[0]})
+    assert (todo.description, todo.version) == ("first", 2)
+
+
+def test_mark_completed_is_one_compare_and_swap(todo_ids, engine):
+    [todo] = pydiditbackend.get("Todo", filter_by={"id": todo_ids[0]})
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(engine, "before_cursor_execute", listener)
+
+    pydiditbackend.mark_completed(todo)
+
+    event.remove(engine, "before_cursor_execute", listener)
+    [statement] = statements
+    assert statement.startswith("UPDATE todo")
+    assert "todo.version = ?" in statement
+    assert (todo.state, todo.version) == (State.completed, 2)
+    assert pydiditbackend.get("Todo", filter_by={"id": todo_ids[0]}) == []
+
+
+def test_stale_mark_completed_conflicts(todo_ids):
+    [stale] = pydiditbackend.get("Todo", filter_by={"id": todo_ids[0]})
+    [fresh] = pydiditbackend.get("Todo", filter_by={"id": todo_ids[0]})
+    fresh.description = "renamed"
+    pydiditbackend.put(fresh)
+
+    with pytest.raises(ConflictError):
+        pydiditbackend.mark_completed(stale)
+
+    assert stale.state == State.active
+    assert pydiditbackend.count("Todo") == 3
+
+
+def test_mark_completed_by_id(todo_ids):
+    pydiditbackend.mark_completed("Todo", todo_ids[0])
+
+    assert pydiditbackend.count("Todo") == 2
+    with pytest.raises(ValueError, match="There is no Todo"):
+        pydiditbackend.mark_completed("Todo", max(todo_ids) + 1)
+
+
+def test_stale_move_conflicts(todo_ids):
+    [stale] = pydiditbackend.get("Todo", filter_by={"id": todo_ids[2]})
+    pydiditbackend.move("Todo", todo_ids[2], "start")
+
+    with pytest.raises(ConflictError):
+        pydiditbackend.move(stale, 1)
+
+    assert [todo.id for todo in pydiditbackend.get("Todo")] == [
+        todo_ids[2],
+        todo_ids[0],
+        todo_ids[1],
+    ]
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+
+import pydiditbackend
+import pytest
+
+from pydiditbackend.models.enums import State
+from tests.conftest import BASELINE_MODELS_VERSION, MODELS_VERSION
+
+pytestmark = pytest.mark.models_versions(BASELINE_MODELS_VERSION, MODELS_VERSION)
+
+
+@pytest.fixture
+def populated(prepare):
+    now = datetime.now()
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        urgent = pydiditbackend.models.Tag(name="urgent")
+        home = pydiditbackend.models.Tag(name="home")
+        project = pydiditbackend.models.Project(description="project", display_position=0)
+        subproject = pydiditbackend.models.Project(description="subproject", display_position=1)
+        project.contain_projects.append(subproject)
+        for i in range(6):
+            todo = pydiditbackend.models.Todo(
+                description=f"todo{i}",
+                display_position=i,
+                state=State.completed if i == 5 else State.active,
+                due=now - timedelta(days=1) if i < 2 else None,
+            )
+            session.add(todo)
+            todo.tags.append(urgent if i % 2 else home)
+            (project if i < 4 else subproject).contain_todos.append(todo)
+            pydiditbackend.put(todo, session=session)
+        session.flush()
+        return {
+            "urgent": urgent.id,
+            "home": home.id,
+            "project": project.id,
+            "subproject": subproject.id,
+        }
+
+
+def test_count(populated):
+    assert pydiditbackend.count("Todo") == 5
+    assert pydiditbackend.count("Todo", include_completed=True) == 6
+    assert pydiditbackend.count("Todo", filter_by={"description": "todo1"}) == 1
+    assert pydiditbackend.count("Project") == 2
+    assert pydiditbackend.count("Tag") == 2
+
+
+def test_count_by_tag(populated):
+    assert pydiditbackend.count_by("Todo", "tag") == {
+        populated["home"]: 3,
+        populated["urgent"]: 2,
+    }
+    assert pydiditbackend.count_by("Todo", "tag", include_completed=True)[populated["urgent"]] == 3
+
+
+def test_count_by_project(populated):
+    assert pydiditbackend.count_by("Todo", "project") == {
+        populated["project"]: 4,
+        populated["subproject"]: 1,
+    }
+    assert pydiditbackend.count_by("Project", "project") == {populated["project"]: 1}
+
+
+def test_count_by_state(populated):
+    assert pydiditbackend.count_by("Todo", "state", include_completed=True) == {
+        State.active: 5,
+        State.completed: 1,
+    }
+
+
+def test_count_by_unknown_group(populated):
+    with pytest.raises(ValueError):
+        pydiditbackend.count_by("Todo", "color")
+
+
+def test_count_by_unsupported_group(populated):
+    with pytest.raises(ValueError, match="Note by tag"):
+        pydiditbackend.count_by("Note", "tag")
+
+
+def test_count_overdue(populated):
+    assert pydiditbackend.count_overdue("Todo") == 2
+    assert pydiditbackend.count_overdue(
+        "Todo",
+        where=pydiditbackend.models.Todo.tags.any(name="urgent"),
+    ) == 1
+    assert pydiditbackend.count_overdue("Todo", now=datetime.now() - timedelta(days=2)) == 0
+
+
+def test_count_overdue_needs_due(populated):
+    with pytest.raises(ValueError, match="Tag has no due date"):
+        pydiditbackend.count_overdue("Tag")
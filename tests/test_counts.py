@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+
+import pydiditbackend
+import pytest
+
+from sqlalchemy import update
+
+from pydiditbackend.models.enums import State
+from tests.conftest import BASELINE_MODELS_VERSION
+
+
+@pytest.fixture
+def populated(prepare):
+    now = datetime.now()
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        tag = pydiditbackend.models.Tag(name="tag")
+        project = pydiditbackend.models.Project(description="project", display_position=0)
+        session.add_all([tag, project])
+        for i in range(4):
+            todo = pydiditbackend.models.Todo(
+                description=f"todo{i}",
+                display_position=i,
+                state=State.completed if i == 3 else State.active,
+                due={0: now - timedelta(days=1), 1: now + timedelta(days=1)}.get(i),
+            )
+            todo.tags.append(tag)
+            project.contain_todos.append(todo)
+            session.add(todo)
+        session.flush()
+        return {
+            "tag": tag.id,
+            "project": project.id,
+            "todos": [todo.id for todo in project.contain_todos],
+        }
+
+
+def counts(model_name, instance_id):
+    [instance] = pydiditbackend.get(model_name, filter_by={"id": instance_id})
+    return instance.todo_count, instance.active_todo_count, instance.overdue_todo_count
+
+
+def test_counts_follow_links(populated):
+    assert counts("Project", populated["project"]) == (4, 3, 1)
+    assert counts("Tag", populated["tag"]) == (4, 3, 1)
+
+    pydiditbackend.untag_many(populated["tag"], populated["todos"][:1])
+
+    assert counts("Tag", populated["tag"]) == (3, 2, 0)
+
+
+def test_counts_follow_state(populated):
+    pydiditbackend.mark_completed("Todo", populated["todos"][0])
+
+    assert counts("Project", populated["project"]) == (4, 2, 0)
+
+    pydiditbackend.delete("Todo", populated["todos"][1])
+
+    assert counts("Project", populated["project"]) == (3, 1, 0)
+    assert counts("Tag", populated["tag"]) == (3, 1, 0)
+
+
+def test_counts_follow_the_clock(populated):
+    assert pydiditbackend.mark_overdue(now=datetime.now() + timedelta(days=2)) == 1
+
+    assert counts("Project", populated["project"]) == (4, 3, 2)
+
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        [todo] = pydiditbackend.get(
+            "Todo",
+            filter_by={"id": populated["todos"][0]},
+            session=session,
+        )
+        todo.due = None
+
+    assert counts("Tag", populated["tag"]) == (4, 3, 1)
+
+
+def test_counts_survive_archiving(populated):
+    pydiditbackend.archive_completed(timedelta(0), now=datetime.now() + timedelta(days=1))
+
+    assert counts("Project", populated["project"]) == (3, 3, 1)
+
+    pydiditbackend.unarchive("Todo", populated["todos"][3:])
+
+    assert counts("Project", populated["project"]) == (4, 3, 1)
+
+
+def test_repair_counts(populated):
+    assert pydiditbackend.repair_counts(dry_run=True) == 0
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        session.execute(update(pydiditbackend.models.Tag).values(todo_count=0))
+        session.execute(update(pydiditbackend.models.Project).values(overdue_todo_count=7))
+
+    assert pydiditbackend.repair_counts(dry_run=True) == 2
+    assert pydiditbackend.repair_counts() == 2
+
+    assert counts("Project", populated["project"]) == (4, 3, 1)
+    assert counts("Tag", populated["tag"]) == (4, 3, 1)
+    assert pydiditbackend.repair_counts() == 0
+
+
+def test_repair_counts_keeps_modified_at(populated):
+    modified_at = datetime(2000, 1, 1)
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        session.execute(
+            update(pydiditbackend.models.Tag).values(todo_count=0, modified_at=modified_at),
+        )
+
+    assert pydiditbackend.repair_counts() == 1
+    [tag] = pydiditbackend.get_rows("Tag", columns=["modified_at"])
+    assert tag.modified_at == modified_at
+
+
+@pytest.mark.models_versions(BASELINE_MODELS_VERSION)
+def test_counts_need_the_count_columns(prepare):
+    assert pydiditbackend.mark_overdue() == 0
+    with pytest.raises(pydiditbackend.UnsupportedDatabaseError, match="5b0e6c2f9a41"):
+        pydiditbackend.repair_counts()
@@ -0,0 +1,72 @@
+import pydiditbackend
+import pytest
+
+from pydiditbackend import debug
+
+
+@pytest.fixture
+def debug_mode(prepare):
+    debug.reports.clear()
+    debug.enable(row_ratio_threshold=4, repeat_threshold=3)
+    yield
+    debug.disable()
+    debug.reports.clear()
+
+
+def test_row_explosion_reports_relationship(debug_mode):
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        tags = [pydiditbackend.models.Tag(name=f"tag{i}") for i in range(3)]
+        for i in range(4):
+            todo = pydiditbackend.models.Todo(description=f"todo{i}", display_position=i)
+            todo.tags.extend(tags)
+            todo.notes.extend([
+                pydiditbackend.models.Note(text=f"note{i}a"),
+                pydiditbackend.models.Note(text=f"note{i}b"),
+            ])
+            pydiditbackend.put(todo, session=session)
+
+    assert len(pydiditbackend.get("Todo")) == 4
+
+    report = debug.reports[-1]
+    assert report.call == "get"
+    assert report.raw_rows == 24
+    assert report.unique_entities == 4
+    assert report.relationships["Todo.tags"] == (3, 3)
+    assert report.relationships["Todo.notes"] == (2, 2)
+
+
+def test_quiet_call_is_not_reported(debug_mode):
+    pydiditbackend.put(pydiditbackend.models.Todo(description="todo", display_position=0))
+
+    pydiditbackend.get("Todo")
+
+    assert len(debug.reports) == 0
+
+
+def test_repeated_statements_are_reported(debug_mode):
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        for i in range(4):
+            pydiditbackend.put(
+                pydiditbackend.models.Todo(description=f"todo{i}", display_position=i),
+                session=session,
+            )
+
+    with debug.track_call("handler"):
+        for i in range(4):
+            pydiditbackend.get("Todo", filter_by={"id": i + 1})
+
+    report = debug.reports[-1]
+    assert report.call == "handler"
+    assert list(report.repeated_statements.values()) == [4]
+
+
+def test_disabled_by_default(prepare):
+    assert not debug.is_enabled()
+    with debug.track_call("anything") as stats:
+        assert stats is None
+
+
+def test_normalize_statement():
+    assert debug.normalize_statement(
+        "SELECT * FROM todo\n WHERE id = 12 AND description = 'it''s'",
+    ) == "SELECT * FROM todo WHERE id = ? AND description = ?"
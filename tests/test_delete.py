@@ -0,0 +1,104 @@
+import pydiditbackend
+import pytest
+
+from sqlalchemy import event, func, select
+
+
+@pytest.fixture
+def populated(prepare):
+    models = pydiditbackend.models
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        tag = models.Tag(name="tag")
+        note = models.Note(text="note")
+        loose = models.Todo(description="loose", tags=[tag])
+        child = models.Project(
+            description="child",
+            contain_todos=[models.Todo(description=f"child{i}", tags=[tag]) for i in range(3)],
+        )
+        root = models.Project(
+            description="root",
+            contain_projects=[child],
+            contain_todos=[models.Todo(description="root0", notes=[note], prereq_todos=[loose])],
+            tags=[tag],
+        )
+        other = models.Project(description="other", prereq_projects=[root])
+        session.add_all([loose, root, other])
+        session.flush()
+        return {
+            instance.description: instance.id
+            for instance in (loose, child, root, other)
+        }
+
+
+@pytest.fixture
+def statements(engine):
+    recorded = []
+
+    def record(conn, cursor, statement, *args):  # noqa: ANN001, ANN002
+        recorded.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield recorded
+    event.remove(engine, "before_cursor_execute", record)
+
+
+def _descriptions(model):
+    return sorted(
+        instance.description
+        for instance in pydiditbackend.get(model, include_completed=True, include_future_show_from=True)
+    )
+
+
+def _association_rows():
+    with pydiditbackend.sessionmaker() as session:
+        return {
+            table.name: session.scalar(select(func.count()).select_from(table))
+            for table, _, _ in pydiditbackend._association_columns(pydiditbackend.models.Todo)
+        } | {
+            table.name: session.scalar(select(func.count()).select_from(table))
+            for table, _, _ in pydiditbackend._association_columns(pydiditbackend.models.Project)
+        }
+
+
+def test_delete_without_cascade_keeps_contents(populated):
+    pydiditbackend.delete("Project", populated["root"])
+
+    assert _descriptions("Project") == ["child", "other"]
+    assert len(_descriptions("Todo")) == 5
+    rows = _association_rows()
+    assert rows["project_contain_project"] == 0
+    assert rows["project_prereq_project"] == 0
+    assert rows["project_contain_todo"] == 3
+    assert rows["project_tag"] == 0
+
+
+def test_delete_cascades_through_subprojects(populated, statements):
+    assert pydiditbackend.delete_many("Project", [populated["root"]], cascade=True) == 6
+
+    assert _descriptions("Project") == ["other"]
+    assert _descriptions("Todo") == ["loose"]
+    assert _association_rows() == dict.fromkeys(_association_rows(), 0) | {"todo_tag": 1}
+    changes = pydiditbackend.changes_since(None)
+    assert {model_name: len(ids) for model_name, ids in changes.deleted.items()} == {
+        "Todo": 4, "Project": 2, "Note": 0, "Tag": 0,
+    }
+    assert [todo.description for todo in changes.updated["Todo"]] == ["loose"]
+    assert [project.description for project in changes.updated["Project"]] == ["other"]
+
+
+def test_delete_many_loads_nothing(populated, statements):
+    ids = [todo.id for todo in pydiditbackend.get("Todo") if todo.description.startswith("child")]
+    statements.clear()
+
+    assert pydiditbackend.delete_many("Todo", ids) == 3
+
+    assert not any(statement.startswith("SELECT") for statement in statements)
+    assert _descriptions("Todo") == ["loose", "root0"]
+
+
+def test_delete_in_unit_of_work_refreshes_loaded_instances(populated):
+    with pydiditbackend.unit_of_work():
+        child = pydiditbackend.get("Project", filter_by={"id": populated["child"]})[0]
+        assert len(child.contain_todos) == 3
+        pydiditbackend.delete("Todo", child.contain_todos[0].id)
+        assert len(child.contain_todos) == 2
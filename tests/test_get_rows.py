@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+import pydiditbackend
+import pytest
+
+from tests.conftest import BASELINE_MODELS_VERSION, MODELS_VERSION
+
+pytestmark = pytest.mark.models_versions(BASELINE_MODELS_VERSION, MODELS_VERSION)
+
+
+def _populate():
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        for i in range(5):
+            pydiditbackend.put(
+                pydiditbackend.models.Todo(
+                    description=f"todo{i}",
+                    display_position=10 - i,
+                    state=(
+                        pydiditbackend.models.enums.State.completed
+                        if i == 4
+                        else pydiditbackend.models.enums.State.active
+                    ),
+                    show_from=datetime.now() + timedelta(days=1) if i == 3 else None,
+                ),
+                session=session,
+            )
+
+
+def test_get_rows_matches_get(prepare):
+    _populate()
+
+    rows = pydiditbackend.get_rows("Todo", columns=["id", "description", "display_position"])
+
+    assert [row.description for row in rows] == ["todo2", "todo1", "todo0"]
+    assert [row.id for row in rows] == [todo.id for todo in pydiditbackend.get("Todo")]
+    assert rows[0]._fields == ("id", "description", "display_position")
+
+
+def test_get_rows_filters(prepare):
+    _populate()
+
+    assert len(pydiditbackend.get_rows("Todo", include_completed=True)) == 4
+    assert len(pydiditbackend.get_rows("Todo", include_future_show_from=True)) == 4
+    assert [
+        row.description
+        for row in pydiditbackend.get_rows(
+            pydiditbackend.models.Todo,
+            columns=["description"],
+            filter_by={"description": "todo1"},
+        )
+    ] == ["todo1"]
+    assert [
+        row.description
+        for row in pydiditbackend.get_rows(
+            "Todo",
+            columns=[pydiditbackend.models.Todo.description],
+            where=pydiditbackend.models.Todo.display_position > 8,
+        )
+    ] == ["todo1", "todo0"]
+
+
+def test_get_rows_defaults_to_every_column(prepare):
+    _populate()
+
+    row = pydiditbackend.get_rows("Todo", filter_by={"description": "todo0"})[0]
+
+    assert row.description == "todo0"
+    assert row.state == pydiditbackend.models.enums.State.active
+    assert row.due is None
@@ -0,0 +1,268 @@
+import queue
+import tempfile
+
+import pydiditbackend
+import pytest
+
+from pydiditbackend import invalidation
+from pydiditbackend.invalidation import (
+    Cache,
+    Invalidation,
+    InvalidationBus,
+    SocketTransport,
+    TableTransport,
+)
+
+TIMEOUT = 5
+
+
+@pytest.fixture
+def socket_directory():
+    # tmp_path can be too long for a Unix socket path.
+    with tempfile.TemporaryDirectory() as directory:
+        yield directory
+
+
+@pytest.fixture
+def bus(prepare, socket_directory):
+    bus = invalidation.install(SocketTransport(socket_directory))
+    yield bus
+    invalidation.uninstall()
+
+
+@pytest.fixture
+def received(bus):
+    received = []
+    bus.subscribe(received.append)
+    return received
+
+
+def _todos(count):
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        for i in range(count):
+            pydiditbackend.put(
+                pydiditbackend.models.Todo(description=f"todo{i}", display_position=i),
+                session=session,
+            )
+    return [todo.id for todo in pydiditbackend.get("Todo")]
+
+
+def test_writes_are_published_after_commit(bus, received):
+    todo_ids = _todos(2)
+    assert received == [Invalidation("Todo", frozenset(todo_ids))]
+    received.clear()
+
+    pydiditbackend.mark_completed("Todo", todo_ids[0])
+    assert received == [Invalidation("Todo", frozenset(todo_ids[:1]))]
+    received.clear()
+
+    pydiditbackend.delete("Todo", todo_ids[1])
+    assert received == [Invalidation("Todo", frozenset(todo_ids[1:]))]
+
+
+def test_move_invalidates_shifted_instances(bus, received):
+    todo_ids = _todos(3)
+    received.clear()
+
+    pydiditbackend.move("Todo", todo_ids[2], 1)
+
+    assert received == [Invalidation("Todo", frozenset(todo_ids[1:]))]
+
+
+def test_relationship_changes_invalidate_both_sides(bus, received):
+    todo_ids = _todos(2)
+    pydiditbackend.put(pydiditbackend.models.Tag(name="tag"))
+    tag_id = pydiditbackend.get("Tag")[0].id
+    received.clear()
+
+    pydiditbackend.tag_many(tag_id, todo_ids)
+
+    assert sorted(received) == [
+        Invalidation("Tag", frozenset([tag_id])),
+        Invalidation("Todo", frozenset(todo_ids)),
+    ]
+    received.clear()
+
+    pydiditbackend.delete("Tag", tag_id)
+
+    assert sorted(received) == [
+        Invalidation("Tag", frozenset([tag_id])),
+        Invalidation("Todo", frozenset(todo_ids)),
+    ]
+
+
+def test_rolled_back_writes_are_not_published(bus, received):
+    with pytest.raises(RuntimeError), pydiditbackend.unit_of_work():
+        pydiditbackend.put(pydiditbackend.models.Todo(description="todo", display_position=0))
+        raise RuntimeError
+
+    pydiditbackend.get("Todo")
+
+    assert received == []
+
+
+def test_nothing_is_recorded_without_a_bus(prepare):
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        pydiditbackend.put(
+            pydiditbackend.models.Todo(description="todo", display_position=0),
+            session=session,
+        )
+        assert "pydidit_invalidations" not in session.info
+
+
+@pytest.mark.parametrize("transport", [
+    lambda directory: SocketTransport(directory),
+    lambda directory: TableTransport(f"{directory}/versions.db"),
+])
+def test_other_processes_receive(socket_directory, transport):
+    events = queue.Queue()
+    with (
+        InvalidationBus(transport(socket_directory), poll_interval=0.01).start() as publisher,
+        InvalidationBus(transport(socket_directory), poll_interval=0.01).start() as listener,
+    ):
+        listener.subscribe(events.put)
+        publisher.subscribe(events.put)
+
+        publisher.publish([Invalidation("Todo", frozenset({1, 2}))])
+
+        # Once here, right away, and once from the other bus.
+        assert events.get(timeout=TIMEOUT) == Invalidation("Todo", frozenset({1, 2}))
+        assert events.get(timeout=TIMEOUT) == Invalidation("Todo", frozenset({1, 2}))
+        publisher.publish([Invalidation("Tag", frozenset(range(invalidation.MAX_IDS + 1)))])
+        events.get(timeout=TIMEOUT)
+        assert events.get(timeout=TIMEOUT) == Invalidation("Tag", None)
+    assert events.empty()
+
+
+def test_table_transport_catches_up_after_pruning(tmp_path, monkeypatch):
+    monkeypatch.setattr(invalidation, "RETAINED_VERSIONS", 1)
+    publisher = TableTransport(tmp_path / "versions.db")
+    listener = TableTransport(tmp_path / "versions.db")
+    listener.open()
+
+    for model in ("Todo", "Tag"):
+        publisher.publish(invalidation._encode("origin", [Invalidation(model, None)]))
+
+    [everything, tags] = listener.receive(0)
+    assert '"invalidations": [[null, null]]' in everything
+    assert '"Tag"' in tags
+
+
+def test_cache(bus):
+    todo_ids = _todos(2)
+    cache = Cache(bus)
+    loads = []
+
+    def load():
+        loads.append(None)
+        return pydiditbackend.get("Todo", filter_by={"id": todo_ids[0]})
+
+    for _ in range(2):
+        cache.get("Todo", todo_ids[0], load, ids=frozenset(todo_ids[:1]))
+        cache.get("Todo", "all", lambda: pydiditbackend.get("Todo"))
+    assert len(loads) == 1
+
+    pydiditbackend.mark_completed("Todo", todo_ids[1])
+    assert cache.get("Todo", todo_ids[0], load) is not None
+    assert len(loads) == 1
+    assert cache.get("Todo", "all", list) == []
+
+    pydiditbackend.mark_completed("Todo", todo_ids[0])
+    cache.get("Todo", todo_ids[0], load)
+    assert len(loads) == 2
+    cache.close()
+
+
+def test_cache_drops_loads_overtaken_by_invalidation(bus):
+    cache = Cache(bus)
+
+    def load():
+        # The value read is already outdated when it comes back.
+        bus.publish([Invalidation("Todo", frozenset({1}))])
+        return "stale"
+
+    assert cache.get("Todo", 1, load, ids=frozenset({1})) == "stale"
+    assert cache.get("Todo", 1, lambda: "fresh", ids=frozenset({1})) == "fresh"
+    assert cache.get("Todo", 1, lambda: "reloaded", ids=frozenset({1})) == "fresh"
+    cache.close()
+
+
+class _InTransactionTransport(SocketTransport):
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.sent = []
+
+    def publish(self, payload):
+        raise AssertionError("Published outside the transaction.")
+
+    def publish_in(self, connection, payload):
+        self.sent.append((connection.in_transaction(), payload))
+
+
+def test_transactional_transports_publish_before_commit(prepare, socket_directory):
+    transport = _InTransactionTransport(socket_directory)
+    bus = invalidation.install(transport)
+    received = []
+    bus.subscribe(received.append)
+    try:
+        todo_ids = _todos(1)
+    finally:
+        invalidation.uninstall()
+
+    [(in_transaction, payload)] = transport.sent
+    assert in_transaction
+    assert '"Todo"' in payload
+    assert received == [Invalidation("Todo", frozenset(todo_ids))]
+
+
+class _FlakyTransport(SocketTransport):
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.failures = 1
+
+    def receive(self, timeout):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("connection lost")
+        return super().receive(timeout)
+
+
+def test_listener_survives_transport_errors(socket_directory):
+    events = queue.Queue()
+    with (
+        InvalidationBus(SocketTransport(socket_directory), poll_interval=0.01) as publisher,
+        InvalidationBus(_FlakyTransport(socket_directory), poll_interval=0.01).start() as listener,
+    ):
+        listener.subscribe(events.put)
+
+        # Messages may have been missed while reconnecting.
+        assert events.get(timeout=TIMEOUT) == Invalidation(None, None)
+        publisher.publish([Invalidation("Todo", frozenset({1}))])
+        assert events.get(timeout=TIMEOUT) == Invalidation("Todo", frozenset({1}))
+
+
+class _BrokenTransport(SocketTransport):
+    def publish(self, payload):
+        raise OSError("transport down")
+
+
+def test_committed_writes_survive_publish_errors(prepare, socket_directory):
+    invalidation.install(_BrokenTransport(socket_directory))
+    try:
+        pydiditbackend.put(pydiditbackend.models.Todo(description="todo"))
+    finally:
+        invalidation.uninstall()
+
+    assert [todo.description for todo in pydiditbackend.get("Todo")] == ["todo"]
+
+
+def test_full_listeners_do_not_block_publishers(socket_directory):
+    listener = SocketTransport(socket_directory)
+    listener.open()
+    try:
+        # Far more than a socket queues, with nothing receiving.
+        for _ in range(10000):
+            SocketTransport(socket_directory).publish("x" * 1000)
+        assert listener.receive(0)
+    finally:
+        listener.close()
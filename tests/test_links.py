@@ -0,0 +1,94 @@
+import pydiditbackend
+import pytest
+
+from sqlalchemy import event, select
+
+from tests.conftest import BASELINE_MODELS_VERSION, MODELS_VERSION
+
+pytestmark = pytest.mark.models_versions(BASELINE_MODELS_VERSION, MODELS_VERSION)
+
+
+@pytest.fixture
+def populated(prepare):
+    models = pydiditbackend.models
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        session.add_all([
+            models.Todo(description=f"todo{i}", display_position=i)
+            for i in range(5)
+        ])
+        session.add(models.Project(description="project", display_position=0))
+        session.add(models.Tag(name="tag"))
+        session.add_all([models.Note(text=f"note{i}") for i in range(3)])
+
+
+@pytest.fixture
+def statements(engine):
+    recorded = []
+
+    def record(conn, cursor, statement, *args):  # noqa: ANN001, ANN002
+        recorded.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield recorded
+    event.remove(engine, "before_cursor_execute", record)
+
+
+def _tagged(model="Todo"):
+    return sorted(
+        instance.id
+        for instance in pydiditbackend.get(model, include_completed=True)
+        if instance.tags
+    )
+
+
+def test_tag_many_skips_existing_and_missing(populated, statements):
+    assert pydiditbackend.tag_many(1, [1, 2]) == 2
+    statements.clear()
+    assert pydiditbackend.tag_many(1, [2, 3, 4, 99]) == 2
+
+    assert not any(statement.startswith("SELECT") for statement in statements)
+    assert sum(statement.startswith("INSERT") for statement in statements) == 1
+    assert _tagged() == [1, 2, 3, 4]
+
+
+def test_untag_many(populated):
+    pydiditbackend.tag_many(1, [1, 2, 3])
+    assert pydiditbackend.untag_many(1, [2, 3, 4]) == 2
+    assert _tagged() == [1]
+
+
+def test_tag_many_projects(populated):
+    tag = pydiditbackend.get("Tag")[0]
+    assert pydiditbackend.tag_many(tag, [1], model="Project") == 1
+    assert _tagged("Project") == [1]
+
+
+def test_attach_notes(populated):
+    assert pydiditbackend.attach_notes(2, [1, 2]) == 2
+    assert pydiditbackend.attach_notes(2, [2, 3]) == 1
+    todo = pydiditbackend.get("Todo", filter_by={"id": 2})[0]
+    assert sorted(note.text for note in todo.notes) == ["note0", "note1", "note2"]
+
+
+def test_link_prereqs(populated):
+    assert pydiditbackend.link_prereqs(5, [1, 2]) == 2
+    assert pydiditbackend.link_prereqs(1, [5], model="Project") == 1
+    with pydiditbackend.unit_of_work():
+        todo = pydiditbackend.get("Todo", filter_by={"id": 5})[0]
+        assert sorted(prereq.id for prereq in todo.prereq_todos) == [1, 2]
+        project = pydiditbackend.get("Project")[0]
+        assert [prereq.id for prereq in project.prereq_todos] == [5]
+
+
+def test_links_update_the_change_feed_and_loaded_instances(populated):
+    models = pydiditbackend.models
+    with pydiditbackend.unit_of_work() as session:
+        todo = session.scalars(select(models.Todo).filter_by(id=1)).unique().one()
+        assert todo.tags == []
+        modified_at = todo.modified_at
+        session.execute(
+            models.Todo.__table__.update().values(modified_at=modified_at.replace(year=2000)),
+        )
+        pydiditbackend.tag_many(1, [1])
+        assert [tag.name for tag in todo.tags] == ["tag"]
+        assert todo.modified_at.year != 2000
@@ -1,19 +1,11 @@
-import os
 from itertools import chain
 
 import pydiditbackend
 import pytest
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker as sqlalchemy_sessionmaker
+from tests.conftest import BASELINE_MODELS_VERSION, MODELS_VERSION
 
-@pytest.fixture
-def prepare():
-    engine = create_engine("sqlite:///:memory:", echo=True)
-    pydiditbackend.prepare(sqlalchemy_sessionmaker(engine), version_override="3c2c44a6ac9b")
-    pydiditbackend.models.base.Base.metadata.create_all(engine)
-    yield
-    engine.dispose()
+pytestmark = pytest.mark.models_versions(BASELINE_MODELS_VERSION, MODELS_VERSION)
 
 
 def test_special_boundary_start_end(prepare):
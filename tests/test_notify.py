@@ -0,0 +1,81 @@
+import asyncio
+import queue
+
+import pydiditbackend
+import pytest
+
+from sqlalchemy import create_engine
+
+from pydiditbackend.notify import ChangeEvent, Subscription
+from tests.conftest import BASELINE_MODELS_VERSION
+
+TIMEOUT = 5
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # The poller runs in its own thread, which needs to see the same database.
+    engine = create_engine(f"sqlite:///{tmp_path / 'notify.db'}", echo=True)
+    yield engine
+    engine.dispose()
+
+
+def test_poll_delivers_writes_to_callbacks(prepare):
+    pydiditbackend.put(pydiditbackend.models.Todo(description="old", display_position=0))
+    events = queue.Queue()
+
+    with pydiditbackend.subscribe(events.put, poll_interval=0.05) as subscription:
+        assert subscription.mode == "poll"
+        pydiditbackend.put(pydiditbackend.models.Todo(description="new", display_position=1))
+        todo_id = pydiditbackend.get("Todo", filter_by={"description": "new"})[0].id
+        assert events.get(timeout=TIMEOUT) == ChangeEvent("todo", "INSERT", {"id": todo_id})
+
+        pydiditbackend.delete("Todo", todo_id)
+        assert events.get(timeout=TIMEOUT) == ChangeEvent("todo", "DELETE", {"id": todo_id})
+
+    assert events.empty()
+
+
+def test_poll_async_iteration(prepare):
+    async def first_event():
+        with pydiditbackend.subscribe(poll_interval=0.05) as subscription:
+            iterator = aiter(subscription)
+            pending = asyncio.ensure_future(anext(iterator))
+            await asyncio.sleep(0)
+            await asyncio.to_thread(
+                pydiditbackend.put,
+                pydiditbackend.models.Tag(name="tag"),
+            )
+            return await asyncio.wait_for(pending, TIMEOUT)
+
+    event = asyncio.run(first_event())
+
+    assert (event.table, event.operation) == ("tag", "INSERT")
+
+
+def test_poll_survives_database_errors(prepare, monkeypatch):
+    changes_since = Subscription._changes_since
+    calls = []
+
+    def flaky_changes_since(self, watermark):
+        calls.append(watermark)
+        # The first poll after starting fails.
+        if len(calls) == 2:
+            raise OSError("database went away")
+        return changes_since(self, watermark)
+
+    monkeypatch.setattr(Subscription, "_changes_since", flaky_changes_since)
+    events = queue.Queue()
+
+    with pydiditbackend.subscribe(events.put, poll_interval=0.05):
+        pydiditbackend.put(pydiditbackend.models.Tag(name="tag"))
+        event = events.get(timeout=TIMEOUT)
+
+    assert len(calls) > 2
+    assert (event.table, event.operation) == ("tag", "INSERT")
+
+
+@pytest.mark.models_versions(BASELINE_MODELS_VERSION)
+def test_subscribe_needs_tombstones(prepare):
+    with pytest.raises(pydiditbackend.UnsupportedDatabaseError, match="fd6249b0b314"):
+        pydiditbackend.subscribe(lambda event: None)
@@ -0,0 +1,122 @@
+import sqlite3
+
+import pydiditbackend
+import pytest
+from sqlalchemy import create_engine
+
+from pydiditbackend import profiling
+
+
+@pytest.fixture
+def profiling_mode(prepare):
+    profiling.profiles.clear()
+    profiling.enable(sample_rate=1.0)
+    yield
+    profiling.disable()
+    profiling.profiles.clear()
+
+
+def test_call_records_plan(profiling_mode):
+    pydiditbackend.put(pydiditbackend.models.Todo(description="todo", display_position=0))
+
+    todos = pydiditbackend.get(
+        "Todo",
+        where=pydiditbackend.models.Todo.description == "todo",
+    )
+
+    assert len(todos) == 1
+    profile = profiling.profiles[-1]
+    assert profile.call == "get"
+    assert "todo.description = :description_1" in profile.arguments
+    assert profile.latency > 0
+    plans = [statement.plan for statement in profile.statements]
+    assert any("SCAN todo" in plan or "SEARCH todo" in plan for plan in plans)
+
+
+def test_nested_calls_are_profiled_once(profiling_mode):
+    pydiditbackend.put(pydiditbackend.models.Todo(description="todo", display_position=0))
+
+    assert [profile.call for profile in profiling.profiles] == ["put"]
+
+
+def test_unsampled_calls_are_not_profiled(prepare):
+    profiling.profiles.clear()
+    profiling.enable(sample_rate=0.0)
+    try:
+        pydiditbackend.get("Todo")
+    finally:
+        profiling.disable()
+
+    assert len(profiling.profiles) == 0
+
+
+def test_slowest_shapes_group_literals():
+    def profile(latency, todo_id):
+        statement = f"SELECT * FROM todo WHERE id = {todo_id}"
+        return profiling.Profile(
+            "get",
+            "",
+            latency,
+            (profiling.StatementProfile(statement, "()", latency, None),),
+        )
+
+    recorded = [
+        profile(0.001, 1),
+        profile(0.003, 2),
+        profiling.Profile("count", "", 0.004, ()),
+    ]
+
+    shapes = profiling.slowest_shapes(recorded)
+
+    assert [shape.call for shape in shapes] == ["count", "get"]
+    assert shapes[1].count == 2
+    assert shapes[1].mean_latency == pytest.approx(0.002)
+    assert shapes[1].slowest.latency == 0.003
+
+
+def test_cli_dumps_saved_profiles(prepare, tmp_path, capsys):
+    path = tmp_path / "profiles.ndjson"
+    profiling.enable(sample_rate=1.0, path=path)
+    try:
+        pydiditbackend.get("Todo")
+        pydiditbackend.get("Todo")
+    finally:
+        profiling.disable()
+        profiling.profiles.clear()
+
+    profiling.main([str(path), "--limit", "1"])
+
+    output = capsys.readouterr().out
+    assert output.startswith("get: 2 calls")
+    assert "SCAN todo" in output
+
+
+class _UnexplainableCursor(sqlite3.Cursor):
+    def execute(self, statement, *args):
+        if statement.startswith("EXPLAIN"):
+            raise sqlite3.OperationalError("cannot explain")
+        return super().execute(statement, *args)
+
+
+class _UnexplainableConnection(sqlite3.Connection):
+    def cursor(self, factory=_UnexplainableCursor):
+        return super().cursor(factory)
+
+
+class TestUnexplainable:
+    @pytest.fixture
+    def engine(self):
+        engine = create_engine(
+            "sqlite://",
+            creator=lambda: sqlite3.connect(":memory:", factory=_UnexplainableConnection),
+        )
+        yield engine
+        engine.dispose()
+
+    def test_failed_explain_leaves_the_call_alone(self, profiling_mode):
+        pydiditbackend.put(pydiditbackend.models.Todo(description="todo", display_position=0))
+
+        assert len(pydiditbackend.get("Todo")) == 1
+        profile = profiling.profiles[-1]
+        assert profile.call == "get"
+        assert [statement.plan for statement in profile.statements] == [None]
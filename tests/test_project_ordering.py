@@ -0,0 +1,109 @@
+import pydiditbackend
+import pytest
+
+from sqlalchemy import event, select
+
+
+@pytest.fixture
+def projects(prepare):
+    Project = pydiditbackend.models.Project
+    Todo = pydiditbackend.models.Todo
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        # Both projects get their todos in one flush, so the per-project
+        # positions are allocated within a single executemany.
+        session.add_all([
+            Project(
+                description="home",
+                contain_todos=[Todo(description=f"home{i}") for i in range(5)],
+            ),
+            Project(
+                description="work",
+                contain_todos=[Todo(description=f"work{i}") for i in range(3)],
+            ),
+        ])
+    with pydiditbackend.sessionmaker() as session:
+        return {
+            project.description: project.id
+            for project in session.scalars(select(Project)).unique()
+        }
+
+
+def _list(project_id):
+    project = pydiditbackend.get("Project", filter_by={"id": project_id})[0]
+    return [todo.description for todo in project.contain_todos]
+
+
+def _positions(project_id):
+    table = pydiditbackend.models.Base.metadata.tables["project_contain_todo"]
+    with pydiditbackend.sessionmaker() as session:
+        return sorted(session.scalars(
+            select(table.c.display_position).where(table.c.project_id == project_id),
+        ))
+
+
+def _todo_id(description):
+    return pydiditbackend.get("Todo", filter_by={"description": description})[0].id
+
+
+def test_positions_are_allocated_per_project(projects):
+    assert _positions(projects["home"]) == [0, 1, 2, 3, 4]
+    assert _positions(projects["work"]) == [0, 1, 2]
+
+
+def test_put_appends_to_the_project(projects):
+    project = pydiditbackend.get("Project", filter_by={"id": projects["work"]})[0]
+    pydiditbackend.put(pydiditbackend.models.Todo(
+        description="work3",
+        contained_by_projects=[project],
+    ))
+
+    assert _list(projects["work"]) == ["work0", "work1", "work2", "work3"]
+    assert _positions(projects["work"]) == [0, 1, 2, 3]
+
+
+def test_move_within_project(projects):
+    home = projects["home"]
+    pydiditbackend.move("Todo", _todo_id("home3"), 1, within=home)
+    assert _list(home) == ["home0", "home3", "home1", "home2", "home4"]
+
+    pydiditbackend.move("Todo", _todo_id("home0"), 3, within=home)
+    assert _list(home) == ["home3", "home1", "home2", "home0", "home4"]
+
+    todo = pydiditbackend.get("Todo", filter_by={"description": "home4"})[0]
+    pydiditbackend.move(todo, "start", within=home)
+    assert _list(home) == ["home4", "home3", "home1", "home2", "home0"]
+
+    pydiditbackend.move("Todo", _todo_id("home4"), "end", within=home)
+    assert _list(home) == ["home3", "home1", "home2", "home0", "home4"]
+
+    target = pydiditbackend.get("Todo", filter_by={"description": "home1"})[0]
+    pydiditbackend.move("Todo", _todo_id("home4"), target, within=home)
+    assert _list(home) == ["home3", "home4", "home1", "home2", "home0"]
+
+    assert _list(projects["work"]) == ["work0", "work1", "work2"]
+
+
+def test_move_within_project_leaves_other_lists_alone(projects, engine):
+    global_positions = [todo.display_position for todo in pydiditbackend.get("Todo")]
+    statements = []
+
+    def record(conn, cursor, statement, *args):  # noqa: ANN001, ANN002
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        pydiditbackend.move("Todo", _todo_id("work2"), 0, within=projects["work"])
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert _list(projects["work"]) == ["work2", "work0", "work1"]
+    assert [todo.display_position for todo in pydiditbackend.get("Todo")] == global_positions
+    writes = [statement for statement in statements if statement.startswith("UPDATE")]
+    assert writes
+    assert all(statement.startswith("UPDATE project_contain_todo") for statement in writes)
+    assert all("project_contain_todo.project_id = ?" in statement for statement in writes)
+
+
+def test_move_within_project_requires_membership(projects):
+    with pytest.raises(ValueError, match="is not in project"):
+        pydiditbackend.move("Todo", _todo_id("work0"), 0, within=projects["home"])
@@ -0,0 +1,60 @@
+import pydiditbackend
+import pytest
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.orm import sessionmaker as sqlalchemy_sessionmaker
+
+from tests.conftest import MODELS_VERSION
+
+
+def _put_todo(description, session=None):
+    pydiditbackend.put(
+        pydiditbackend.models.Todo(description=description, display_position=0),
+        session=session,
+    )
+
+
+def test_reads_commit_nothing(prepare, engine):
+    _put_todo("todo")
+    commits = []
+    event.listen(engine, "commit", commits.append)
+
+    [todo] = pydiditbackend.get("Todo")
+    assert pydiditbackend.count("Todo") == 1
+    assert len(pydiditbackend.search("todo")) == 1
+
+    assert commits == []
+    # Detached, with everything loaded.
+    assert (todo.description, todo.tags) == ("todo", [])
+
+
+def test_reads_join_a_unit_of_work(prepare):
+    with pydiditbackend.unit_of_work():
+        _put_todo("todo")
+        assert pydiditbackend.count("Todo") == 1
+
+
+@pytest.fixture
+def replica(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    yield engine
+    engine.dispose()
+
+
+def test_reads_can_be_routed_to_a_replica(engine, replica):
+    class RoutingSession(Session):
+        def get_bind(self, *args, **kwargs):
+            return replica if self.info.get("read_only") else engine
+
+    pydiditbackend.prepare(
+        sqlalchemy_sessionmaker(engine, class_=RoutingSession),
+        version_override=MODELS_VERSION,
+    )
+    for bind in (engine, replica):
+        pydiditbackend.models.base.Base.metadata.create_all(bind)
+    _put_todo("primary")
+    with Session(replica) as session, session.begin():
+        _put_todo("replica", session=session)
+
+    assert [todo.description for todo in pydiditbackend.get("Todo")] == ["replica"]
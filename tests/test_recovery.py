@@ -0,0 +1,53 @@
+import pydiditbackend
+import pytest
+
+from sqlalchemy import update
+
+from tests.conftest import BASELINE_MODELS_VERSION, MODELS_VERSION
+
+pytestmark = pytest.mark.models_versions(BASELINE_MODELS_VERSION, MODELS_VERSION)
+
+MOVE_OFFSET = pydiditbackend.MOVE_OFFSET
+
+
+@pytest.fixture
+def populated(prepare):
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        for i in range(5):
+            session.add(pydiditbackend.models.Todo(description=f"todo{i}", display_position=i))
+        session.add(pydiditbackend.models.Project(description="project", display_position=0))
+
+
+def _strand(*descriptions):
+    Todo = pydiditbackend.models.Todo
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        session.execute(
+            update(Todo)
+            .where(Todo.description.in_(descriptions))
+            .values(display_position=Todo.display_position + MOVE_OFFSET),
+        )
+
+
+def _positions():
+    return {
+        todo.description: todo.display_position
+        for todo in pydiditbackend.get("Todo")
+    }
+
+
+def test_restores_stranded_rows(populated):
+    _strand("todo1", "todo3")
+
+    assert pydiditbackend.recover_move_offsets(dry_run=True) == 2
+    assert pydiditbackend.recover_move_offsets() == 2
+    assert _positions() == {f"todo{i}": i for i in range(5)}
+    assert pydiditbackend.recover_move_offsets() == 0
+    assert pydiditbackend.recover_move_offsets(dry_run=True) == 0
+
+
+def test_collided_rows_go_to_the_end(populated):
+    _strand("todo1", "todo2")
+    pydiditbackend.move("Todo", 5, 1)
+
+    assert pydiditbackend.recover_move_offsets() == 2
+    assert _positions() == {"todo0": 0, "todo4": 1, "todo2": 2, "todo3": 3, "todo1": 4}
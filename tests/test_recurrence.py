@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta
+
+import pydiditbackend
+import pytest
+
+from pydiditbackend import recurrence
+from tests.conftest import BASELINE_MODELS_VERSION
+
+START = datetime(2026, 1, 31, 9)
+
+
+@pytest.mark.parametrize(("rule", "expected"), [
+    ("FREQ=DAILY", datetime(2026, 2, 1, 9)),
+    ("FREQ=WEEKLY;INTERVAL=2", datetime(2026, 2, 14, 9)),
+    ("FREQ=MONTHLY", datetime(2026, 2, 28, 9)),
+    ("FREQ=YEARLY", datetime(2027, 1, 31, 9)),
+    ("FREQ=DAILY;UNTIL=20260131T235959", None),
+])
+def test_next_occurrence(rule, expected):
+    assert recurrence.next_occurrence(rule, START) == expected
+
+
+@pytest.mark.parametrize("rule", ["FREQ=HOURLY", "FREQ=DAILY;INTERVAL=0", "FREQ=DAILY;COUNT=3"])
+def test_unsupported_rules(rule):
+    with pytest.raises(ValueError):
+        recurrence.parse(rule)
+
+
+def test_monthly_occurrences_keep_the_day_of_dtstart():
+    rule = recurrence.anchor("FREQ=MONTHLY", START)
+    occurrences = [START]
+    for _ in range(3):
+        occurrences.append(recurrence.next_occurrence(rule, occurrences[-1]))
+
+    assert [occurrence.day for occurrence in occurrences] == [31, 28, 31, 30]
+
+
+def test_anchor_keeps_an_existing_dtstart():
+    rule = "DTSTART=20250101T000000;FREQ=DAILY"
+
+    assert recurrence.anchor(rule, START) == rule
+    assert recurrence.next_occurrence(rule, START) == datetime(2026, 2, 1)
+
+
+def test_latest_occurrence_counts_from_dtstart():
+    rule = recurrence.anchor("FREQ=MONTHLY", START)
+
+    assert recurrence.latest_occurrence(rule, datetime(2026, 2, 28, 9), datetime(2026, 5, 1)) == (
+        datetime(2026, 4, 30, 9),
+        datetime(2026, 5, 31, 9),
+    )
+
+
+def test_latest_occurrence_skips_missed_ones():
+    assert recurrence.latest_occurrence("FREQ=DAILY", START, START + timedelta(days=3, hours=1)) == (
+        START + timedelta(days=3),
+        START + timedelta(days=4),
+    )
+
+
+@pytest.fixture
+def recurring(prepare):
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        tag = pydiditbackend.models.Tag(name="chores")
+        project = pydiditbackend.models.Project(description="home", display_position=0)
+        pydiditbackend.put(
+            pydiditbackend.models.Todo(
+                description="water plants",
+                display_position=0,
+                show_from=START,
+                due=START + timedelta(hours=2),
+                recurrence="FREQ=WEEKLY",
+                tags=[tag],
+                contained_by_projects=[project],
+            ),
+            session=session,
+        )
+        pydiditbackend.put(
+            pydiditbackend.models.Todo(description="once", display_position=1),
+            session=session,
+        )
+
+
+def test_recurs_at_is_scheduled(recurring):
+    [todo] = pydiditbackend.get("Todo", filter_by={"description": "water plants"})
+
+    assert todo.recurs_at == START + timedelta(weeks=1)
+
+
+def test_nothing_to_materialize_yet(recurring):
+    assert pydiditbackend.materialize_recurring(now=START + timedelta(days=1)) == 0
+
+
+def test_materialize_inserts_the_successor(recurring):
+    now = START + timedelta(weeks=3, days=1)
+
+    assert pydiditbackend.materialize_recurring(now=now) == 1
+
+    old, new = pydiditbackend.get(
+        "Todo",
+        filter_by={"description": "water plants"},
+        include_future_show_from=True,
+    )
+    assert (old.recurrence, old.recurs_at) == (None, None)
+    assert new.show_from == START + timedelta(weeks=3)
+    assert new.due == START + timedelta(weeks=3, hours=2)
+    assert (new.recurrence, new.recurs_at) == (
+        "DTSTART=20260131T090000;FREQ=WEEKLY",
+        START + timedelta(weeks=4),
+    )
+    assert new.display_position == 2
+    assert [tag.name for tag in new.tags] == ["chores"]
+    [project] = pydiditbackend.get("Project")
+    assert [todo.id for todo in project.contain_todos] == [old.id, new.id]
+    # Only the successor recurs from now on.
+    assert pydiditbackend.materialize_recurring(now=now) == 0
+
+
+def test_ended_rules_are_not_carried_over(prepare):
+    pydiditbackend.put(pydiditbackend.models.Todo(
+        description="twice",
+        display_position=0,
+        show_from=START,
+        recurrence="FREQ=DAILY;UNTIL=20260201T090000",
+    ))
+
+    assert pydiditbackend.materialize_recurring(now=START + timedelta(days=5)) == 1
+    assert pydiditbackend.count("Todo") == 2
+    assert pydiditbackend.get_rows(
+        "Todo",
+        columns=["recurrence"],
+        where=pydiditbackend.models.Todo.recurrence != None,  # noqa: E711
+    ) == []
+
+
+def test_completed_recurring_todos_are_not_archived(recurring):
+    [todo] = pydiditbackend.get("Todo", filter_by={"description": "water plants"})
+    pydiditbackend.mark_completed(todo)
+
+    assert pydiditbackend.archive_completed(now=datetime.now() + timedelta(days=60)) == 0
+    assert pydiditbackend.materialize_recurring(now=START + timedelta(weeks=1)) == 1
+
+
+@pytest.mark.models_versions(BASELINE_MODELS_VERSION)
+def test_materialize_needs_recurrence(prepare):
+    with pytest.raises(pydiditbackend.UnsupportedDatabaseError, match="ed834725badc"):
+        pydiditbackend.materialize_recurring()
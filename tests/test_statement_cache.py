@@ -0,0 +1,63 @@
+from datetime import datetime
+
+import pydiditbackend
+
+
+def _populate():
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        for i in range(3):
+            pydiditbackend.put(
+                pydiditbackend.models.Todo(description=f"todo{i}", display_position=i),
+                session=session,
+            )
+
+
+def test_same_shape_reuses_statement(prepare):
+    _populate()
+
+    assert pydiditbackend.get("Todo", filter_by={"description": "todo0"})[0].display_position == 0
+    cached = dict(pydiditbackend._statement_cache)
+    assert pydiditbackend.get("Todo", filter_by={"description": "todo2"})[0].display_position == 2
+
+    assert pydiditbackend._statement_cache == cached
+
+
+def test_shapes_are_cached_separately(prepare):
+    _populate()
+
+    pydiditbackend.get("Todo")
+    pydiditbackend.get("Todo", include_completed=True)
+    pydiditbackend.get("Todo", filter_by={"id": 1})
+    pydiditbackend.get_rows("Todo", columns=["id"])
+    pydiditbackend.count("Todo")
+    pydiditbackend.count_by("Todo", "state")
+
+    # include_completed also reads the archive, with a statement of its own.
+    assert len(pydiditbackend._statement_cache) == 7
+
+
+def test_where_is_not_cached(prepare):
+    _populate()
+
+    todos = pydiditbackend.get("Todo", where=pydiditbackend.models.Todo.display_position > 0)
+
+    assert len(todos) == 2
+    assert pydiditbackend._statement_cache == {}
+
+
+def test_none_filter_matches_null(prepare):
+    _populate()
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        [todo] = pydiditbackend.get("Todo", filter_by={"description": "todo1"}, session=session)
+        todo.due = datetime.now()
+
+    undated = pydiditbackend.get("Todo", filter_by={"due": None})
+    rows = pydiditbackend.get_rows("Todo", columns=["id"], filter_by={"due": None})
+
+    assert [todo.description for todo in undated] == ["todo0", "todo2"]
+    assert len(rows) == 2
+    assert len(pydiditbackend.get_rows(
+        "Todo",
+        columns=["id"],
+        filter_by={"due": datetime(2000, 1, 1)},
+    )) == 0
@@ -0,0 +1,122 @@
+import io
+from datetime import datetime
+
+import pydiditbackend
+import pytest
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker as sqlalchemy_sessionmaker
+
+from pydiditbackend import transfer
+from tests.conftest import MODELS_VERSION
+
+
+@pytest.fixture
+def populated(prepare):
+    models = pydiditbackend.models
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        tag = models.Tag(name="tag")
+        todos = [
+            models.Todo(
+                description=f"todo{i}",
+                display_position=10 * i,
+                due=datetime(2030, 1, i + 1, 12, 30) if i % 2 else None,
+                tags=[tag] if i % 3 else [],
+            )
+            for i in range(5)
+        ]
+        session.add_all(todos)
+        session.add(models.Project(description="project", display_position=7, contain_todos=todos[1:3]))
+        session.add(models.Note(text="note", todos=todos[:1]))
+    pydiditbackend.delete("Todo", 4)
+
+
+def _snapshot(engine):
+    with engine.connect() as connection:
+        return {
+            table.name: sorted(connection.execute(select(table)).all(), key=repr)
+            for table in pydiditbackend.models.Base.metadata.sorted_tables
+            if table.name != "alembic_version"
+        }
+
+
+@pytest.fixture
+def target(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'target.db'}")
+    pydiditbackend.models.Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def _switch(engine):
+    pydiditbackend.prepare(sqlalchemy_sessionmaker(engine), version_override=MODELS_VERSION)
+
+
+def test_ndjson_round_trip(populated, engine, target):
+    exported = io.StringIO()
+    counts = pydiditbackend.export_stream(exported, batch_size=2)
+    assert counts["todo"] == 4
+    assert counts["todo_tag"] == 2
+    assert counts["tombstone"] == 1
+
+    _switch(target)
+    exported.seek(0)
+    assert pydiditbackend.import_stream(exported, batch_size=2) == counts
+
+    assert _snapshot(target) == _snapshot(engine)
+    # New rows continue after the imported ids and positions.
+    pydiditbackend.put(pydiditbackend.models.Todo(description="new"))
+    new = pydiditbackend.get("Todo", filter_by={"description": "new"})[0]
+    assert new.id == 6
+    assert new.display_position == 31
+
+
+def test_import_checks_the_version(populated, tmp_path):
+    path = tmp_path / "export.ndjson"
+    pydiditbackend.export_stream(path)
+    path.write_text(path.read_text().replace(MODELS_VERSION, "0123456789ab", 1))
+
+    with pytest.raises(ValueError, match="0123456789ab"):
+        pydiditbackend.import_stream(path)
+    assert pydiditbackend.count("Todo") == 4
+
+
+def test_parquet_round_trip(populated, engine, target, tmp_path):
+    pytest.importorskip("pyarrow")
+    counts = pydiditbackend.export_stream(tmp_path / "export", format="parquet", batch_size=2)
+
+    _switch(target)
+    assert pydiditbackend.import_stream(tmp_path / "export", format="parquet") == counts
+    assert _snapshot(target) == _snapshot(engine)
+
+
+def test_unknown_format(prepare):
+    with pytest.raises(ValueError, match="format"):
+        pydiditbackend.export_stream(io.StringIO(), format="csv")
+
+
+class TestSnapshot:
+    @pytest.fixture
+    def engine(self, tmp_path):
+        # The concurrent write needs a connection of its own, which WAL lets
+        # go ahead while the export reads.
+        engine = create_engine(f"sqlite:///{tmp_path / 'source.db'}")
+        with engine.connect() as connection:
+            connection.exec_driver_sql("PRAGMA journal_mode=WAL")
+        yield engine
+        engine.dispose()
+
+    def test_export_ignores_later_writes(self, populated, monkeypatch):
+        batches = transfer._batches
+
+        def write_meanwhile(session, table, batch_size):
+            yield from batches(session, table, batch_size)
+            if table.name == "tag":
+                pydiditbackend.put(pydiditbackend.models.Todo(description="late", display_position=99))
+
+        monkeypatch.setattr(transfer, "_batches", write_meanwhile)
+
+        counts = pydiditbackend.export_stream(io.StringIO())
+
+        assert counts["todo"] == 4
+        assert pydiditbackend.count("Todo") == 5
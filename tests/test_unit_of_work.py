@@ -0,0 +1,76 @@
+import pydiditbackend
+import pytest
+
+from sqlalchemy import event
+
+from tests.conftest import BASELINE_MODELS_VERSION, MODELS_VERSION
+
+pytestmark = pytest.mark.models_versions(BASELINE_MODELS_VERSION, MODELS_VERSION)
+
+
+@pytest.fixture
+def populated(prepare):
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        for i in range(5):
+            pydiditbackend.put(
+                pydiditbackend.models.Todo(description=f"todo{i}", display_position=i),
+                session=session,
+            )
+
+
+@pytest.fixture
+def transactions(engine):
+    begins = []
+
+    def count_begin(connection) -> None:  # noqa: ANN001
+        begins.append(connection)
+
+    event.listen(engine, "begin", count_begin)
+    yield begins
+    event.remove(engine, "begin", count_begin)
+
+
+def test_calls_share_one_transaction(populated, transactions):
+    with pydiditbackend.unit_of_work():
+        todo = pydiditbackend.get("Todo", filter_by={"description": "todo4"})[0]
+        pydiditbackend.put(pydiditbackend.models.Todo(description="new", display_position=10))
+        pydiditbackend.move(todo, 1)
+        todos = pydiditbackend.get("Todo")
+
+    assert len(transactions) == 1
+    assert [todo.description for todo in todos] == [
+        "todo0", "todo4", "todo1", "todo2", "todo3", "new",
+    ]
+    assert [todo.display_position for todo in todos] == [0, 1, 2, 3, 4, 10]
+    assert [todo.description for todo in pydiditbackend.get("Todo")] == [
+        "todo0", "todo4", "todo1", "todo2", "todo3", "new",
+    ]
+
+
+def test_nested_unit_of_work_joins_outer(populated, transactions):
+    with pydiditbackend.unit_of_work() as outer:
+        with pydiditbackend.unit_of_work() as inner:
+            assert inner is outer
+            pydiditbackend.mark_completed("Todo", 1)
+        assert pydiditbackend.count("Todo") == 4
+
+    assert len(transactions) == 1
+
+
+def test_rolls_back_on_error(populated):
+    with pytest.raises(RuntimeError), pydiditbackend.unit_of_work():
+        pydiditbackend.delete("Todo", 1)
+        pydiditbackend.move("Todo", 5, 0)
+        raise RuntimeError
+
+    todos = pydiditbackend.get("Todo")
+    assert [todo.display_position for todo in todos] == [0, 1, 2, 3, 4]
+    assert todos[0].description == "todo0"
+
+
+def test_new_display_positions_see_earlier_puts(prepare):
+    with pydiditbackend.unit_of_work():
+        for i in range(3):
+            pydiditbackend.put(pydiditbackend.models.Todo(description=f"todo{i}"))
+
+    assert [todo.display_position for todo in pydiditbackend.get("Todo")] == [0, 1, 2]
@@ -0,0 +1,135 @@
+import threading
+from datetime import datetime, timedelta
+
+import pydiditbackend
+import pytest
+
+from sqlalchemy import create_engine
+
+from pydiditbackend import scheduler, utils
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # The scheduler runs in its own thread, which needs to see the same database.
+    engine = create_engine(f"sqlite:///{tmp_path / 'visibility.db'}", echo=True)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def visible_flag(prepare, monkeypatch):
+    monkeypatch.setattr(pydiditbackend, "materialized_visibility", True)
+
+
+def _put_todos():
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        pydiditbackend.put(
+            pydiditbackend.models.Todo(description="now", display_position=0),
+            session=session,
+        )
+        pydiditbackend.put(
+            pydiditbackend.models.Todo(
+                description="soon",
+                show_from=datetime.now() + timedelta(hours=1),
+                display_position=1,
+            ),
+            session=session,
+        )
+
+
+def test_visible_default(visible_flag):
+    _put_todos()
+
+    assert [todo.description for todo in pydiditbackend.get("Todo")] == ["now"]
+    assert len(pydiditbackend.get("Todo", include_future_show_from=True)) == 2
+
+
+def test_activate_shown(visible_flag):
+    _put_todos()
+
+    assert pydiditbackend.activate_shown() == 0
+    assert pydiditbackend.activate_shown(now=datetime.now() + timedelta(hours=2)) == 1
+    assert [todo.description for todo in pydiditbackend.get("Todo")] == ["now", "soon"]
+
+
+def test_show_from_change_updates_visible(visible_flag):
+    _put_todos()
+
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        todo = pydiditbackend.get("Todo", filter_by={"description": "now"}, session=session)[0]
+        todo.show_from = datetime.now() + timedelta(days=1)
+
+    assert pydiditbackend.get("Todo") == []
+
+
+def test_scheduler_ticks(visible_flag):
+    _put_todos()
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        todo = pydiditbackend.get("Todo", filter_by={"description": "now"}, session=session)[0]
+        todo.visible = False
+
+    with scheduler.start(interval=60):
+        pass
+
+    assert [todo.description for todo in pydiditbackend.get("Todo")] == ["now"]
+
+
+def test_activate_shown_records_changed_models(visible_flag, monkeypatch):
+    _put_todos()
+    recorded = []
+    monkeypatch.setattr(
+        pydiditbackend.invalidation,
+        "record",
+        lambda session, model, ids=None: recorded.append(model),
+    )
+
+    pydiditbackend.activate_shown(now=datetime.now() + timedelta(hours=2))
+
+    assert recorded == ["Todo"]
+
+
+def test_scheduler_survives_failed_tick(visible_flag, monkeypatch):
+    ticked = threading.Event()
+    ticks = []
+
+    def tick():
+        ticks.append(None)
+        if len(ticks) == 1:
+            raise RuntimeError("database went away")
+        ticked.set()
+        return 0, 0, 0
+
+    monkeypatch.setattr(scheduler, "tick", tick)
+
+    with scheduler.start(interval=0.01):
+        assert ticked.wait(5)
+
+
+def test_scheduler_cli_survives_failed_tick(monkeypatch):
+    ticks = []
+
+    class Stop(Exception):
+        pass
+
+    def tick():
+        ticks.append(None)
+        if len(ticks) == 1:
+            raise RuntimeError("database went away")
+        return 0, 0, 0
+
+    def sleep(seconds):
+        if len(ticks) == 2:
+            raise Stop
+
+    monkeypatch.setenv("PYDIDIT_DB_URL", "sqlite://")
+    # Without boto3 there is no build_rds_db_url to replace.
+    monkeypatch.setattr(utils, "build_rds_db_url", lambda url: url, raising=False)
+    monkeypatch.setattr(pydiditbackend, "prepare", lambda sessionmaker: None)
+    monkeypatch.setattr(scheduler, "tick", tick)
+    monkeypatch.setattr(scheduler.time, "sleep", sleep)
+
+    with pytest.raises(Stop):
+        scheduler.main(["--interval", "60"])
+
+    assert len(ticks) == 2
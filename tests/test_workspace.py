@@ -0,0 +1,70 @@
+import pydiditbackend
+import pytest
+
+from sqlalchemy import event
+
+from tests.conftest import BASELINE_MODELS_VERSION, MODELS_VERSION
+
+pytestmark = pytest.mark.models_versions(BASELINE_MODELS_VERSION, MODELS_VERSION)
+
+
+@pytest.fixture
+def populated(prepare):
+    models = pydiditbackend.models
+    State = models.enums.State
+    with pydiditbackend.sessionmaker() as session, session.begin():
+        tag = models.Tag(name="tag")
+        todos = [
+            models.Todo(description=f"todo{i}", display_position=i, tags=[tag])
+            for i in range(3)
+        ]
+        done = models.Todo(description="done", state=State.completed, display_position=3)
+        todos[2].prereq_todos = [todos[0], done]
+        project = models.Project(
+            description="project",
+            display_position=0,
+            contain_todos=[todos[2], todos[0], done],
+            notes=[models.Note(text="note")],
+        )
+        session.add_all([*todos, done, project])
+
+
+@pytest.fixture
+def statements(engine):
+    recorded = []
+
+    def record(conn, cursor, statement, *args):  # noqa: ANN001, ANN002
+        recorded.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield recorded
+    event.remove(engine, "before_cursor_execute", record)
+
+
+def test_load_workspace(populated, statements):
+    workspace = pydiditbackend.load_workspace()
+
+    todos = workspace.instances["Todo"]
+    assert sorted(todo.description for todo in todos.values()) == ["todo0", "todo1", "todo2"]
+    [project_id] = workspace.instances["Project"]
+    [tag_id] = workspace.instances["Tag"]
+    ids = {todo.description: todo_id for todo_id, todo in todos.items()}
+
+    # Contained todos come in project order, without the completed one.
+    assert workspace.edges["Project"]["contain_todos"][project_id] == [ids["todo2"], ids["todo0"]]
+    assert workspace.edges["Todo"]["contained_by_projects"][ids["todo1"]] == []
+    assert workspace.edges["Todo"]["prereq_todos"][ids["todo2"]] == [ids["todo0"]]
+    assert workspace.edges["Todo"]["dependent_todos"][ids["todo0"]] == [ids["todo2"]]
+    assert sorted(workspace.edges["Tag"]["todos"][tag_id]) == sorted(ids.values())
+    assert len(workspace.edges["Project"]["notes"][project_id]) == 1
+
+    # One query per table, and one per association table.
+    tables = len(pydiditbackend.SYNCED_MODEL_NAMES) + len(list(pydiditbackend._association_tables()))
+    assert len(statements) == tables
+
+
+def test_load_workspace_with_completed(populated):
+    workspace = pydiditbackend.load_workspace(include_completed=True)
+
+    [project_id] = workspace.instances["Project"]
+    assert len(workspace.edges["Project"]["contain_todos"][project_id]) == 3